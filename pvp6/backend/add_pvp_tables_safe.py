@@ -71,7 +71,7 @@ def add_pvp_tables_safely():
                     player2_id INTEGER NOT NULL,
                     current_turn INTEGER NOT NULL,
                     turn_number INTEGER DEFAULT 1,
-                    battle_state TEXT NOT NULL,
+                    battle_state BLOB NOT NULL,
                     status TEXT DEFAULT 'active',
                     winner_id INTEGER,
                     created_at INTEGER DEFAULT (strftime('%s', 'now') * 1000),
@@ -10,10 +10,16 @@ import base64
 import uuid
 import traceback
 import decimal
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from decimal import Decimal, ROUND_HALF_UP
 
-from flask import Flask, request, session, redirect, jsonify, send_from_directory
+from flask import Flask, Response, request, session, redirect, jsonify, send_from_directory
 from config import BOT_TOKEN, SECRET_KEY, DATABASE_PATH
+from gateway_resilience import GATEWAY, GatewayUnavailable
+from idempotency import IDEMPOTENCY, idempotent
+from nft_ownership import (TRACKED_RESOURCES, init_nft_ownership_tables,
+                           owned_nfids, record_balance_changes)
 # Import pvp_routes with error handling
 pvp_bp = None  # Initialize as None first
 try:
@@ -48,6 +54,9 @@ NEEDS_EGGS_RESOURCE = False
 NEEDS_PETS_TABLE = False
 # Flag to track if we need to add the radix_account_address column
 NEEDS_RADIX_ADDRESS_COLUMN = False
+# Flag to track if we need to add the minted_nft_cache table
+NEEDS_MINTED_NFT_CACHE_TABLE = False
+NEEDS_NFT_OWNERSHIP_TABLES = False
 
 # Constants for Evolving Creatures integration
 EVOLVING_CREATURES_PACKAGE = "package_rdx1p5u8kkr8z77ujmhyzyx36x677jnjkvfwjphu2mxyc0984eqckgmclq"
@@ -79,238 +88,9 @@ TOKEN_ADDRESSES = {
     "RBX": "resource_rdx1t5lenm5rr0p7urmcfjpzq5syt7cpges3wv3hzefckqe49ga6wutrhf"
 }
 
-# Species data for Evolving Creatures
-SPECIES_DATA = {
-    # Common Creatures (50% chance)
-    1: {
-        "name": "Bullx",
-        "specialty_stats": ["strength", "stamina"],
-        "rarity": "Common",
-        "preferred_token": "RBX",
-        "evolution_prices": [50, 100, 200],
-        "stat_price": 100,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/bullx"
-    },
-    2: {
-        "name": "Cudoge",
-        "specialty_stats": ["strength", "stamina"],
-        "rarity": "Common",
-        "preferred_token": "DGC",
-        "evolution_prices": [100000, 200000, 300000],
-        "stat_price": 200000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/cudoge"
-    },
-    3: {
-        "name": "Cvxling",
-        "specialty_stats": ["speed", "energy"],
-        "rarity": "Common",
-        "preferred_token": "CVX",
-        "evolution_prices": [20, 50, 100],
-        "stat_price": 50,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/cvxling"
-    },
-    4: {
-        "name": "Dan",
-        "specialty_stats": ["stamina", "magic"],
-        "rarity": "Common",
-        "preferred_token": "DAN",
-        "evolution_prices": [500000, 1000000, 2000000],
-        "stat_price": 1000000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/dan"
-    },
-    5: {
-        "name": "Delayer",
-        "specialty_stats": ["magic"],
-        "rarity": "Common",
-        "preferred_token": "DELAY",
-        "evolution_prices": [20000, 40000, 100000],
-        "stat_price": 40000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/delayer"
-    },
-    6: {
-        "name": "Delivera",
-        "specialty_stats": ["stamina", "strength"],
-        "rarity": "Common",
-        "preferred_token": "DELIVER",
-        "evolution_prices": [1000, 2000, 4000],
-        "stat_price": 2000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/delivera"
-    },
-    7: {
-        "name": "Flooper",
-        "specialty_stats": ["magic", "energy"],
-        "rarity": "Common",
-        "preferred_token": "FLOOP",
-        "evolution_prices": [0.001, 0.002, 0.003],
-        "stat_price": 0.002,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/flooper"
-    },
-    8: {
-        "name": "Hitter",
-        "specialty_stats": ["strength", "magic"],
-        "rarity": "Common",
-        "preferred_token": "HIT",
-        "evolution_prices": [20000000, 40000000, 100000000],
-        "stat_price": 40000000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/hitter"
-    },
-    9: {
-        "name": "Moxer",
-        "specialty_stats": ["speed", "magic"],
-        "rarity": "Common",
-        "preferred_token": "MOX",
-        "evolution_prices": [200, 400, 1000],
-        "stat_price": 400,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/moxer"
-    },
-    10: {
-        "name": "Ocipod",
-        "specialty_stats": ["energy"],
-        "rarity": "Common",
-        "preferred_token": "CVX",
-        "evolution_prices": [20, 50, 100],
-        "stat_price": 50,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/ocipod"
-    },
-    # Rare Creatures (30% chance)
-    11: {
-        "name": "Wowori",
-        "specialty_stats": ["magic", "energy"],
-        "rarity": "Rare",
-        "preferred_token": "WOWO",
-        "evolution_prices": [4000, 10000, 20000],
-        "stat_price": 10000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/wowori"
-    },
-    12: {
-        "name": "Earlybyte",
-        "specialty_stats": ["speed", "energy"],
-        "rarity": "Rare",
-        "preferred_token": "EARLY",
-        "evolution_prices": [1000, 2000, 4000],
-        "stat_price": 2000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/earlybyte"
-    },
-    13: {
-        "name": "Edge",
-        "specialty_stats": ["strength", "energy"],
-        "rarity": "Rare",
-        "preferred_token": "EDGE",
-        "evolution_prices": [20000000, 40000000, 100000000],
-        "stat_price": 40000000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/edge"
-    },
-    14: {
-        "name": "Fomotron",
-        "specialty_stats": ["energy", "strength"],
-        "rarity": "Rare",
-        "preferred_token": "FOMO",
-        "evolution_prices": [200, 500, 1000],
-        "stat_price": 500,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/fomotron"
-    },
-    15: {
-        "name": "Hodlphant",
-        "specialty_stats": ["strength"],
-        "rarity": "Rare",
-        "preferred_token": "CVX",
-        "evolution_prices": [20, 50, 100],
-        "stat_price": 50,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/hodlphant"
-    },
-    16: {
-        "name": "Minermole",
-        "specialty_stats": ["strength", "stamina"],
-        "rarity": "Rare",
-        "preferred_token": "CVX",
-        "evolution_prices": [20, 50, 100],
-        "stat_price": 50,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/minermole"
-    },
-    17: {
-        "name": "Ocitrup",
-        "specialty_stats": ["speed", "strength"],
-        "rarity": "Rare",
-        "preferred_token": "OCI",
-        "evolution_prices": [100, 200, 400],
-        "stat_price": 200,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/ocitrup"
-    },
-    # Epic Creatures (15% chance)
-    18: {
-        "name": "Etherion",
-        "specialty_stats": ["magic", "energy"],
-        "rarity": "Epic",
-        "preferred_token": "XRD",
-        "evolution_prices": [100, 200, 400],
-        "stat_price": 200,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/etherion"
-    },
-    19: {
-        "name": "Hugbloom",
-        "specialty_stats": ["stamina"],
-        "rarity": "Epic",
-        "preferred_token": "HUG",
-        "evolution_prices": [100000, 300000, 500000],
-        "stat_price": 300000,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/hugbloom"
-    },
-    20: {
-        "name": "Ilispect",
-        "specialty_stats": ["stamina", "magic"],
-        "rarity": "Epic",
-        "preferred_token": "ILIS",
-        "evolution_prices": [200, 400, 1000],
-        "stat_price": 400,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/ilispect"
-    },
-    21: {
-        "name": "Reddix",
-        "specialty_stats": ["strength", "stamina"],
-        "rarity": "Epic",
-        "preferred_token": "REDDICKS",
-        "evolution_prices": [300, 500, 1000],
-        "stat_price": 500,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/reddix"
-    },
-    22: {
-        "name": "Satoshium",
-        "specialty_stats": ["strength", "stamina"],
-        "rarity": "Epic",
-        "preferred_token": "XRD",
-        "evolution_prices": [100, 200, 400],
-        "stat_price": 200,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/satoshium"
-    },
-    # Legendary Creatures (5% chance)
-    23: {
-        "name": "Cassie",
-        "specialty_stats": ["magic", "energy"],
-        "rarity": "Legendary",
-        "preferred_token": "CASSIE",
-        "evolution_prices": [0.004, 0.01, 0.02],
-        "stat_price": 0.01,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/cassie"
-    },
-    24: {
-        "name": "Corvax",
-        "specialty_stats": ["magic", "energy"],
-        "rarity": "Legendary",
-        "preferred_token": "CVX",
-        "evolution_prices": [20, 50, 100],
-        "stat_price": 50,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/corvax"
-    },
-    25: {
-        "name": "Xerdian",
-        "specialty_stats": ["stamina", "energy"],
-        "rarity": "Legendary",
-        "preferred_token": "XRD",
-        "evolution_prices": [100, 200, 400],
-        "stat_price": 200,
-        "base_url": "https://cvxlab.net/assets/evolving_creatures/xerdian"
-    }
-}
+# Species data for Evolving Creatures (see species_data.py)
+from species_data import (SPECIES_DATA, SPECIES_REGISTRY, SPECIES_BY_NAME,
+                          DEFAULT_SPECIES, RARITY_SCORES, find_species)
 
 SPECIES_META = SPECIES_DATA   # ← legacy name used elsewhere
 
@@ -504,6 +284,43 @@ def ensure_eggs_resource_exists():
         print(f"Error ensuring eggs resource: {e}")
         NEEDS_EGGS_RESOURCE = True
 
+def check_and_update_minted_nft_cache_table():
+    """Check if the minted_nft_cache table exists and create if necessary."""
+    global NEEDS_MINTED_NFT_CACHE_TABLE
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # A committed transaction never changes, so its minted NFTs are
+        # stored once per intent hash and never updated afterwards
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS minted_nft_cache (
+                intent_hash TEXT PRIMARY KEY,
+                transaction_status TEXT NOT NULL,
+                creature_nft TEXT,
+                bonus_item TEXT,
+                resolved_at INTEGER NOT NULL
+            )
+        """)
+        conn.commit()
+        
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error checking minted_nft_cache table: {e}")
+        NEEDS_MINTED_NFT_CACHE_TABLE = True
+
+def check_and_update_nft_ownership_tables():
+    """Create the local NFT ownership index (see nft_ownership.py) if necessary."""
+    global NEEDS_NFT_OWNERSHIP_TABLES
+    
+    try:
+        init_nft_ownership_tables()
+    except Exception as e:
+        print(f"Error checking nft_ownership tables: {e}")
+        NEEDS_NFT_OWNERSHIP_TABLES = True
+
 # Run schema checks on startup
 check_and_update_schema()
 check_and_update_room_column()
@@ -511,6 +328,45 @@ check_and_update_seen_room_column()
 ensure_eggs_resource_exists()
 check_and_update_pets_table()
 check_and_update_users_schema()
+check_and_update_minted_nft_cache_table()
+check_and_update_nft_ownership_tables()
+
+def _load_account_fungibles(account_address):
+    """
+    Load the fungible balances of an account (first page, 100 resources).
+    Raises GatewayUnavailable on any gateway failure so cached values can be served.
+    """
+    payload = {
+        "address": account_address,
+        "limit_per_page": 100  # Get a reasonable number of tokens
+    }
+    
+    response = GATEWAY.post("/state/entity/page/fungibles/", payload)
+    print(f"Gateway API Response Status: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"Response: {response.text[:200]}...")
+        raise GatewayUnavailable(f"fungibles: HTTP {response.status_code}")
+    
+    data = response.json()
+    items = data.get('items', [])
+    
+    if 'next_cursor' in data and data.get('total_count', 0) > len(items):
+        print("Additional pages of tokens exist, only the first page is used")
+    
+    return items
+
+def get_account_fungibles(account_address, force_refresh=False):
+    """
+    Fungible balances for an account through the shared gateway client.
+    Balances are served stale-while-revalidate, so sCVX/XRD/token lookups for
+    the same account share one gateway call and keep working during outages.
+    """
+    return GATEWAY.cached(
+        ("fungibles", account_address),
+        lambda: _load_account_fungibles(account_address),
+        force=force_refresh
+    )
 
 def fetch_scvx_balance(account_address):
     """Fetch sCVX balance for a Radix account using the Gateway API."""
@@ -522,52 +378,16 @@ def fetch_scvx_balance(account_address):
         # sCVX resource address
         scvx_resource = 'resource_rdx1t5q4aa74uxcgzehk0u3hjy6kng9rqyr4uvktnud8ehdqaaez50n693'
         
-        # Use the Gateway API
-        url = "https://mainnet.radixdlt.com/state/entity/page/fungibles/"
         print(f"Fetching sCVX for {account_address} using Gateway API")
-        
-        # Prepare request payload
-        payload = {
-            "address": account_address,
-            "limit_per_page": 100  # Get a reasonable number of tokens
-        }
-        
-        # Set appropriate headers
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
-        }
-        
-        print(f"Making Gateway API request with payload: {json.dumps(payload)}")
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        print(f"Gateway API Response Status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"Gateway API error: Status {response.status_code}")
-            print(f"Response: {response.text[:200]}...")
-            return 0
-        
-        # Parse the JSON response
-        data = response.json()
-        
-        # Print debugging info
-        print(f"Gateway API total_count: {data.get('total_count', 0)}")
-        
-        # Look for the sCVX resource in the items
-        items = data.get('items', [])
+        items = get_account_fungibles(account_address)
         print(f"Found {len(items)} resources in the account")
         
-        # Dump all resources for debugging
-        print("All resources in account:")
-        for i, item in enumerate(items):
+        for item in items:
             resource_addr = item.get('resource_address', '')
-            amount = item.get('amount', '0')
-            print(f"Resource {i}: {resource_addr} = {amount}")
             
             # Check if this is the sCVX resource
             if resource_addr == scvx_resource:
-                amount_value = float(amount)
+                amount_value = float(item.get('amount', '0'))
                 print(f"FOUND sCVX RESOURCE: {amount_value}")
                 return amount_value
         
@@ -586,7 +406,7 @@ def fetch_scvx_balance(account_address):
         traceback.print_exc()
         return 0
 
-def fetch_xrd_balance(account_address):
+def fetch_xrd_balance(account_address, force_refresh=False):
     """Fetch XRD balance for a Radix account using the Gateway API with improved reliability."""
     if not account_address:
         print("No account address provided")
@@ -597,54 +417,10 @@ def fetch_xrd_balance(account_address):
         xrd_resource = 'resource_rdx1tknxxxxxxxxxradxrdxxxxxxxxx009923554798xxxxxxxxxradxrd'
         xrd_short_identifier = 'radxrd' # A unique identifier for XRD that's part of the address
         
-        # Use the Gateway API
-        url = "https://mainnet.radixdlt.com/state/entity/page/fungibles/"
         print(f"Fetching XRD for {account_address} using Gateway API")
-        
-        # Prepare request payload
-        payload = {
-            "address": account_address,
-            "limit_per_page": 100  # Get a reasonable number of tokens
-        }
-        
-        # Set appropriate headers
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
-        }
-        
-        print(f"Making Gateway API request with payload: {json.dumps(payload)}")
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        print(f"Gateway API Response Status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"Gateway API error: Status {response.status_code}")
-            print(f"Response: {response.text[:200]}...")
-            # Try a second time before giving up
-            print("Retrying XRD balance check...")
-            time.sleep(2)  # Brief delay before retry
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
-            if response.status_code != 200:
-                print(f"Retry failed with status: {response.status_code}")
-                return 0
-        
-        # Parse the JSON response
-        data = response.json()
-        
-        # Print debugging info
-        print(f"Gateway API total_count: {data.get('total_count', 0)}")
-        
-        # Look for the XRD resource in the items
-        items = data.get('items', [])
+        items = get_account_fungibles(account_address, force_refresh)
         print(f"Found {len(items)} resources in the account")
         
-        # Print the first few resources to help diagnose issues
-        for i, item in enumerate(items[:5]):
-            resource_addr = item.get('resource_address', '')
-            amount = item.get('amount', '0')
-            print(f"Resource {i}: {resource_addr} = {amount}")
-        
         # First try exact match
         for item in items:
             resource_addr = item.get('resource_address', '')
@@ -668,11 +444,6 @@ def fetch_xrd_balance(account_address):
                 print(f"FOUND XRD RESOURCE (identifier match): {amount_value}")
                 return amount_value
         
-        # Final fallback: check if there are additional pages of results
-        if 'next_cursor' in data and data.get('total_count', 0) > len(items):
-            print("Additional pages of tokens exist, but XRD not found in first page")
-            # In a full implementation, we would handle pagination here
-        
         # If we get here, we didn't find XRD
         print("XRD not found in account fungible tokens")
         return 0
@@ -682,7 +453,7 @@ def fetch_xrd_balance(account_address):
         # Try an alternative approach or display an error rather than silent fail
         return 0
 
-def fetch_token_balance(account_address, token_symbol):
+def fetch_token_balance(account_address, token_symbol, force_refresh=False):
     """
     Fetch balance of a specific token for a Radix account.
     Returns: float balance or 0 if not found
@@ -698,33 +469,8 @@ def fetch_token_balance(account_address, token_symbol):
             print(f"Unknown token symbol: {token_symbol}")
             return 0
         
-        # Use the Gateway API
-        url = "https://mainnet.radixdlt.com/state/entity/page/fungibles/"
         print(f"Fetching {token_symbol} for {account_address} using Gateway API")
-        
-        # Prepare request payload
-        payload = {
-            "address": account_address,
-            "limit_per_page": 100  # Get a reasonable number of tokens
-        }
-        
-        # Set appropriate headers
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
-        }
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"Gateway API error: Status {response.status_code}")
-            return 0
-        
-        # Parse the JSON response
-        data = response.json()
-        
-        # Look for the token resource in the items
-        items = data.get('items', [])
+        items = get_account_fungibles(account_address, force_refresh)
         
         for item in items:
             resource_addr = item.get('resource_address', '')
@@ -746,69 +492,138 @@ def fetch_token_balance(account_address, token_symbol):
 # ──────────────────────────────────────────────────────────────
 # Helper: return list of NFIDs a given account owns for a resource
 # ──────────────────────────────────────────────────────────────
+def _load_account_nfids(account, resource_address):
+    """Single /state/entity/details call; raises GatewayUnavailable on failure."""
+    body = {
+        "addresses": [account],
+        "aggregation_level": "Vault",
+        "opt_ins": {"non_fungible_include_nfids": True}
+    }
+
+    resp = GATEWAY.post("/state/entity/details", body, timeout=15)
+
+    if resp.status_code != 200:
+        print(f"[get_account_nfids] gateway {resp.status_code}: "
+              f"{resp.text[:120]}…")
+        raise GatewayUnavailable(f"entity/details: HTTP {resp.status_code}")
+
+    data = resp.json()
+    if not data.get("items"):
+        return []
+
+    # first (and only) entry corresponds to `account`
+    try:
+        for res in data["items"][0]["non_fungible_resources"]["items"]:
+            if res["resource_address"] == resource_address:
+                # vaults.items[0].items -> list of NFIDs
+                return res["vaults"]["items"][0]["items"]
+    except (KeyError, IndexError, TypeError):
+        pass
+
+    return []
+
 def get_account_nfids(account, resource_address):
     """
     Uses /state/entity/details (Gateway ≥ v1.10) to list the non-fungible
     IDs ("NFIDs") of `resource_address` held in `account`.
 
+    The last known list is served stale-while-revalidate, so a gateway
+    brownout returns the previous NFIDs instead of blocking the request.
+
     Returns
     -------
     list[str]      a list of NFID strings, or [] if none / on error
     """
-    try:
-        BASE = "https://mainnet.radixdlt.com"
-        HEADERS = {
-            "Content-Type": "application/json",
-            "User-Agent":  "CorvaxLab Game/1.2"
-        }
-        body = {
-            "addresses": [account],
-            "aggregation_level": "Vault",
-            "opt_ins": {"non_fungible_include_nfids": True}
-        }
-
-        # retry a couple of times for transient network/429 errors
-        for attempt in range(3):
-            try:
-                resp = requests.post(f"{BASE}/state/entity/details",
-                                     json=body,
-                                     headers=HEADERS,
-                                     timeout=15)
-                if resp.status_code == 429 and attempt < 2:
-                    time.sleep(1 + attempt)
-                    continue
-                break
-            except requests.RequestException:
-                if attempt < 2:
-                    time.sleep(1 + attempt)
-                    continue
-                raise
-
-        if resp.status_code != 200:
-            print(f"[get_account_nfids] gateway {resp.status_code}: "
-                  f"{resp.text[:120]}…")
-            return []
-
-        data = resp.json()
-        if not data.get("items"):
-            return []
-
-        # first (and only) entry corresponds to `account`
+    # Prefer the local ownership index, kept current by ledger deltas
+    if resource_address in TRACKED_RESOURCES:
         try:
-            for res in data["items"][0]["non_fungible_resources"]["items"]:
-                if res["resource_address"] == resource_address:
-                    # vaults.items[0].items -> list of NFIDs
-                    return res["vaults"]["items"][0]["items"]
-        except (KeyError, IndexError, TypeError):
-            pass
+            nfids = owned_nfids(account, resource_address)
+            if nfids is not None:
+                return nfids
+        except Exception as exc:
+            print(f"[get_account_nfids] ownership index unavailable: {exc}")
 
-        return []
+    try:
+        return GATEWAY.cached(
+            ("nfids", account, resource_address),
+            lambda: _load_account_nfids(account, resource_address)
+        )
     except Exception as exc:
         print(f"[get_account_nfids] fatal: {exc}")
         traceback.print_exc()
         return []
 
 
+def _load_user_nfts(account_address, resource_address):
+    """Page through non-fungible vaults at one ledger state; raises GatewayUnavailable."""
+    # First, get the current ledger state to maintain consistency across requests
+    status_response = GATEWAY.post("/status/current", {}, timeout=15)
+    
+    if status_response.status_code != 200:
+        print(f"Failed to get current ledger state: {status_response.text[:200]}")
+        raise GatewayUnavailable(f"status/current: HTTP {status_response.status_code}")
+        
+    # Extract the ledger state for consistency
+    ledger_state = status_response.json().get("ledger_state")
+    print(f"Using ledger state: {ledger_state}")
+    
+    print(f"Fetching NFTs for {account_address} of resource {resource_address}")
+    
+    all_nft_ids = []
+    next_cursor = None
+    
+    # Implement proper pagination loop
+    while True:
+        # Prepare request payload with correct opt-ins and ledger state
+        payload = {
+            "address": account_address,
+            "resource_address": resource_address,
+            "at_ledger_state": ledger_state,  # Use consistent ledger state
+            "opt_ins": {
+                "non_fungible_include_nfids": True,
+                "ancestor_identities": True
+            },
+            "limit_per_page": 100
+        }
+        
+        # Add cursor for pagination if we have one
+        if next_cursor:
+            payload["cursor"] = next_cursor
+        
+        response = GATEWAY.post("/state/entity/page/non-fungible-vaults/", payload, timeout=15)
+        
+        if response.status_code != 200:
+            print(f"Gateway API error: Status {response.status_code}")
+            print(f"Response: {response.text[:200]}...")
+            raise GatewayUnavailable(f"non-fungible-vaults: HTTP {response.status_code}")
+        
+        # Parse the JSON response
+        data = response.json()
+        
+        # Get the vault items
+        items = data.get('items', [])
+        
+        if not items:
+            print("No items returned from API")
+            break
+            
+        # Extract all NFT IDs from all vaults
+        for item in items:
+            vault_info = item.get('vault', {})
+            vault_non_fungibles = vault_info.get('non_fungible_ids', [])
+            if vault_non_fungibles:
+                all_nft_ids.extend(vault_non_fungibles)
+        
+        # Check if there are more pages with proper cursor handling
+        next_cursor = data.get('next_cursor')
+        if not next_cursor:
+            break
+            
+        print(f"Found {len(all_nft_ids)} NFTs so far, fetching next page with cursor: {next_cursor[:20]}...")
+    
+    print(f"Total NFTs found: {len(all_nft_ids)}")
+    return all_nft_ids
+
 def fetch_user_nfts(account_address, resource_address=CREATURE_NFT_RESOURCE):
     """
     Fetch all NFTs of a specific resource type for a user's account with proper 
@@ -821,200 +636,24 @@ def fetch_user_nfts(account_address, resource_address=CREATURE_NFT_RESOURCE):
         return []
         
     try:
-        # Use consistent Gateway API URL
-        gateway_url = "https://mainnet.radixdlt.com"
-        
-        # First, get the current ledger state to maintain consistency across requests
-        status_url = f"{gateway_url}/status/current"
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
-        }
-        
-        status_response = requests.post(
-            status_url,
-            headers=headers,
-            json={},
-            timeout=15
+        return GATEWAY.cached(
+            ("user_nfts", account_address, resource_address),
+            lambda: _load_user_nfts(account_address, resource_address)
         )
-        
-        if status_response.status_code != 200:
-            print(f"Failed to get current ledger state: {status_response.text[:200]}")
-            return []
-            
-        # Extract the ledger state for consistency
-        ledger_state = status_response.json().get("ledger_state")
-        print(f"Using ledger state: {ledger_state}")
-        
-        # Use the entity/page/non-fungible-vaults endpoint with proper parameters
-        url = f"{gateway_url}/state/entity/page/non-fungible-vaults/"
-        print(f"Fetching NFTs for {account_address} of resource {resource_address}")
-        
-        all_nft_ids = []
-        next_cursor = None
-        
-        # Implement proper pagination loop
-        while True:
-            # Prepare request payload with correct opt-ins and ledger state
-            payload = {
-                "address": account_address,
-                "resource_address": resource_address,
-                "at_ledger_state": ledger_state,  # Use consistent ledger state
-                "opt_ins": {
-                    "non_fungible_include_nfids": True,
-                    "ancestor_identities": True
-                },
-                "limit_per_page": 100
-            }
-            
-            # Add cursor for pagination if we have one
-            if next_cursor:
-                payload["cursor"] = next_cursor
-            
-            print(f"Making API request with payload: {json.dumps(payload)}")
-            
-            # Implement retry logic with exponential backoff for rate limiting
-            max_retries = 3
-            retry_delay = 1
-            
-            for retry in range(max_retries):
-                try:
-                    response = requests.post(url, json=payload, headers=headers, timeout=15)
-                    
-                    # Check if we hit rate limiting
-                    if response.status_code == 429:
-                        if retry < max_retries - 1:
-                            sleep_time = retry_delay * (2 ** retry)
-                            print(f"Rate limited, retrying in {sleep_time} seconds...")
-                            time.sleep(sleep_time)
-                            continue
-                    
-                    break  # Success or non-retry error
-                except requests.exceptions.RequestException as e:
-                    if retry < max_retries - 1:
-                        sleep_time = retry_delay * (2 ** retry)
-                        print(f"Request failed, retrying in {sleep_time} seconds: {e}")
-                        time.sleep(sleep_time)
-                    else:
-                        raise
-            
-            if response.status_code != 200:
-                print(f"Gateway API error: Status {response.status_code}")
-                print(f"Response: {response.text[:200]}...")
-                return all_nft_ids  # Return what we have so far
-            
-            # Parse the JSON response
-            data = response.json()
-            
-            # Get the vault items
-            items = data.get('items', [])
-            
-            if not items:
-                print("No items returned from API")
-                break
-                
-            # Extract all NFT IDs from all vaults
-            for item in items:
-                vault_info = item.get('vault', {})
-                vault_non_fungibles = vault_info.get('non_fungible_ids', [])
-                if vault_non_fungibles:
-                    all_nft_ids.extend(vault_non_fungibles)
-            
-            # Check if there are more pages with proper cursor handling
-            next_cursor = data.get('next_cursor')
-            if not next_cursor:
-                break
-                
-            print(f"Found {len(vault_non_fungibles if 'vault_non_fungibles' in locals() else [])} NFTs, fetching next page with cursor: {next_cursor[:20]}...")
-        
-        print(f"Total NFTs found: {len(all_nft_ids)}")
-        return all_nft_ids
-        
     except Exception as e:
         print(f"Error fetching NFTs with Gateway API: {e}")
         traceback.print_exc()
         return []
 
 # ────────────────────────────────────────────────────────────
-# Helper: recursively unwrap Babylon programmatic JSON
+# Helper: unwrap Babylon programmatic JSON (see nft_decoder.py)
 # ────────────────────────────────────────────────────────────
-import json
-import traceback
-from decimal import Decimal           # already imported once in your file
-# (leave the earlier import in place or deduplicate, it's harmless)
-
-# ────────────────────────────────────────────────────────────
-# Helper: recursively unwrap Babylon programmatic JSON
-#          (PATCHED – tuple of named fields ⇒ dict)
-# ────────────────────────────────────────────────────────────
-from decimal import Decimal
-
-def _unwrap(val):
-    """
-    Convert Radix Gateway programmatic_json to plain Python objects.
-
-    • Struct  → dict  {field_name: value, …}
-    • Tuple   → *if* its elements look like {field_name: …} records,
-                return the same dict; otherwise regular list
-    • Array   → list
-    • Enum    → unwrap & keep "variant" info if needed
-    • Decimal → Decimal()
-    • others  → primitive
-    """
-    if not isinstance(val, dict) or "kind" not in val:
-        return val                                # already plain
-
-    kind = val["kind"]
-
-    # ── Struct ───────────────────────────────────────────────
-    if kind == "Struct":
-        return {f["field_name"]: _unwrap(f["value"])
-                for f in val.get("fields", [])}
-
-    # ── Tuple (patched) ──────────────────────────────────────
-    if kind == "Tuple":
-        elems = val.get("elements") or val.get("fields") or []
-        # If every element has a `field_name`, treat as a record
-        if all(isinstance(e, dict) and "field_name" in e for e in elems):
-            return {e["field_name"]:
-                    _unwrap(e.get("value", e)) for e in elems}
-        # otherwise: anonymous tuple → list
-        return [_unwrap(e) for e in elems]
-
-    # ── Array ────────────────────────────────────────────────
-    if kind == "Array":
-        return [_unwrap(v) for v in val.get("elements", [])]
-
-    # ── Enum ─────────────────────────────────────────────────
-    # PATCH ‒ replace ONLY the Enum branch inside _unwrap
-    # ── Enum ─────────────────────────────────────────────────
-    if kind == "Enum":
-        variant = (val.get("name")          # old (<= v1.9)
-                   or val.get("variant_name")   # new (v1.10+)
-                   or val.get("variant")        # already-unwrapped
-                   or "Unknown")
-        fields  = val.get("fields") or []
-        if fields:                               # payload-carrying enum
-            inner = _unwrap(fields[0])
-            if isinstance(inner, dict):
-                inner["variant"] = variant
-                return inner
-            return {"variant": variant, "value": inner}
-        return variant                           # simple enum
-
-    # ── Decimal ──────────────────────────────────────────────
-    if kind == "Decimal":
-        return Decimal(val["value"])
-
-    # ── Fallback for primitive kinds ─────────────────────────
-    return val.get("value", val)
+from nft_decoder import decode_programmatic_json
 
 
 # ──────────────────────────────────────────────────────────────
 # Main – convert on-chain CreatureData into front-end payload
 # ──────────────────────────────────────────────────────────────
-FORM_SUFFIX = {0: "_egg", 1: "_form1", 2: "_form2", 3: "_form3"}  # final
-
 def format_decimal_for_manifest(amount, max_decimal_places=8):
     """
     Format a decimal amount for use in Radix manifests.
@@ -1074,25 +713,14 @@ def process_creature_data(nft_id: str, pj_raw) -> dict:
 
     if species_id is None:
         # fallback: map by on-chain name field
-        species_id = next(
-            (sid for sid, v in SPECIES_DATA.items()
-             if v["name"].lower() == pj.get("species_name", "").lower()),
-            1                                    # default → Bullx
-        )
+        by_name = SPECIES_BY_NAME.get(pj.get("species_name", "").lower())
+        species_id = by_name.id if by_name else 1   # default → Bullx
 
-    species_meta = SPECIES_DATA.get(species_id, SPECIES_DATA[1])
+    species_meta = SPECIES_REGISTRY.get(species_id, DEFAULT_SPECIES)
 
     # ── 3. assemble the response ───────────────────────────────────────
     form = pj.get("form", 0)
-    base_url = species_meta["base_url"]
-
-    def form_url(f: int) -> str:
-        return (
-            f"{base_url}_egg.png"   if f == 0 else
-            f"{base_url}_form1.png" if f == 1 else
-            f"{base_url}_form2.png" if f == 2 else
-            f"{base_url}_form3.png"
-        )
+    form_image = species_meta.image_url(form)      # precomputed per form
 
     stats_raw = pj.get("stats", {}) or {}
     stats = {
@@ -1121,15 +749,15 @@ def process_creature_data(nft_id: str, pj_raw) -> dict:
 
         # <<< FIXED LINES >>>
         "species_id":   species_id,           # ← use the **int**, not raw string
-        "species_name": species_meta["name"],
+        "species_name": species_meta.name,
 
         "form":            form,
-        "key_image_url":   pj.get("key_image_url") or form_url(form),
-        "image_url":       pj.get("image_url")     or form_url(form),
+        "key_image_url":   pj.get("key_image_url") or form_image,
+        "image_url":       pj.get("image_url")     or form_image,
 
         # <<< preferred_token now comes from the matched species >>>
-        "rarity":          pj.get("rarity")        or species_meta["rarity"],
-        "preferred_token": species_meta["preferred_token"],
+        "rarity":          pj.get("rarity")        or species_meta.rarity,
+        "preferred_token": species_meta.preferred_token,
 
         "stats":              stats,
         "evolution_progress": evolution_progress,
@@ -1143,30 +771,19 @@ def process_creature_data(nft_id: str, pj_raw) -> dict:
     }
 
 # ────────────────────────────────────────────────────────────
-# FINAL fetch_nft_data – now calls _unwrap on every NFT
+# FINAL fetch_nft_data – decodes every NFT via the nft_decoder fast path
 # ────────────────────────────────────────────────────────────
-def fetch_nft_data(resource_address: str,
-                   nft_ids: list[str],
-                   page_limit: int = 100) -> dict:
-    """
-    Return a dict {nfid: plain-python metadata} for every NFID.
-    Works on Babylon Gateway v1.10+.
-    """
-    if not nft_ids:
-        return {}
-
-    BASE  = "https://mainnet.radixdlt.com"
-    HDRS  = {"Content-Type": "application/json",
-             "User-Agent":   "CorvaxLab Game/2.0"}
-
-    # 1. Use a single, pinned state_version (no epoch)
-    status = requests.post(f"{BASE}/status/gateway-status",
-                           json={}, headers=HDRS, timeout=10)
+def _pinned_ledger_selector() -> dict:
+    """Return an `at_ledger_state` selector pinned to the current state_version."""
+    status = GATEWAY.post("/status/gateway-status", {}, timeout=10)
     status.raise_for_status()
-    selector = {"state_version": status.json()["ledger_state"]["state_version"]}
-
-    out: dict[str, dict] = {}
+    return {"state_version": status.json()["ledger_state"]["state_version"]}
 
+def _iter_nft_data_pages(selector: dict,
+                         resource_address: str,
+                         nft_ids: list[str],
+                         page_limit: int):
+    """Yield one list of (nfid, unwrapped data) per gateway page at `selector`."""
     for i in range(0, len(nft_ids), page_limit):
         batch = nft_ids[i : i + page_limit]          # keep braces
 
@@ -1176,38 +793,83 @@ def fetch_nft_data(resource_address: str,
             "non_fungible_ids": batch                # ← plain strings
         }
 
-        r = requests.post(f"{BASE}/state/non-fungible/data",
-                          json=body, headers=HDRS, timeout=20)
+        r = GATEWAY.post("/state/non-fungible/data", body, timeout=20)
 
         if r.status_code == 400:                     # helpful debug
             print("[fetch_nft_data] bad request:", r.text[:180])
         r.raise_for_status()
 
         # Gateway echoes our list order
+        page = []
         for entry in r.json().get("non_fungible_ids", []):
             nfid   = entry["non_fungible_id"]        # with braces
             raw    = (entry.get("data") or {}) \
                        .get("programmatic_json", {})
 
-            out[nfid] = _unwrap(raw)                 # ← magic happens here
+            page.append((nfid, decode_programmatic_json(raw)))  # ← magic happens here
+        yield page
+
+def _fetch_nft_data_at(selector: dict,
+                       resource_address: str,
+                       nft_ids: list[str],
+                       page_limit: int,
+                       out: dict) -> None:
+    """Fill `out` with {nfid: unwrapped data} for one resource at `selector`."""
+    for page in _iter_nft_data_pages(selector, resource_address, nft_ids, page_limit):
+        out.update(page)
+
+def fetch_nft_data(resource_address: str,
+                   nft_ids: list[str],
+                   page_limit: int = 100) -> dict:
+    """
+    Return a dict {nfid: plain-python metadata} for every NFID.
+    Works on Babylon Gateway v1.10+.
+    """
+    if not nft_ids:
+        return {}
+
+    # 1. Use a single, pinned state_version (no epoch)
+    selector = _pinned_ledger_selector()
+
+    out: dict[str, dict] = {}
+    _fetch_nft_data_at(selector, resource_address, nft_ids, page_limit, out)
 
     print(f"[fetch_nft_data] Retrieved {len(out)}/{len(nft_ids)} NFTs")
     return out
 
+def fetch_nft_data_multi(ids_by_resource: dict,
+                         page_limit: int = 100) -> dict:
+    """
+    Like fetch_nft_data, but for several resources at once.
+
+    `ids_by_resource` maps resource address -> list of NFIDs.  All lookups
+    share ONE pinned state_version, so the gateway-status round trip is paid
+    once and every NFT is read from the same ledger state.
+
+    Returns {resource_address: {nfid: plain-python metadata}}.
+    """
+    wanted = {res: ids for res, ids in ids_by_resource.items() if ids}
+    if not wanted:
+        return {}
+
+    selector = _pinned_ledger_selector()
+
+    out: dict[str, dict] = {}
+    for resource_address, nft_ids in wanted.items():
+        out[resource_address] = {}
+        _fetch_nft_data_at(selector, resource_address, nft_ids,
+                           page_limit, out[resource_address])
+
+    print(f"[fetch_nft_data_multi] Retrieved "
+          f"{sum(len(v) for v in out.values())} NFTs "
+          f"across {len(out)} resources")
+    return out
+
 
 
 import json
 import traceback
 
-# ──────────────────────────────────────────────────────────────
-# Helper:  build the image suffix for each form
-FORM_SUFFIX = {
-    0: "_egg",
-    1: "_form1",
-    2: "_form2",
-    3: "_form3",          # final form
-}
-
 def calculate_upgrade_cost(creature, energy=0, strength=0, magic=0, stamina=0, speed=0):
     """
     Calculate the cost for upgrading stats for a creature.
@@ -1219,33 +881,12 @@ def calculate_upgrade_cost(creature, energy=0, strength=0, magic=0, stamina=0, s
             print("Warning: No creature data provided for cost calculation")
             return {"token": "XRD", "amount": 50}  # Default fallback
             
-        # Get species info
-        species_id = None
-        try:
-            # Ensure species_id is an integer
-            species_id = int(creature.get("species_id", 1))
-        except (ValueError, TypeError):
-            # If conversion fails, try to use the value directly
-            species_id = creature.get("species_id", 1)
-            
-        species_info = SPECIES_DATA.get(species_id)
-        
-        # If not found by ID, try by name as a fallback
-        if not species_info and "species_name" in creature:
-            species_name = creature.get("species_name", "").lower()
-            for sid, data in SPECIES_DATA.items():
-                if data["name"].lower() == species_name:
-                    species_info = data
-                    species_id = sid
-                    break
-        
-        # If still not found, use default
-        if not species_info:
-            species_info = SPECIES_DATA[1]  # Default to Bullx
-            species_id = 1
+        # Get species info (by id, then by name, default Bullx)
+        species_info = find_species(creature.get("species_id", 1),
+                                    creature.get("species_name")) or DEFAULT_SPECIES
         
         # Get preferred token
-        token_symbol = species_info.get("preferred_token", "XRD")
+        token_symbol = species_info.preferred_token
         
         # Get form (ensure it's an integer)
         form = 0
@@ -1254,20 +895,15 @@ def calculate_upgrade_cost(creature, energy=0, strength=0, magic=0, stamina=0, s
         except (ValueError, TypeError):
             form = 0
         
-        # Default stat price if not specified
-        stat_price = species_info.get("stat_price", 50)
+        # Precomputed Decimal price table
+        stat_price = species_info.stat_price
         
         # For final form (form 3), cost is stat_price * total points
         if form == 3:
             total_points = energy + strength + magic + stamina + speed
             raw_cost = stat_price * total_points
         else:
-            # Get evolution prices
-            evolution_prices = species_info.get("evolution_prices", [50, 100, 200])
-            if form < len(evolution_prices):
-                evolution_price = evolution_prices[form]
-            else:
-                evolution_price = evolution_prices[-1]
+            evolution_price = species_info.evolution_price(form)
             
             # Get upgrade number (default to 0 if missing)
             upgrades_completed = 0
@@ -1281,31 +917,23 @@ def calculate_upgrade_cost(creature, energy=0, strength=0, magic=0, stamina=0, s
             
             # Cost increases with each upgrade (10%, 20%, 30% of evolution price)
             percentage = Decimal('0.1') * (upgrades_completed + 1)  # Use Decimal for precision
-            raw_cost = Decimal(str(evolution_price)) * percentage
+            raw_cost = evolution_price * percentage
         
         # Handle different token types with proper decimal formatting
         if token_symbol in ["FLOOP", "CASSIE"]:
             # For tokens that support small decimal amounts, ensure proper formatting
             # Minimum cost and proper decimal places
             min_cost = Decimal('0.001')
-            if isinstance(raw_cost, (int, float)):
-                decimal_cost = Decimal(str(raw_cost))
-            else:
-                decimal_cost = Decimal(raw_cost)
-                
-            final_cost = max(min_cost, decimal_cost)
+            final_cost = max(min_cost, raw_cost)
             # Format with up to 8 decimal places for precision tokens
             formatted_amount = format_decimal_for_manifest(final_cost, 8)
         else:
             # For most tokens, round to integers with minimum of 1
-            if isinstance(raw_cost, Decimal):
-                integer_cost = int(raw_cost.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
-            else:
-                integer_cost = int(round(float(raw_cost)))
+            integer_cost = int(raw_cost.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
             final_cost = max(1, integer_cost)
             formatted_amount = str(final_cost)
         
-        print(f"Calculated cost for {species_info['name']} (form {form}): {formatted_amount} {token_symbol}")
+        print(f"Calculated cost for {species_info.name} (form {form}): {formatted_amount} {token_symbol}")
         print(f"Raw calculation: {raw_cost}")
             
         return {
@@ -1331,30 +959,9 @@ def calculate_evolution_cost(creature):
             print("Warning: No creature data provided for evolution cost calculation")
             return {"can_evolve": False, "reason": "No creature data provided"}
             
-        # Get species info
-        species_id = None
-        try:
-            # Ensure species_id is an integer
-            species_id = int(creature.get("species_id", 1))
-        except (ValueError, TypeError):
-            # If conversion fails, try to use the value directly
-            species_id = creature.get("species_id", 1)
-            
-        species_info = SPECIES_DATA.get(species_id)
-        
-        # If not found by ID, try by name as a fallback
-        if not species_info and "species_name" in creature:
-            species_name = creature.get("species_name", "").lower()
-            for sid, data in SPECIES_DATA.items():
-                if data["name"].lower() == species_name:
-                    species_info = data
-                    species_id = sid
-                    break
-        
-        # If still not found, use default
-        if not species_info:
-            species_info = SPECIES_DATA[1]  # Default to Bullx
-            species_id = 1
+        # Get species info (by id, then by name, default Bullx)
+        species_info = find_species(creature.get("species_id", 1),
+                                    creature.get("species_name")) or DEFAULT_SPECIES
         
         # Get form (ensure it's an integer)
         form = 0
@@ -1386,18 +993,13 @@ def calculate_evolution_cost(creature):
             }
         
         # Get preferred token
-        token_symbol = species_info.get("preferred_token", "XRD")
+        token_symbol = species_info.preferred_token
         
-        # Get evolution prices
-        evolution_prices = species_info.get("evolution_prices", [50, 100, 200])
-        if form < len(evolution_prices):
-            evolution_price = evolution_prices[form]
-        else:
-            evolution_price = evolution_prices[-1]
+        evolution_price = species_info.evolution_price(form)
         
         # Fixed calculation: 60% already paid in stat upgrades, 40% remaining for evolution
         remaining_percentage = Decimal('0.4')  # Fixed at 40% for the evolution step
-        raw_cost = Decimal(str(evolution_price)) * remaining_percentage
+        raw_cost = evolution_price * remaining_percentage
         
         # Handle different token types with proper decimal formatting
         if token_symbol in ["FLOOP", "CASSIE"]:
@@ -1412,7 +1014,7 @@ def calculate_evolution_cost(creature):
             final_cost = max(1, integer_cost)
             formatted_amount = str(final_cost)
         
-        print(f"Calculated evolution cost for {species_info['name']} (form {form}): {formatted_amount} {token_symbol}")
+        print(f"Calculated evolution cost for {species_info.name} (form {form}): {formatted_amount} {token_symbol}")
         print(f"Base evolution price: {evolution_price}, Fixed remaining: 40%")
             
         return {
@@ -1879,14 +1481,9 @@ CALL_METHOD
 def get_transaction_status(intent_hash):
     """Check the status of a transaction using the Gateway API."""
     try:
-        url = "https://mainnet.radixdlt.com/transaction/status"
         payload = {"intent_hash": intent_hash}
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
-        }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
+        response = GATEWAY.post("/transaction/status", payload, timeout=15)
         
         if response.status_code != 200:
             print(f"Gateway API error: Status {response.status_code}")
@@ -1904,144 +1501,173 @@ def get_transaction_status(intent_hash):
         return {"status": "Error", "error": str(e)}
 
 # Function to fetch NFT details from transaction
-def get_minted_nfts_from_transaction(intent_hash):
+def _find_minted_nfids(intent_hash):
     """
-    Get minted NFTs from a transaction using the Gateway API.
-    Returns: Tuple of (creature_nft, bonus_item) with complete data
+    Read the committed transaction and pick out the minted NFIDs.
+    Returns: (creature_id, bonus_item_id, bonus_item_type) or None on gateway error
     """
+    payload = {
+        "intent_hash": intent_hash,
+        "opt_ins": {
+            "balance_changes": True,
+            "non_fungible_changes": True
+        }
+    }
+    
+    response = GATEWAY.post("/transaction/committed-details", payload, timeout=15)
+    
+    if response.status_code != 200:
+        print(f"Gateway API error: Status {response.status_code}")
+        return None
+    
+    data = response.json()
+    
+    # Index the minted NFTs right away so listings see them before the next sync
     try:
-        # NFT resource addresses
-        creature_resource = "resource_rdx1ntq7xkr0345fz8hkkappg2xsnepuj94a9wnu287km5tswu3323sjnl"
-        tool_resource = "resource_rdx1ntg0wsnuxq05z75f2jy7k20w72tgkt4crmdzcpyfvvgte3uvr9d5f0"
-        spell_resource = "resource_rdx1nfjm7ecgxk4m54pyy3mc75wgshh9usmyruy5rx7gkt3w2megc9s8jf"
+        record_balance_changes(data.get("transaction") or {})
+    except Exception as e:
+        print(f"Error recording minted NFTs in ownership index: {e}")
+    
+    creature_id = None
+    bonus_item_id = None
+    bonus_item_type = None
+    
+    for change in data.get("non_fungible_changes", []):
+        resource_address = change.get("resource_address")
+        operation = change.get("operation")
         
-        # Check if transaction is committed
-        status_data = get_transaction_status(intent_hash)
-        if status_data.get("status") != "CommittedSuccess":
-            print(f"Transaction not completed yet: {status_data}")
-            return None, None
+        # Only look at deposit operations (NFTs being received)
+        if operation != "DEPOSIT":
+            continue
         
-        # Get transaction details
-        url = "https://mainnet.radixdlt.com/transaction/committed-details"
-        payload = {
-            "intent_hash": intent_hash,
-            "opt_ins": {
-                "balance_changes": True,
-                "non_fungible_changes": True
-            }
+        nft_ids = change.get("non_fungible_ids", [])
+        if not nft_ids:
+            continue
+            
+        if resource_address == CREATURE_NFT_RESOURCE:
+            # This is a creature NFT
+            creature_id = nft_ids[0]
+        elif resource_address == TOOL_NFT_RESOURCE:
+            # This is a tool NFT
+            bonus_item_id = nft_ids[0]
+            bonus_item_type = "tool"
+        elif resource_address == SPELL_NFT_RESOURCE:
+            # This is a spell NFT
+            bonus_item_id = nft_ids[0]
+            bonus_item_type = "spell"
+    
+    return creature_id, bonus_item_id, bonus_item_type
+
+def _build_bonus_item(bonus_item_id, bonus_item_type, raw_bonus_data):
+    """Shape raw tool/spell data the way the mint screen expects it."""
+    image_url = raw_bonus_data.get("key_image_url", "")
+    
+    if bonus_item_type == "tool":
+        return {
+            "id": bonus_item_id,
+            "name": raw_bonus_data.get("tool_name", "Unknown Tool"),
+            "type": "tool",
+            "image_url": image_url,
+            "tool_type": raw_bonus_data.get("tool_type", ""),
+            "tool_effect": raw_bonus_data.get("tool_effect", "")
         }
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'CorvaxLab Game/1.0'
+    
+    return {
+        "id": bonus_item_id,
+        "name": raw_bonus_data.get("spell_name", "Unknown Spell"),
+        "type": "spell",
+        "image_url": image_url,
+        "spell_type": raw_bonus_data.get("spell_type", ""),
+        "spell_effect": raw_bonus_data.get("spell_effect", "")
+    }
+
+def fetch_minted_nfts(intent_hash):
+    """
+    Resolve the NFTs minted by a committed transaction without any fallbacks.
+    The creature and bonus item are read in one pinned-state fetch.
+    Returns: (creature_nft, bonus_item, complete) – `complete` is True only
+    when every minted NFT was resolved to real on-ledger data.
+    """
+    ids = _find_minted_nfids(intent_hash)
+    if ids is None:
+        return None, None, False
+    
+    creature_id, bonus_item_id, bonus_item_type = ids
+    bonus_resource = TOOL_NFT_RESOURCE if bonus_item_type == "tool" else SPELL_NFT_RESOURCE
+    
+    wanted = {}
+    if creature_id:
+        wanted[CREATURE_NFT_RESOURCE] = [creature_id]
+    if bonus_item_id and bonus_item_type:
+        wanted.setdefault(bonus_resource, []).append(bonus_item_id)
+    
+    data = fetch_nft_data_multi(wanted)
+    
+    creature_nft = None
+    bonus_item = None
+    
+    creature_data = data.get(CREATURE_NFT_RESOURCE, {})
+    if creature_id and creature_id in creature_data:
+        creature_nft = process_creature_data(creature_id, creature_data[creature_id])
+    
+    bonus_data = data.get(bonus_resource, {})
+    if bonus_item_id and bonus_item_id in bonus_data:
+        bonus_item = _build_bonus_item(bonus_item_id, bonus_item_type, bonus_data[bonus_item_id])
+    
+    complete = (
+        creature_id is not None
+        and creature_nft is not None
+        and (bonus_item_id is None or bonus_item is not None)
+    )
+    
+    # Keep the NFIDs around so callers can still build placeholders
+    if creature_nft is None and creature_id:
+        creature_nft = {"id": creature_id, "_unresolved": True}
+    if bonus_item is None and bonus_item_id:
+        bonus_item = {"id": bonus_item_id, "type": bonus_item_type, "_unresolved": True}
+    
+    return creature_nft, bonus_item, complete
+
+def _with_mint_fallbacks(creature_nft, bonus_item):
+    """Replace entries fetch_minted_nfts could not resolve with placeholder data."""
+    if creature_nft and creature_nft.get("_unresolved"):
+        creature_nft = {
+            "id": creature_nft["id"],
+            "species_name": "Random Creature",
+            "rarity": "Unknown",
+            "image_url": "https://cvxlab.net/assets/evolving_creatures/bullx_egg.png"
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"Gateway API error: Status {response.status_code}")
-            return None, None
-        
-        data = response.json()
-        
-        # Extract NFT IDs from non-fungible changes
-        creature_nft = None
-        bonus_item = None
-        non_fungible_changes = data.get("non_fungible_changes", [])
+    if bonus_item and bonus_item.get("_unresolved"):
+        bonus_item_type = bonus_item.get("type")
+        bonus_item = {
+            "id": bonus_item["id"],
+            "name": f"Mystery {bonus_item_type.capitalize() if bonus_item_type else 'Item'}",
+            "type": bonus_item_type or "unknown",
+            "image_url": "https://cvxlab.net/assets/tools/babylon_keystone.png"
+        }
+    
+    return creature_nft, bonus_item
+
+def get_minted_nfts_from_transaction(intent_hash, check_status=True):
+    """
+    Get minted NFTs from a transaction using the Gateway API.
+    Pass check_status=False when the caller already knows the transaction
+    is CommittedSuccess.
+    Returns: Tuple of (creature_nft, bonus_item) with complete data
+    """
+    try:
+        # Check if transaction is committed
+        if check_status:
+            status_data = get_transaction_status(intent_hash)
+            if status_data.get("status") != "CommittedSuccess":
+                print(f"Transaction not completed yet: {status_data}")
+                return None, None
         
-        creature_id = None
-        bonus_item_id = None
-        bonus_item_type = None
+        creature_nft, bonus_item, _ = fetch_minted_nfts(intent_hash)
         
-        # First, find the NFT IDs
-        for change in non_fungible_changes:
-            resource_address = change.get("resource_address")
-            operation = change.get("operation")
-            
-            # Only look at deposit operations (NFTs being received)
-            if operation != "DEPOSIT":
-                continue
-                
-            if resource_address == creature_resource:
-                # This is a creature NFT
-                nft_ids = change.get("non_fungible_ids", [])
-                if nft_ids:
-                    creature_id = nft_ids[0]
-            
-            elif resource_address == tool_resource:
-                # This is a tool NFT
-                nft_ids = change.get("non_fungible_ids", [])
-                if nft_ids:
-                    bonus_item_id = nft_ids[0]
-                    bonus_item_type = "tool"
-                    
-            elif resource_address == spell_resource:
-                # This is a spell NFT
-                nft_ids = change.get("non_fungible_ids", [])
-                if nft_ids:
-                    bonus_item_id = nft_ids[0]
-                    bonus_item_type = "spell"
-        
-        # Now, fetch the actual NFT data for the creature
-        if creature_id:
-            creature_data = fetch_nft_data(creature_resource, [creature_id])
-            if creature_data and creature_id in creature_data:
-                raw_data = creature_data[creature_id]
-                creature_nft = process_creature_data(creature_id, raw_data)
-        
-        # Fetch the bonus item data
-        if bonus_item_id and bonus_item_type:
-            resource_address = tool_resource if bonus_item_type == "tool" else spell_resource
-            bonus_data = fetch_nft_data(resource_address, [bonus_item_id])
-            
-            if bonus_data and bonus_item_id in bonus_data:
-                raw_bonus_data = bonus_data[bonus_item_id]
-                
-                # Process tool or spell data
-                if bonus_item_type == "tool":
-                    image_url = raw_bonus_data.get("key_image_url", "")
-                    name = raw_bonus_data.get("tool_name", "Unknown Tool")
-                    tool_type = raw_bonus_data.get("tool_type", "")
-                    tool_effect = raw_bonus_data.get("tool_effect", "")
-                    
-                    bonus_item = {
-                        "id": bonus_item_id,
-                        "name": name,
-                        "type": "tool",
-                        "image_url": image_url,
-                        "tool_type": tool_type,
-                        "tool_effect": tool_effect
-                    }
-                else:  # spell
-                    image_url = raw_bonus_data.get("key_image_url", "")
-                    name = raw_bonus_data.get("spell_name", "Unknown Spell")
-                    spell_type = raw_bonus_data.get("spell_type", "")
-                    spell_effect = raw_bonus_data.get("spell_effect", "")
-                    
-                    bonus_item = {
-                        "id": bonus_item_id,
-                        "name": name,
-                        "type": "spell",
-                        "image_url": image_url,
-                        "spell_type": spell_type,
-                        "spell_effect": spell_effect
-                    }
-                
         # If we couldn't get the actual data, create fallback data
-        if not creature_nft and creature_id:
-            creature_nft = {
-                "id": creature_id,
-                "species_name": "Random Creature",
-                "rarity": "Unknown",
-                "image_url": "https://cvxlab.net/assets/evolving_creatures/bullx_egg.png"
-            }
-            
-        if not bonus_item and bonus_item_id:
-            bonus_item = {
-                "id": bonus_item_id,
-                "name": f"Mystery {bonus_item_type.capitalize() if bonus_item_type else 'Item'}",
-                "type": bonus_item_type or "unknown",
-                "image_url": "https://cvxlab.net/assets/tools/babylon_keystone.png"
-            }
+        creature_nft, bonus_item = _with_mint_fallbacks(creature_nft, bonus_item)
             
         return creature_nft, bonus_item
     
@@ -2050,6 +1676,100 @@ def get_minted_nfts_from_transaction(intent_hash):
         traceback.print_exc()
         return None, None
 
+# ──────────────────────────────────────────────────────────────
+# Minted-NFT cache: intent hash → (creature, bonus item)
+#
+# A committed transaction's result never changes, so it is resolved once by
+# a background worker and stored in SQLite.  Every later poll for the same
+# intent hash is answered from the table with zero gateway calls.
+# ──────────────────────────────────────────────────────────────
+MINT_RESOLVE_WAIT_SECONDS = 12
+MINT_RESOLVER = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mint-resolver")
+_mint_resolving = {}                 # intent_hash -> Future (one job per hash)
+_mint_resolving_lock = threading.Lock()
+
+def get_cached_minted_nfts(intent_hash):
+    """Return the cached (transaction_status, creature_nft, bonus_item) or None."""
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT transaction_status, creature_nft, bonus_item
+            FROM minted_nft_cache
+            WHERE intent_hash = ?
+        """, (intent_hash,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        return (
+            json.loads(row['transaction_status']),
+            json.loads(row['creature_nft']) if row['creature_nft'] else None,
+            json.loads(row['bonus_item']) if row['bonus_item'] else None
+        )
+    except Exception as e:
+        print(f"Error reading minted_nft_cache: {e}")
+        return None
+
+def store_minted_nfts(intent_hash, status_data, creature_nft, bonus_item):
+    """Persist a resolved mint.  Rows are immutable – the first write wins."""
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT OR IGNORE INTO minted_nft_cache
+            (intent_hash, transaction_status, creature_nft, bonus_item, resolved_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            intent_hash,
+            json.dumps(status_data),
+            json.dumps(creature_nft) if creature_nft else None,
+            json.dumps(bonus_item) if bonus_item else None,
+            int(time.time() * 1000)
+        ))
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error writing minted_nft_cache: {e}")
+
+def _resolve_minted_nfts_job(intent_hash, status_data):
+    """Background job: resolve a committed mint and cache it if complete."""
+    try:
+        creature_nft, bonus_item, complete = fetch_minted_nfts(intent_hash)
+        if complete:
+            store_minted_nfts(intent_hash, status_data, creature_nft, bonus_item)
+        return creature_nft, bonus_item
+    finally:
+        with _mint_resolving_lock:
+            _mint_resolving.pop(intent_hash, None)
+
+def resolve_minted_nfts(intent_hash, status_data, wait=MINT_RESOLVE_WAIT_SECONDS):
+    """
+    Resolve the NFTs of a CommittedSuccess transaction through the background
+    resolver.  Concurrent polls for the same hash share one job.
+    Returns: (creature_nft, bonus_item), either may be None if not ready yet
+    or carry "_unresolved" when the gateway had no data for it.
+    """
+    with _mint_resolving_lock:
+        future = _mint_resolving.get(intent_hash)
+        if future is None:
+            future = MINT_RESOLVER.submit(_resolve_minted_nfts_job, intent_hash, status_data)
+            _mint_resolving[intent_hash] = future
+    
+    try:
+        return future.result(timeout=wait)
+    except FutureTimeoutError:
+        print(f"Mint resolution for {intent_hash} still running")
+        return None, None
+    except Exception as e:
+        print(f"Error resolving minted NFTs: {e}")
+        traceback.print_exc()
+        return None, None
+
 def verify_telegram_login(query_dict, bot_token):
     try:
         their_hash = query_dict.pop("hash", None)
@@ -2163,6 +1883,13 @@ def whoami():
         traceback.print_exc()
         return jsonify({"error": "Server error"}), 500
 
+@app.route("/api/idempotencyStats")
+def idempotency_stats():
+    """Replays, executions and evictions of the idempotency store (idempotency.py)"""
+    if 'telegram_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    return jsonify(IDEMPOTENCY.stats())
+
 @app.route("/api/machines", methods=["GET"])
 def get_machines():
     try:
@@ -2910,6 +2637,43 @@ def process_spell_data(nft_id: str, pj_raw) -> dict:
         "version": pj.get("version", 1)
     }
 
+def _resolve_account_address(user_id):
+    """
+    Account to read NFTs from: POST body, then query string, then the
+    address stored for the user.  Returns None when none is known.
+    """
+    account_address = None
+    
+    # 1. First try request body (POST)
+    if request.method == "POST" and request.json:
+        account_address = request.json.get("accountAddress")
+        print(f"Using account address from POST body: {account_address}")
+        
+    # 2. Then try query parameters (GET)
+    if not account_address and request.args:
+        account_address = request.args.get("accountAddress")
+        print(f"Using account address from URL params: {account_address}")
+        
+    # 3. Finally try stored account
+    if not account_address:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        cur.execute("""
+            SELECT radix_account_address FROM users 
+            WHERE user_id = ? AND radix_account_address IS NOT NULL
+        """, (user_id,))
+        
+        row = cur.fetchone()
+        if row:
+            account_address = row['radix_account_address']
+            print(f"Using stored account address: {account_address}")
+        
+        cur.close()
+        conn.close()
+    
+    return account_address
+
 @app.route("/api/getUserItems", methods=["GET", "POST"])
 def get_user_items():
     """
@@ -2921,36 +2685,7 @@ def get_user_items():
 
         user_id = session['telegram_id']
         
-        # Get account address - prioritize different sources
-        account_address = None
-        
-        # 1. First try request body (POST)
-        if request.method == "POST" and request.json:
-            account_address = request.json.get("accountAddress")
-            print(f"Using account address from POST body: {account_address}")
-            
-        # 2. Then try query parameters (GET)
-        if not account_address and request.args:
-            account_address = request.args.get("accountAddress")
-            print(f"Using account address from URL params: {account_address}")
-            
-        # 3. Finally try stored account
-        if not account_address:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            cur.execute("""
-                SELECT radix_account_address FROM users 
-                WHERE user_id = ? AND radix_account_address IS NOT NULL
-            """, (user_id,))
-            
-            row = cur.fetchone()
-            if row:
-                account_address = row['radix_account_address']
-                print(f"Using stored account address: {account_address}")
-            
-            cur.close()
-            conn.close()
+        account_address = _resolve_account_address(user_id)
         
         # If still no account address, return empty list
         if not account_address:
@@ -3022,6 +2757,7 @@ def dismiss_room_unlock():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route("/api/buildMachine", methods=["POST"])
+@idempotent
 def build_machine():
     try:
         if 'telegram_id' not in session:
@@ -3485,6 +3221,7 @@ def check_mint_status():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route("/api/activateMachine", methods=["POST"])
+@idempotent
 def activate_machine():
     try:
         if 'telegram_id' not in session:
@@ -4054,6 +3791,7 @@ def move_pet():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route("/api/buyEnergy", methods=["POST"])
+@idempotent
 def buy_energy():
     try:
         if 'telegram_id' not in session:
@@ -4086,6 +3824,7 @@ def buy_energy():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route("/api/confirmEnergyPurchase", methods=["POST"])
+@idempotent
 def confirm_energy_purchase():
     try:
         if 'telegram_id' not in session:
@@ -4207,26 +3946,9 @@ def check_xrd_balance():
         
         print(f"Checking XRD balance for account: {account_address}")
         
-        # Try up to 2 times to fetch the XRD balance
-        max_attempts = 2
-        xrd_balance = 0
-        
-        for attempt in range(max_attempts):
-            try:
-                # Fetch XRD balance using the improved Gateway API function
-                xrd_balance = fetch_xrd_balance(account_address)
-                
-                if xrd_balance > 0:
-                    # We got a positive balance, no need for more attempts
-                    break
-                    
-                if attempt < max_attempts - 1:
-                    print(f"First attempt returned {xrd_balance} XRD, retrying...")
-                    time.sleep(1)  # Short delay before retry
-            except Exception as e:
-                print(f"Attempt {attempt+1} failed: {str(e)}")
-                if attempt < max_attempts - 1:
-                    time.sleep(1)  # Short delay before retry
+        # The gateway client serves the last known balance during outages,
+        # so there is no need to retry (and sleep) here
+        xrd_balance = fetch_xrd_balance(account_address, data.get("forceRefresh", False))
         
         # Check if the user has enough XRD (250 XRD required for minting)
         has_enough_xrd = xrd_balance >= 250
@@ -4295,6 +4017,17 @@ def check_creature_mint_status():
         if not intent_hash:
             return jsonify({"error": "Missing transaction intent hash"}), 400
         
+        # Committed mints are immutable – answer repeat polls from the cache
+        cached = get_cached_minted_nfts(intent_hash)
+        if cached:
+            status_data, creature_nft, bonus_item = cached
+            return jsonify({
+                "status": "ok",
+                "transactionStatus": status_data,
+                "creatureNft": creature_nft,
+                "bonusItem": bonus_item
+            })
+        
         # Get transaction status
         status_data = get_transaction_status(intent_hash)
         
@@ -4303,8 +4036,10 @@ def check_creature_mint_status():
         bonus_item = None
         
         if status_data.get("status") == "CommittedSuccess":
-            # Try to get NFT details from the transaction
-            creature_nft, bonus_item = get_minted_nfts_from_transaction(intent_hash)
+            # Resolve (once) through the background resolver
+            creature_nft, bonus_item = _with_mint_fallbacks(
+                *resolve_minted_nfts(intent_hash, status_data)
+            )
             
             # If we couldn't get the actual NFTs, create placeholder data
             if not creature_nft:
@@ -4402,6 +4137,10 @@ def diagnose_nft_fetch():
         return jsonify({"status": "error", "error": str(exc)}), 500
 
 
+def creature_sort_key(creature):
+    """Listing order key: rarity then form, highest first (use with reverse=True)"""
+    return (RARITY_SCORES.get(creature.get("rarity", "Common"), 1), creature.get("form", 0))
+
 @app.route("/api/getUserCreatures", methods=["GET", "POST"])
 def get_user_creatures():
     """
@@ -4414,36 +4153,7 @@ def get_user_creatures():
 
         user_id = session['telegram_id']
         
-        # Get account address - prioritize different sources
-        account_address = None
-        
-        # 1. First try request body (POST)
-        if request.method == "POST" and request.json:
-            account_address = request.json.get("accountAddress")
-            print(f"Using account address from POST body: {account_address}")
-            
-        # 2. Then try query parameters (GET)
-        if not account_address and request.args:
-            account_address = request.args.get("accountAddress")
-            print(f"Using account address from URL params: {account_address}")
-            
-        # 3. Finally try stored account
-        if not account_address:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            cur.execute("""
-                SELECT radix_account_address FROM users 
-                WHERE user_id = ? AND radix_account_address IS NOT NULL
-            """, (user_id,))
-            
-            row = cur.fetchone()
-            if row:
-                account_address = row['radix_account_address']
-                print(f"Using stored account address: {account_address}")
-            
-            cur.close()
-            conn.close()
+        account_address = _resolve_account_address(user_id)
         
         # If still no account address, return empty list
         if not account_address:
@@ -4479,21 +4189,7 @@ def get_user_creatures():
         print(f"Processed {len(all_creatures)} creatures for account {account_address}")
         
         # Sort creatures by rarity and form (highest first)
-        def get_rarity_score(creature):
-            rarity = creature.get("rarity", "Common")
-            if rarity == "Legendary":
-                return 4
-            elif rarity == "Epic":
-                return 3
-            elif rarity == "Rare":
-                return 2
-            else:
-                return 1
-                
-        all_creatures.sort(
-            key=lambda c: (get_rarity_score(c), c.get("form", 0)), 
-            reverse=True
-        )
+        all_creatures.sort(key=creature_sort_key, reverse=True)
         
         return jsonify({"creatures": all_creatures})
         
@@ -4502,6 +4198,62 @@ def get_user_creatures():
         traceback.print_exc()
         return jsonify({"error": f"Server error: {str(e)}"}), 500
     
+@app.route("/api/getUserCreatures/stream", methods=["GET", "POST"])
+def stream_user_creatures():
+    """
+    Streaming variant of /api/getUserCreatures.
+
+    Emits newline-delimited JSON as each gateway page is decoded, so the
+    client can render the first creatures while later pages are still in
+    flight and the server never holds the whole collection:
+
+        {"type": "start", "total": 120}
+        {"type": "creature", "creature": {...}, "sortKey": [4, 3]}
+        ...
+        {"type": "end", "count": 120}
+
+    Creatures arrive in ledger order; sort by `sortKey` (descending) to get
+    the same order as the non-streaming endpoint.  A failure after the
+    stream has started is reported as {"type": "error", "error": ...}.
+    """
+    try:
+        if 'telegram_id' not in session:
+            return jsonify({"error": "Not logged in"}), 401
+
+        user_id = session['telegram_id']
+        account_address = _resolve_account_address(user_id)
+        nft_ids = get_account_nfids(account_address, CREATURE_NFT_RESOURCE) if account_address else []
+        selector = _pinned_ledger_selector() if nft_ids else None
+    except Exception as e:
+        print(f"Error in stream_user_creatures: {e}")
+        traceback.print_exc()
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+    def generate():
+        yield json.dumps({"type": "start", "total": len(nft_ids)}) + "\n"
+        count = 0
+        try:
+            if nft_ids:
+                for page in _iter_nft_data_pages(selector, CREATURE_NFT_RESOURCE, nft_ids, 100):
+                    for nft_id, raw_data in page:
+                        creature = process_creature_data(nft_id, raw_data)
+                        count += 1
+                        yield json.dumps({
+                            "type": "creature",
+                            "creature": creature,
+                            "sortKey": creature_sort_key(creature),
+                        }) + "\n"
+        except Exception as e:
+            print(f"Error streaming creatures for {account_address}: {e}")
+            traceback.print_exc()
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        print(f"Streamed {count} creatures for account {account_address}")
+        yield json.dumps({"type": "end", "count": count}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/api/dumpFirstEgg", methods=["POST"])
 def dump_first_egg():
     """
@@ -4702,26 +4454,9 @@ def check_token_balance():
         
         print(f"Checking {token_symbol} balance for account: {account_address}")
         
-        # Try up to 2 times to fetch the token balance
-        max_attempts = 2
-        token_balance = 0
-        
-        for attempt in range(max_attempts):
-            try:
-                # Fetch token balance using the Gateway API function
-                token_balance = fetch_token_balance(account_address, token_symbol)
-                
-                if token_balance > 0:
-                    # We got a positive balance, no need for more attempts
-                    break
-                    
-                if attempt < max_attempts - 1:
-                    print(f"First attempt returned {token_balance} {token_symbol}, retrying...")
-                    time.sleep(1)  # Short delay before retry
-            except Exception as e:
-                print(f"Attempt {attempt+1} failed: {str(e)}")
-                if attempt < max_attempts - 1:
-                    time.sleep(1)  # Short delay before retry
+        # The gateway client serves the last known balance during outages,
+        # so there is no need to retry (and sleep) here
+        token_balance = fetch_token_balance(account_address, token_symbol, force_refresh)
         
         # Prepare diagnostic info
         status_message = "Balance check successful"
@@ -0,0 +1,137 @@
+"""
+Storage codec for pvp_battles.battle_state.
+
+Rows are self-describing, so the format can change without migrating the
+table:
+
+    str                       legacy: base64(gzip(json)) or plain JSON text
+    b"\\x01" + zlib stream     v1: compact JSON deflated with ZDICT_V1 as the
+                              preset dictionary
+
+The preset dictionary holds the keys and values nearly every battle shares
+(creature fields, image URL prefixes, log wording), which is most of what
+is left once the creature stats are taken out.  It was produced with
+`python bench_battle_codec.py --train`; a dictionary can never change once
+rows use it, so a new one needs a new version byte.
+
+pvp_battle_state.compress_battle_state / decompress_battle_state are the
+entry points the routes use.
+"""
+import base64
+import binascii
+import gzip
+import json
+import zlib
+from typing import Dict, Union
+
+CODEC_V1 = 1
+CURRENT_VERSION = CODEC_V1
+ZLIB_LEVEL = 6
+
+# Frozen: rows written with version 1 need exactly these bytes to decode
+ZDICT_V1 = (
+    b'"defenseBonus":,"isDefending":true,"species_name":"Moxer","preferred_token":"MOX"'
+    b',"species_name":"Hodlphant","preferred_token":"RBX","species_name":"Bullx"'
+    b',"preferred_token":"OCI","species_name":"Ocitrup","preferred_token":"DELIVER"'
+    b',"species_name":"Delivera","species_name":"Reddix","preferred_token":"REDDICKS"'
+    b',"species_name":"Earlybyte","preferred_token":"EARLY","species_name":"Dan"'
+    b',"preferred_token":"DAN","species_name":"Ilispect","preferred_token":"ILIS"'
+    b',"species_name":"Flooper","preferred_token":"FLOOP","species_name":"Corvax"'
+    b',"species_name":"Ocipod","species_name":"Minermole","species_name":"Satoshium"'
+    b',"preferred_token":"EDGE","species_name":"Edge","species_name":"Hugbloom"'
+    b',"preferred_token":"HUG","preferred_token":"HIT","species_name":"Hitter"'
+    b',"species_name":"Wowori","preferred_token":"WOWO","preferred_token":"FOMO"'
+    b',"species_name":"Fomotron","species_name":"Delayer","preferred_token":"DELAY"'
+    b',"tool_effect":"Drain","species_name":"Etherion","tool_effect":"Echo"'
+    b',"spell_effect":"Surge","species_name":"Cvxling","species_name":"Xerdian"'
+    b',"tool_type":"energy","species_name":"Cudoge","preferred_token":"DGC"'
+    b',"tool_type":"stamina","tool_type":"speed","spell_type":"speed"'
+    b',"preferred_token":"CASSIE","species_name":"Cassie","spell_effect":"Drain"'
+    b',"spell_type":"magic","tool_effect":"Charge","tool_effect":"Surge"'
+    b',"spell_type":"strength","spell_effect":"Echo","tool_type":"strength"'
+    b',"spell_type":"energy","tool_type":"magic","spell_effect":"Charge"'
+    b',"spell_effect":"Shield","tool_effect":"Shield","spell_type":"stamina"'
+    b',"name":"Babylon Drain","name":"Babylon Surge","name":"Babylon Echo"'
+    b',"name":"Babylon Charge","name":"Babylon Shield","isDefending":false'
+    b',"preferred_token":"XRD","rarity":"Legendary","isDefending":,"rarity":"Epic"'
+    b',"display_form":"Egg","image_url":"https://cvxlab.net/assets/tools/'
+    b',"display_form":"Form 1","tool_effect":,"type":"tool","tool_type":,"type":"spell"'
+    b',"image_url":"https://cvxlab.net/assets/spells/,"preferred_token":"CVX"'
+    b',"spell_effect":,"spell_type":,"display_form":"Form 3","evolution_progress":null'
+    b',"display_form":"Form 2","rarity":"Rare","rarity":"Common","message":'
+    b',"energy_allocated":'
+    b',"key_image_url":"https://cvxlab.net/assets/evolving_creatures/,"species_name":'
+    b',"initiative":,"name":,"player1":,"currentHealth":,"energy":,"hand":,"battleLog":'
+    b',"evolution_progress":,"physicalAttack":,"activePlayer":,"display_form":'
+    b',"criticalChance":,"bonus_stats":,"display_combination":"","strength_allocated":'
+    b',"player2":,"battleStats":,"preferred_token":,"speed_allocated":,"image_url":'
+    b',"display_stats":,"dodgeChance":,"key_image_url":,"type":,"version":,"speed":'
+    b',"species_id":,"stat_upgrades_completed":,"strength":,"stats":,"magic":'
+    b',"stamina_allocated":,"display_combination":'
+    b',"image_url":"https://cvxlab.net/assets/evolving_creatures/,"id":,"spells":'
+    b',"magicalAttack":,"maxHealth":,"magic_allocated":,"turn":,"energyCost":,"form":'
+    b',"combination_level":,"tools":,"magicalDefense":,"rarity":,"final_form_upgrades":'
+    b',"deck":,"physicalDefense":,"field":,"total_points_allocated":,"stamina":'
+)
+
+
+class BattleStateDecodeError(ValueError):
+    """The stored battle_state is not in any known format"""
+
+
+def _v1_encode(state: Dict) -> bytes:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS,
+                                  zdict=ZDICT_V1)
+    return bytes((CODEC_V1,)) + compressor.compress(raw) + compressor.flush()
+
+
+def _v1_decode(payload: bytes) -> Dict:
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=ZDICT_V1)
+    raw = decompressor.decompress(payload) + decompressor.flush()
+    return json.loads(raw)
+
+
+_DECODERS = {
+    CODEC_V1: _v1_decode,
+}
+
+
+def encode_battle_state(state: Dict) -> bytes:
+    """Encode a battle state for the battle_state BLOB column"""
+    return _v1_encode(state)
+
+
+def legacy_encode(state: Dict) -> str:
+    """The pre-codec TEXT format (kept for benchmarks and tooling)"""
+    return base64.b64encode(gzip.compress(json.dumps(state).encode("utf-8"))).decode("utf-8")
+
+
+def _legacy_decode(text: str) -> Dict:
+    stripped = text.lstrip()
+    if stripped.startswith("{"):
+        return json.loads(stripped)
+    try:
+        return json.loads(gzip.decompress(base64.b64decode(text.encode("utf-8"), validate=True)))
+    except (binascii.Error, OSError, EOFError, ValueError) as e:
+        raise BattleStateDecodeError(f"unreadable legacy battle state: {e}") from e
+
+
+def decode_battle_state(stored: Union[bytes, bytearray, memoryview, str]) -> Dict:
+    """Decode a battle_state value in any format this module has written"""
+    if isinstance(stored, str):
+        return _legacy_decode(stored)
+
+    data = bytes(stored)
+    if not data:
+        raise BattleStateDecodeError("empty battle state")
+    decoder = _DECODERS.get(data[0])
+    if decoder is None:
+        # A legacy TEXT value handed over as bytes
+        if data[:1] in (b"{", b"H"):
+            return _legacy_decode(data.decode("utf-8"))
+        raise BattleStateDecodeError(f"unknown battle state codec version {data[0]}")
+    try:
+        return decoder(memoryview(data)[1:])
+    except (zlib.error, ValueError) as e:
+        raise BattleStateDecodeError(f"corrupt v{data[0]} battle state: {e}") from e
@@ -0,0 +1,229 @@
+"""
+Size and speed comparison of the battle_state storage codecs.
+
+Generates battles shaped like the ones pvp_routes stores (decks of
+processed creature NFTs with battle stats, tools, spells and a battle log
+grown by playing random actions through PvPBattleState), then compares the
+legacy gzip+base64 encoding with the current battle_codec format.
+
+    python bench_battle_codec.py                 # 300 battles
+    python bench_battle_codec.py --battles 1000 --rounds 5
+
+    # print a preset dictionary candidate from generated battles
+    python bench_battle_codec.py --train
+
+Every run first checks that each codec round-trips every battle.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+from battle_codec import ZDICT_V1, decode_battle_state, encode_battle_state, legacy_encode
+from pvp_battle_state import PvPBattleState
+from species_data import SPECIES_REGISTRY
+
+STATS = ("energy", "strength", "magic", "stamina", "speed")
+ITEM_TYPES = ["energy", "strength", "magic", "stamina", "speed"]
+ITEM_EFFECTS = ["Surge", "Shield", "Echo", "Drain", "Charge"]
+
+
+def _creature(rng):
+    species = SPECIES_REGISTRY[rng.randint(1, len(SPECIES_REGISTRY))]
+    form = rng.randint(0, 3)
+    stats = {s: rng.randint(5, 20) for s in STATS}
+    max_health = rng.randint(60, 260)
+    creature = {
+        "id": f"{{{rng.getrandbits(64):016x}-{rng.getrandbits(64):016x}}}",
+        "species_id": species.id,
+        "species_name": species.name,
+        "form": form,
+        "key_image_url": species.image_url(form),
+        "image_url": species.image_url(form),
+        "rarity": species.rarity,
+        "preferred_token": species.preferred_token,
+        "stats": stats,
+        "evolution_progress": None if form == 3 else {
+            "stat_upgrades_completed": rng.randint(0, 3),
+            "total_points_allocated": rng.randint(0, 9),
+            "energy_allocated": 0, "strength_allocated": 0, "magic_allocated": 0,
+            "stamina_allocated": 0, "speed_allocated": 0,
+        },
+        "final_form_upgrades": 0,
+        "version": 1,
+        "combination_level": rng.randint(0, 2),
+        "bonus_stats": {},
+        "display_form": "Egg" if form == 0 else f"Form {form}",
+        "display_stats": ", ".join(f"{k.capitalize()}: {v}" for k, v in stats.items()),
+        "display_combination": "",
+        "battleStats": {
+            "physicalAttack": rng.randint(10, 90), "magicalAttack": rng.randint(10, 90),
+            "physicalDefense": rng.randint(5, 60), "magicalDefense": rng.randint(5, 60),
+            "maxHealth": max_health, "initiative": rng.randint(10, 50),
+            "criticalChance": rng.randint(5, 30), "dodgeChance": rng.randint(3, 20),
+            "energyCost": 5 + form,
+        },
+        "currentHealth": max_health,
+    }
+    return creature
+
+
+def _item(rng, kind):
+    item_type, effect = rng.choice(ITEM_TYPES), rng.choice(ITEM_EFFECTS)
+    return {
+        "id": f"{{{rng.getrandbits(64):016x}-{rng.getrandbits(64):016x}}}",
+        "name": f"Babylon {effect}",
+        "type": kind,
+        "image_url": f"https://cvxlab.net/assets/{kind}s/babylon_keystone.png",
+        f"{kind}_type": item_type,
+        f"{kind}_effect": effect,
+    }
+
+
+def _player(rng, user_id):
+    return {
+        "id": user_id,
+        "name": f"Player {user_id}",
+        "hand": [],
+        "field": [],
+        "deck": [_creature(rng) for _ in range(rng.randint(4, 8))],
+        "energy": 10,
+        "tools": [_item(rng, "tool") for _ in range(rng.randint(0, 3))],
+        "spells": [_item(rng, "spell") for _ in range(rng.randint(0, 3))],
+    }
+
+
+def generate_battle(rng, max_actions=None):
+    """One stored battle_state, played forward by a random number of actions"""
+    state = {
+        "turn": 1,
+        "activePlayer": 1001,
+        "player1": _player(rng, 1001),
+        "player2": _player(rng, 1002),
+        "battleLog": [],
+    }
+    for _ in range(3):
+        for key in ("player1", "player2"):
+            if state[key]["deck"]:
+                state[key]["hand"].append(state[key]["deck"].pop(0))
+
+    battle = PvPBattleState(state)
+    for _ in range(rng.randint(0, max_actions if max_actions is not None else 60)):
+        me = battle.get_player_state(battle.active_player_id)
+        foe = battle.get_opponent_state(battle.active_player_id)
+        roll = rng.random()
+        if roll < 0.3 and me.hand:
+            action = {"type": "deploy", "creatureId": rng.choice(me.hand.items).id}
+        elif roll < 0.6 and me.field and foe.field:
+            action = {"type": "attack", "attackerId": rng.choice(me.field.items).id,
+                      "targetId": rng.choice(foe.field.items).id}
+        elif roll < 0.7 and me.field:
+            action = {"type": "defend", "creatureId": rng.choice(me.field.items).id}
+        else:
+            action = {"type": "endTurn"}
+        battle.process_action(battle.active_player_id, action)
+        if battle.check_battle_end()[0]:
+            break
+    return battle.get_state()
+
+
+def generate_battles(count, seed=11):
+    rng = random.Random(seed)
+    return [generate_battle(rng) for _ in range(count)]
+
+
+def train_dictionary(states, size=4096):
+    """
+    Greedy preset dictionary: the JSON keys, URL prefixes and non-numeric
+    key/value pairs found in at least a fifth of the battles, most frequent last because
+    zlib reaches the end of the dictionary with the shortest distances.
+    Numbers are left out: stats and health differ from battle to battle.
+    """
+    counts = Counter()
+    for state in states:
+        seen = set()
+        def walk(value):
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    seen.add(json.dumps(k) + ":")
+                    if isinstance(v, str) and "/" in v:
+                        # URLs: the shared prefix, e.g. an asset directory
+                        seen.add(json.dumps({k: v[:v.rfind("/") + 1]},
+                                            separators=(",", ":"))[1:-2])
+                    elif isinstance(v, (str, bool)) or v is None:
+                        # player names and log lines are specific to one battle
+                        if isinstance(v, str) and "Player " in v:
+                            continue
+                        text = json.dumps({k: v}, separators=(",", ":"))[1:-1]
+                        if len(text) < 80:
+                            seen.add(text)
+                    walk(v)
+            elif isinstance(value, list):
+                for v in value:
+                    walk(v)
+        walk(state)
+        counts.update(seen)
+
+    fragments = [f for f, n in counts.most_common() if n >= len(states) * 0.2]
+    out, used = [], 0
+    for fragment in fragments:
+        if used + len(fragment) + 1 > size:
+            break
+        out.append(fragment)
+        used += len(fragment) + 1
+    return ",".join(reversed(out)).encode("utf-8")
+
+
+def _time(fn, items, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(states, rounds):
+    legacy_rows = [legacy_encode(s) for s in states]
+    rows = [encode_battle_state(s) for s in states]
+
+    broken = sum(1 for s, a, b in zip(states, legacy_rows, rows)
+                 if decode_battle_state(a) != s or decode_battle_state(b) != s)
+    if broken:
+        print(f"{broken}/{len(states)} battles do not round-trip – fix before benchmarking")
+        return 1
+
+    json_size = sum(len(json.dumps(s).encode("utf-8")) for s in states)
+    legacy_size = sum(len(r) for r in legacy_rows)
+    size = sum(len(r) for r in rows)
+
+    print(f"{len(states)} battles, best of {rounds} rounds, dictionary {len(ZDICT_V1)} bytes")
+    print(f"  {'':24} {'bytes/battle':>12} {'encode µs':>10} {'decode µs':>10}")
+    per = lambda t: t / len(states) * 1e6
+    print(f"  {'json (uncompressed)':24} {json_size / len(states):12.0f}")
+    print(f"  {'legacy gzip+base64':24} {legacy_size / len(states):12.0f} "
+          f"{per(_time(legacy_encode, states, rounds)):10.1f} "
+          f"{per(_time(decode_battle_state, legacy_rows, rounds)):10.1f}")
+    print(f"  {'v1 zlib+dict blob':24} {size / len(states):12.0f} "
+          f"{per(_time(encode_battle_state, states, rounds)):10.1f} "
+          f"{per(_time(decode_battle_state, rows, rounds)):10.1f}")
+    print(f"  size vs legacy            {size / legacy_size:8.2%}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--battles", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--train", action="store_true", help="print a dictionary candidate")
+    args = parser.parse_args()
+
+    states = generate_battles(args.battles)
+    if args.train:
+        print(repr(train_dictionary(states)))
+        sys.exit(0)
+    sys.exit(run(states, args.rounds))
@@ -0,0 +1,167 @@
+"""
+Micro-benchmark: generic `_unwrap` vs the `decode_programmatic_json` fast path.
+
+The corpus is a JSON list of `/state/non-fungible/data` entries exactly as the
+gateway returns them (`{"non_fungible_id": ..., "data": {"programmatic_json": ...}}`).
+
+    # record a corpus from a real account (creatures, tools and spells)
+    python bench_nft_decoder.py --record account_rdx1... --out nft_corpus.json
+
+    # benchmark a recorded corpus
+    python bench_nft_decoder.py --corpus nft_corpus.json
+
+    # benchmark a synthetic corpus in the same shape
+    python bench_nft_decoder.py --synthetic 500
+
+Every run first checks that both decoders give identical output.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from nft_decoder import _unwrap, decode_programmatic_json
+
+CREATURE_NFT_RESOURCE = "resource_rdx1ntq7xkr0345fz8hkkappg2xsnepuj94a9wnu287km5tswu3323sjnl"
+TOOL_NFT_RESOURCE = "resource_rdx1ntg0wsnuxq05z75f2jy7k20w72tgkt4crmdzcpyfvvgte3uvr9d5f0"
+SPELL_NFT_RESOURCE = "resource_rdx1nfjm7ecgxk4m54pyy3mc75wgshh9usmyruy5rx7gkt3w2megc9s8jf"
+
+
+def _s(name, value):
+    return {"kind": "String", "field_name": name, "value": value}
+
+def _u8(name, value):
+    return {"kind": "U8", "field_name": name, "value": str(value)}
+
+def _creature(rng, n):
+    form = rng.randint(0, 3)
+    stats = {"kind": "Tuple", "type_name": "CreatureStats", "field_name": "stats", "fields": [
+        _u8(stat, rng.randint(5, 20)) for stat in ("energy", "strength", "magic", "stamina", "speed")
+    ]}
+    if form == 3:
+        evo = {"kind": "Enum", "type_name": "Option", "field_name": "evolution_progress",
+               "variant_id": "0", "variant_name": "None", "fields": []}
+    else:
+        evo = {"kind": "Enum", "type_name": "Option", "field_name": "evolution_progress",
+               "variant_id": "1", "variant_name": "Some", "fields": [
+                   {"kind": "Tuple", "type_name": "EvolutionProgress", "fields": [
+                       _u8(f, rng.randint(0, 3)) for f in (
+                           "stat_upgrades_completed", "total_points_allocated", "energy_allocated",
+                           "strength_allocated", "magic_allocated", "stamina_allocated",
+                           "speed_allocated")
+                   ]}
+               ]}
+    return {"kind": "Tuple", "type_name": "CreatureData", "fields": [
+        _s("key_image_url", f"https://cvxlab.net/assets/evolving_creatures/bullx_form{form}.png"),
+        _s("species_id", str(rng.randint(1, 25))),
+        _s("species_name", "Bullx"),
+        _u8("form", form),
+        _s("image_url", f"https://cvxlab.net/assets/evolving_creatures/bullx_form{form}.png"),
+        _s("rarity", rng.choice(["Common", "Rare", "Epic", "Legendary"])),
+        stats,
+        evo,
+        _u8("final_form_upgrades", rng.randint(0, 3) if form == 3 else 0),
+        _u8("version", 1),
+        _u8("combination_level", rng.randint(0, 3)),
+        {"kind": "Tuple", "type_name": "BonusStats", "field_name": "bonus_stats", "fields": [
+            _u8(stat, 0) for stat in ("energy", "strength", "magic", "stamina", "speed")
+        ]},
+        _s("display_form", "Egg" if form == 0 else f"Form {form}"),
+        _s("display_stats", "Energy: 5, Strength: 5, Magic: 5, Stamina: 5, Speed: 5"),
+        _s("display_combination", ""),
+    ]}
+
+def _item(rng, kind):
+    return {"kind": "Tuple", "type_name": f"{kind.capitalize()}Data", "fields": [
+        _s("key_image_url", f"https://cvxlab.net/assets/{kind}s/babylon_keystone.png"),
+        _s(f"{kind}_name", f"Babylon {kind}"),
+        _s(f"{kind}_type", rng.choice(["energy", "strength", "magic", "stamina", "speed"])),
+        _s(f"{kind}_effect", rng.choice(["Surge", "Shield", "Echo", "Drain", "Charge"])),
+        _s("image_url", f"https://cvxlab.net/assets/{kind}s/babylon_keystone.png"),
+        _u8("version", 1),
+    ]}
+
+def synthetic_corpus(size, seed=7):
+    """Gateway-shaped entries: 80% creatures, 20% tools/spells"""
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(size):
+        roll = rng.random()
+        if roll < 0.8:
+            pj = _creature(rng, n)
+        else:
+            pj = _item(rng, "tool" if roll < 0.9 else "spell")
+        corpus.append({"non_fungible_id": f"{{synthetic-{n:06d}}}",
+                       "data": {"programmatic_json": pj}})
+    return corpus
+
+def record_corpus(account, out_path):
+    """Pull every creature/tool/spell of `account` from the gateway"""
+    from app import get_account_nfids
+    from gateway_resilience import GATEWAY
+
+    selector = {"state_version": GATEWAY.post("/status/gateway-status", {})
+                .json()["ledger_state"]["state_version"]}
+    corpus = []
+    for resource in (CREATURE_NFT_RESOURCE, TOOL_NFT_RESOURCE, SPELL_NFT_RESOURCE):
+        ids = get_account_nfids(account, resource)
+        for i in range(0, len(ids), 100):
+            r = GATEWAY.post("/state/non-fungible/data", {
+                "at_ledger_state": selector,
+                "resource_address": resource,
+                "non_fungible_ids": ids[i:i + 100],
+            }, timeout=20)
+            r.raise_for_status()
+            corpus.extend(r.json().get("non_fungible_ids", []))
+    with open(out_path, "w") as f:
+        json.dump(corpus, f)
+    print(f"Recorded {len(corpus)} NFTs to {out_path}")
+
+def _time(decoder, blobs, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for pj in blobs:
+            decoder(pj)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(corpus, rounds):
+    blobs = [(entry.get("data") or {}).get("programmatic_json", {}) for entry in corpus]
+
+    mismatches = sum(1 for pj in blobs if decode_programmatic_json(pj) != _unwrap(pj))
+    if mismatches:
+        print(f"{mismatches}/{len(blobs)} NFTs decode differently – fix before benchmarking")
+        return 1
+
+    generic = _time(_unwrap, blobs, rounds)
+    fast = _time(decode_programmatic_json, blobs, rounds)
+    per_nft = lambda t: t / len(blobs) * 1e6
+    print(f"{len(blobs)} NFTs, best of {rounds} rounds")
+    print(f"  _unwrap                   {generic * 1000:8.2f} ms  ({per_nft(generic):6.2f} µs/NFT)")
+    print(f"  decode_programmatic_json  {fast * 1000:8.2f} ms  ({per_nft(fast):6.2f} µs/NFT)")
+    print(f"  speed-up                  {generic / fast:8.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="recorded gateway entries (JSON list)")
+    parser.add_argument("--synthetic", type=int, default=500, help="synthetic corpus size")
+    parser.add_argument("--record", metavar="ACCOUNT", help="record a corpus from the gateway")
+    parser.add_argument("--out", default="nft_corpus.json")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus(args.record, args.out)
+        sys.exit(0)
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)
+    else:
+        corpus = synthetic_corpus(args.synthetic)
+
+    sys.exit(run(corpus, args.rounds))
@@ -0,0 +1,171 @@
+"""
+Replays golden/combat_rules.json (results recorded from the client's
+battleCalculations.js / itemEffects.js / battleCore.js) against
+pvp_combat_rules.py and reports every case where the server disagrees.
+
+    python check_combat_rules.py               # all cases
+    python check_combat_rules.py --kind attack --verbose
+
+Regenerate the corpus after changing the client rules:
+
+    node golden/generate_combat_golden.js
+
+Effect ids are not compared: the client makes them from the clock, the
+server deterministically.
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import sys
+from collections import Counter
+
+import pvp_combat_rules as rules
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "combat_rules.json")
+CREATURE_KEYS = ("battleStats", "currentHealth", "activeEffects", "isDefending", "nextAttackBonus")
+
+
+def creature_result(creature):
+    return {key: creature[key] for key in CREATURE_KEYS if key in creature}
+
+
+def _normalize(value):
+    """JSON shape of a result, without effect ids or absent (undefined) keys"""
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()
+                if v is not None or k in ("caster",)}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _strip_effect_ids(value):
+    if isinstance(value, dict):
+        return {k: (_strip_effect_ids([{ek: ev for ek, ev in e.items() if ek != "id"} for e in v])
+                    if k == "activeEffects" and isinstance(v, list) else _strip_effect_ids(v))
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_strip_effect_ids(v) for v in value]
+    return value
+
+
+def _same(a, b, path="$"):
+    """First difference between two JSON values, or None"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return None if a is b else f"{path}: {a!r} != {b!r}"
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return None if math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-12) else f"{path}: {a!r} != {b!r}"
+    if isinstance(a, dict) and isinstance(b, dict):
+        if a.keys() != b.keys():
+            return f"{path}: keys {sorted(a)} != {sorted(b)}"
+        for key in a:
+            diff = _same(a[key], b[key], f"{path}.{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return f"{path}: length {len(a)} != {len(b)}"
+        for i, (x, y) in enumerate(zip(a, b)):
+            diff = _same(x, y, f"{path}[{i}]")
+            if diff:
+                return diff
+        return None
+    return None if a == b else f"{path}: {a!r} != {b!r}"
+
+
+def run_case(case):
+    data = copy.deepcopy(case["input"])
+    rng = rules.ScriptedRolls(case["rolls"])
+    kind = case["kind"]
+
+    if kind == "derived_stats":
+        return rules.calculate_derived_stats(data["creature"], data["synergies"])
+    if kind == "tool_effect":
+        return rules.tool_effect(data["tool"])
+    if kind == "spell_effect":
+        return rules.spell_effect(data["spell"], data["casterMagic"])
+    if kind == "combo_bonus":
+        return rules.combo_bonus(data["count"], data["attackType"])
+    if kind == "damage":
+        return rules.calculate_damage(data["attacker"], data["defender"], data["attackType"],
+                                      data["combo"], rng)
+    if kind == "attack":
+        attacker, defender = data["attacker"], data["defender"]
+        result = rules.process_attack(attacker, defender, data["attackType"], data["comboLevel"],
+                                      rng, data["turn"])
+        return {
+            "attacker": creature_result(attacker),
+            "defender": creature_result(defender),
+            "damage": result["damage"],
+            "isCritical": result["isCritical"],
+            "isBlocked": result["isDodged"],
+            "attackType": result["attackType"],
+            "battleLog": result["battleLog"],
+        }
+    if kind == "tool":
+        effect = rules.apply_tool(data["creature"], data["tool"], data["turn"])
+        return {"creature": creature_result(data["creature"]), "effect": effect}
+    if kind == "spell":
+        caster = data["caster"]
+        same = case["expected"]["caster"] is None
+        target = caster if same else data["target"]
+        effect = rules.apply_spell(caster, target, data["spell"], data["turn"], rng)
+        return {"caster": None if same else creature_result(caster),
+                "target": creature_result(target), "effect": effect}
+    if kind == "defend":
+        return creature_result(rules.defend_creature(data["creature"], data["turn"]))
+    if kind == "ongoing":
+        creature = data["creature"]
+        steps = []
+        for turn in data["turns"]:
+            rules.apply_ongoing_effects(creature, turn)
+            steps.append(creature_result(copy.deepcopy(creature)))
+        return steps
+    if kind == "defeated":
+        field, opposing = data["field"], data["opposing"]
+        for creature in field + opposing:
+            rules.apply_ongoing_effects(creature, 0)
+        survivors, _ = rules.remove_defeated(field, opposing, 0)
+        return {
+            "survivors": [{"id": c["id"], **creature_result(c)} for c in survivors],
+            "opposing": [{"id": c["id"], **creature_result(c)} for c in opposing],
+        }
+    raise ValueError(f"unknown case kind {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", help="only replay cases of this kind")
+    parser.add_argument("--verbose", action="store_true", help="print every mismatch")
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+
+    totals, failures = Counter(), Counter()
+    for index, case in enumerate(cases):
+        if args.kind and case["kind"] != args.kind:
+            continue
+        totals[case["kind"]] += 1
+        try:
+            actual = _strip_effect_ids(_normalize(json.loads(json.dumps(run_case(case)))))
+            diff = _same(_strip_effect_ids(_normalize(case["expected"])), actual)
+        except Exception as e:
+            diff = f"raised {type(e).__name__}: {e}"
+        if diff:
+            failures[case["kind"]] += 1
+            if args.verbose or failures[case["kind"]] <= 3:
+                print(f"case {index} ({case['kind']}): {diff}")
+
+    for kind in sorted(totals):
+        print(f"  {kind:14} {totals[kind] - failures[kind]:5}/{totals[kind]}")
+    print(f"{sum(totals.values()) - sum(failures.values())}/{sum(totals.values())} cases match the client")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Checks that the hot PvP queries are answered from the indexes in pvp_schema.
+
+Builds the PvP schema in a scratch SQLite database, fills it with a
+realistic spread of battles, history, stats and queue rows, runs ANALYZE so
+the planner sees real statistics, then for every query:
+
+  * runs EXPLAIN QUERY PLAN and requires the expected indexes, no full table
+    scan and no temporary sort where the index should give the order;
+  * compares the rewritten query's rows with the straightforward OR / ABS
+    form it replaced, for a sample of players.
+
+    python check_pvp_query_plans.py
+    python check_pvp_query_plans.py --players 20000 --battles 500000 -v
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+
+from pvp_schema import (ACTIVE_BATTLE_FOR_USER, ACTIVE_TURN_CLOCKS, BACKFILL_DAILY_STATS,
+                        DAILY_STATS_SINCE, MATCH_CANDIDATE, RECENT_HISTORY_FOR_USER,
+                        create_pvp_schema)
+
+BATTLE_FOR_PLAYER = """
+    SELECT * FROM pvp_battles
+    WHERE battle_id = ?
+    AND (player1_id = ? OR player2_id = ?)
+"""
+
+# The queries as they were written before the rewrites, for comparing rows
+ACTIVE_BATTLE_FOR_USER_OR = """
+    SELECT battle_id FROM pvp_battles
+    WHERE (player1_id = ? OR player2_id = ?)
+    AND status = 'active'
+    ORDER BY created_at DESC, battle_id DESC
+    LIMIT 1
+"""
+
+RECENT_HISTORY_FOR_USER_OR = """
+    SELECT h.*, u1.first_name as player1_name, u2.first_name as player2_name
+    FROM pvp_battle_history h
+    LEFT JOIN users u1 ON h.player1_id = u1.user_id
+    LEFT JOIN users u2 ON h.player2_id = u2.user_id
+    WHERE h.player1_id = ? OR h.player2_id = ?
+    ORDER BY h.completed_at DESC, h.history_id DESC
+    LIMIT 10
+"""
+
+MATCH_CANDIDATE_ABS = """
+    SELECT * FROM pvp_queue
+    WHERE user_id != ?
+    AND ABS(rating - ?) <= 200
+    ORDER BY joined_at ASC
+    LIMIT 1
+"""
+
+
+class PlanCheck:
+    def __init__(self, name, sql, params, indexes, temp_btree_ok=False):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.indexes = indexes              # every one must appear in the plan
+        self.temp_btree_ok = temp_btree_ok  # a sort over an already-bounded row set
+
+
+def build_database(players: int, battles: int, queued: int, seed: int) -> sqlite3.Connection:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, first_name TEXT)")
+    create_pvp_schema(cur)
+
+    user_ids = list(range(1, players + 1))
+    cur.executemany("INSERT INTO users VALUES (?, ?)",
+                    [(user_id, f"Player {user_id}") for user_id in user_ids])
+    cur.executemany("INSERT INTO pvp_stats (user_id, rating, last_battle_at) VALUES (?, ?, ?)",
+                    [(user_id, int(rng.gauss(1000, 200)),
+                      f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} 12:00:00")
+                     for user_id in user_ids])
+
+    battle_rows, history_rows = [], []
+    for battle_id in range(1, battles + 1):
+        player1, player2 = rng.sample(user_ids, 2)
+        if rng.random() < 0.05:
+            player2 = -rng.randint(1, 4)        # bot match
+        stamp = f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} " \
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        active = rng.random() < 0.02
+        battle_rows.append((battle_id, player1, player2, b"", "active" if active else "completed",
+                            rng.random() * 1e6 if active else None, stamp))
+        if not active:
+            history_rows.append((battle_id, player1, player2, rng.choice((player1, player2)), stamp))
+    cur.executemany("""
+        INSERT INTO pvp_battles (battle_id, player1_id, player2_id, battle_state, status,
+                                 turn_started_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, battle_rows)
+    cur.executemany("""
+        INSERT INTO pvp_battle_history (battle_id, player1_id, player2_id, winner_id, completed_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, history_rows)
+    cur.execute(BACKFILL_DAILY_STATS)
+    cur.executemany("INSERT INTO pvp_queue (user_id, rating, selected_creatures, joined_at) VALUES (?, ?, '[]', ?)",
+                    [(user_id, int(rng.gauss(1000, 200)), f"2026-10-19 12:{i // 60 % 60:02d}:{i % 60:02d}")
+                     for i, user_id in enumerate(rng.sample(user_ids, queued))])
+    cur.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def query_plan(cur, sql, params):
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[3] for row in cur.fetchall()]
+
+
+def plan_problems(check: PlanCheck, plan):
+    problems = []
+    text = "\n".join(plan)
+    for index in check.indexes:
+        if index not in text:
+            problems.append(f"does not use {index}")
+    for line in plan:
+        # "SCAN t USING INDEX i" walks an index in order and "SCAN (subquery-n)"
+        # reads back an inner result; a bare "SCAN t" reads the whole table
+        if line.startswith("SCAN ") and " USING " not in line and not line.startswith("SCAN ("):
+            problems.append(f"full table scan: {line}")
+        if "TEMP B-TREE" in line and not check.temp_btree_ok:
+            problems.append(f"sorts in a temporary b-tree: {line}")
+    return problems
+
+
+def rows_match(cur, rewritten, original, params, original_params):
+    cur.execute(rewritten, params)
+    new = [tuple(row) for row in cur.fetchall()]
+    cur.execute(original, original_params)
+    old = [tuple(row) for row in cur.fetchall()]
+    return new == old
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--battles", type=int, default=100000)
+    parser.add_argument("--queued", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    conn = build_database(args.players, args.battles, args.queued, args.seed)
+    cur = conn.cursor()
+    cur.execute("SELECT player1_id FROM pvp_battles WHERE status = 'active' LIMIT 1")
+    player = cur.fetchone()[0]
+    cur.execute("SELECT battle_id FROM pvp_battles WHERE player1_id = ? LIMIT 1", (player,))
+    battle_id = cur.fetchone()[0]
+
+    checks = [
+        PlanCheck("active battle for player", ACTIVE_BATTLE_FOR_USER, (player, player),
+                  ["idx_pvp_battles_player1_active", "idx_pvp_battles_player2_active"],
+                  temp_btree_ok=True),
+        PlanCheck("battle for player", BATTLE_FOR_PLAYER, (battle_id, player, player),
+                  ["INTEGER PRIMARY KEY"]),
+        PlanCheck("recent history for player", RECENT_HISTORY_FOR_USER, (player, player),
+                  ["idx_pvp_history_player1", "idx_pvp_history_player2"],
+                  temp_btree_ok=True),
+        PlanCheck("week leaderboard rebuild", DAILY_STATS_SINCE, ("2026-09-22",),
+                  ["sqlite_autoindex_pvp_daily_stats_1"], temp_btree_ok=True),
+        PlanCheck("match candidate", MATCH_CANDIDATE, (800, 1200, player),
+                  ["idx_pvp_queue_rating"], temp_btree_ok=True),
+        PlanCheck("active turn clocks", ACTIVE_TURN_CLOCKS, (),
+                  ["idx_pvp_battles_turn_clock"]),
+    ]
+
+    failures = 0
+    for check in checks:
+        plan = query_plan(cur, check.sql, check.params)
+        problems = plan_problems(check, plan)
+        print(f"{'FAIL' if problems else 'ok  '}  {check.name}")
+        if problems or args.verbose:
+            for line in plan:
+                print(f"        {line}")
+        for problem in problems:
+            print(f"      - {problem}")
+        failures += bool(problems)
+
+    # The temporary sorts allowed above only ever see a handful of rows:
+    # the merged per-side lookups (<= 20 rows) or the queue's rating window.
+    rng = random.Random(args.seed)
+    samples = rng.sample(range(1, args.players + 1), min(200, args.players)) + [player]
+    mismatched = 0
+    for user_id in samples:
+        mismatched += not rows_match(cur, ACTIVE_BATTLE_FOR_USER, ACTIVE_BATTLE_FOR_USER_OR,
+                                     (user_id, user_id), (user_id, user_id))
+        mismatched += not rows_match(cur, RECENT_HISTORY_FOR_USER, RECENT_HISTORY_FOR_USER_OR,
+                                     (user_id, user_id), (user_id, user_id))
+        rating = 800 + user_id % 400
+        mismatched += not rows_match(cur, MATCH_CANDIDATE, MATCH_CANDIDATE_ABS,
+                                     (rating - 200, rating + 200, user_id), (user_id, rating))
+    print(f"{'FAIL' if mismatched else 'ok  '}  rewritten queries return the original rows "
+          f"({len(samples)} players, {mismatched} mismatches)")
+    failures += bool(mismatched)
+
+    conn.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
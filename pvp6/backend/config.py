@@ -22,6 +22,12 @@ RADIX_COMPONENT_ADDRESS = os.getenv("RADIX_COMPONENT_ADDRESS")
 RADIX_NETWORK = "mainnet"  # or "stokenet" for testnet
 RADIX_GATEWAY_API = os.getenv("RADIX_GATEWAY_API", "https://mainnet.radixdlt.com")
 
+# Outbound gateway budget / circuit breaker (see gateway_resilience.py)
+GATEWAY_RATE_PER_SEC     = float(os.getenv("GATEWAY_RATE_PER_SEC", "8"))
+GATEWAY_BURST            = int(os.getenv("GATEWAY_BURST", "20"))
+GATEWAY_BREAKER_ERRORS   = float(os.getenv("GATEWAY_BREAKER_ERRORS", "0.5"))
+GATEWAY_BREAKER_COOLDOWN = float(os.getenv("GATEWAY_BREAKER_COOLDOWN", "15"))
+
 # Optional: Validate the private key format
 if RADIX_PRIVATE_KEY and (len(RADIX_PRIVATE_KEY) != 64 or not all(c in '0123456789abcdefABCDEF' for c in RADIX_PRIVATE_KEY)):
     raise ValueError("RADIX_PRIVATE_KEY appears to be in incorrect format")
@@ -31,3 +37,29 @@ GROUP_ID    = os.getenv("GROUP_ID", "YOUR_OPTIONAL_GROUP_ID")
 FLASK_ENV   = os.getenv("FLASK_ENV", "development")
 
 DATABASE_PATH = "/root/telegram_bot/bot.db"
+
+# PvP bot opponents (see pvp_bots.py)
+PVP_BOT_WAIT_SECONDS      = int(os.getenv("PVP_BOT_WAIT_SECONDS", "45"))
+PVP_BOT_DECISION_SECONDS  = float(os.getenv("PVP_BOT_DECISION_SECONDS", "0.5"))
+
+# PvP turn clock: a turn not ended in time is ended for the player, and a
+# player who times out this many turns in a row forfeits
+PVP_TURN_SECONDS          = int(os.getenv("PVP_TURN_SECONDS", "60"))
+PVP_MAX_MISSED_TURNS      = int(os.getenv("PVP_MAX_MISSED_TURNS", "3"))
+
+# PvP post-battle jobs (see pvp_post_battle.py): jobs per transaction, and
+# how often the worker looks for jobs it was not woken for
+PVP_OUTBOX_BATCH_SIZE     = int(os.getenv("PVP_OUTBOX_BATCH_SIZE", "50"))
+PVP_OUTBOX_POLL_SECONDS   = float(os.getenv("PVP_OUTBOX_POLL_SECONDS", "5"))
+
+# Idempotency keys for retried POSTs (see idempotency.py): how long a
+# response is replayed, how much memory the recorded responses may take,
+# and how long a retry waits for the first request to finish
+IDEMPOTENCY_TTL_SECONDS   = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_ENTRIES   = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_MAX_BYTES     = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(32 * 1024 * 1024)))
+IDEMPOTENCY_WAIT_SECONDS  = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# Encoded battle views (see pvp_battle_views.py): how many battles keep
+# theirs in memory
+BATTLE_VIEW_CACHE_BATTLES = int(os.getenv("BATTLE_VIEW_CACHE_BATTLES", "2000"))
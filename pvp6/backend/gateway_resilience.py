@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import requests
+
+from config import (
+    RADIX_GATEWAY_API,
+    GATEWAY_RATE_PER_SEC,
+    GATEWAY_BURST,
+    GATEWAY_BREAKER_ERRORS,
+    GATEWAY_BREAKER_COOLDOWN,
+)
+
+
+class GatewayUnavailable(Exception):
+    """Raised instead of waiting when the gateway is failing or over budget"""
+
+
+class TokenBucket:
+    """Token-bucket budget for outbound gateway calls (shared by all threads)"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available right now; never sleeps"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker.
+
+    closed    -> calls flow; outcomes are recorded in a sliding window
+    open      -> calls fail fast until `cooldown` seconds have passed
+    half_open -> one probe call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, error_threshold: float, cooldown: float,
+                 window: int = 20, min_calls: int = 5):
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self.outcomes = deque(maxlen=window)     # True = success
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            # half-open: only one probe at a time
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+                self.probe_in_flight = False
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self._trip()
+                return
+            self.outcomes.append(False)
+            if len(self.outcomes) >= self.min_calls:
+                errors = self.outcomes.count(False)
+                if errors / len(self.outcomes) >= self.error_threshold:
+                    self._trip()
+
+    def _trip(self):
+        print(f"[gateway] circuit OPEN for {self.cooldown}s")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        self.outcomes.clear()
+
+
+class StaleCache:
+    """
+    Last-known-good values with stale-while-revalidate semantics.
+
+    age < fresh_ttl          -> served as is
+    age < stale_ttl          -> served, refreshed in the background
+    older / missing          -> loaded synchronously
+    load fails               -> any value younger than stale_if_error is served
+    """
+
+    def __init__(self, fresh_ttl: float, stale_ttl: float, stale_if_error: float,
+                 max_entries: int = 5000):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error = stale_if_error
+        self.max_entries = max_entries
+        self.entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, age_seconds) or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, time.monotonic() - stored_at
+
+    def put(self, key: Hashable, value: Any):
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                # drop the oldest entry
+                oldest = min(self.entries, key=lambda k: self.entries[k][1])
+                del self.entries[oldest]
+            self.entries[key] = (value, time.monotonic())
+
+
+class GatewayClient:
+    """
+    Single entry point for Radix Gateway calls.
+
+    Every call spends one token from the shared budget and reports its outcome
+    to the circuit breaker.  Nothing here sleeps: when the gateway is failing
+    or the budget is spent, GatewayUnavailable is raised immediately so the
+    caller can fall back to a cached value instead of pinning a worker thread.
+    """
+
+    HEADERS = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'CorvaxLab Game/2.0'
+    }
+
+    def __init__(self, base_url: str, budget: TokenBucket, breaker: CircuitBreaker,
+                 cache: StaleCache, timeout: float = 8):
+        self.base_url = base_url.rstrip('/')
+        self.budget = budget
+        self.breaker = breaker
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gateway-swr")
+        self.refreshing = set()
+        self.refreshing_lock = threading.Lock()
+
+    def post(self, path: str, payload: Dict, timeout: Optional[float] = None) -> requests.Response:
+        """
+        POST to the gateway.  Returns the response for 2xx and ordinary 4xx
+        answers; raises GatewayUnavailable for 429/5xx, network errors, an
+        open circuit or an exhausted budget.
+        """
+        if not self.breaker.allow():
+            raise GatewayUnavailable("circuit open")
+        if not self.budget.try_acquire():
+            # Budget exhaustion is our own limit, not a gateway fault
+            self._release_probe()
+            raise GatewayUnavailable("gateway call budget exhausted")
+
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                         headers=self.HEADERS,
+                                         timeout=timeout or self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise GatewayUnavailable(f"{path}: {e}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+            raise GatewayUnavailable(f"{path}: HTTP {response.status_code}")
+
+        self.breaker.record_success()
+        return response
+
+    def _release_probe(self):
+        with self.breaker.lock:
+            self.breaker.probe_in_flight = False
+
+    def cached(self, key: Hashable, loader: Callable[[], Any], force: bool = False) -> Any:
+        """
+        Stale-while-revalidate wrapper around `loader`.
+        `force=True` skips the fresh/stale shortcuts but still falls back to
+        the last known value if the load fails.
+        """
+        hit = self.cache.get(key)
+
+        if hit is not None and not force:
+            value, age = hit
+            if age < self.cache.fresh_ttl:
+                return value
+            if age < self.cache.stale_ttl:
+                self._refresh_in_background(key, loader)
+                return value
+
+        try:
+            value = loader()
+        except GatewayUnavailable as e:
+            if hit is not None and hit[1] < self.cache.stale_if_error:
+                print(f"[gateway] serving stale value for {key}: {e}")
+                return hit[0]
+            raise
+
+        self.cache.put(key, value)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any]):
+        with self.refreshing_lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                self.cache.put(key, loader())
+            except Exception as e:
+                print(f"[gateway] background refresh of {key} failed: {e}")
+            finally:
+                with self.refreshing_lock:
+                    self.refreshing.discard(key)
+
+        self.refresher.submit(refresh)
+
+
+# Shared instance used by every gateway helper in app.py
+GATEWAY = GatewayClient(
+    RADIX_GATEWAY_API,
+    budget=TokenBucket(GATEWAY_RATE_PER_SEC, GATEWAY_BURST),
+    breaker=CircuitBreaker(GATEWAY_BREAKER_ERRORS, GATEWAY_BREAKER_COOLDOWN),
+    cache=StaleCache(fresh_ttl=10, stale_ttl=120, stale_if_error=3600),
+)
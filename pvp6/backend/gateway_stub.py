@@ -0,0 +1,203 @@
+"""
+Fault-injecting local stand-in for the Radix Gateway.
+
+Run it on its own and point the backend at it:
+
+    python gateway_stub.py --port 8099
+    RADIX_GATEWAY_API=http://127.0.0.1:8099 python app.py
+
+Faults can be changed at runtime:
+
+    curl -X POST localhost:8099/__faults -d '{"error_rate": 1.0}'
+    curl -X POST localhost:8099/__faults -d '{"throttle_rate": 0.5, "latency_ms": 800}'
+
+Or run the resilience drill, which exercises the token bucket, circuit
+breaker and stale-while-revalidate cache in gateway_resilience.py:
+
+    python gateway_stub.py --drill
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+XRD = "resource_rdx1tknxxxxxxxxxradxrdxxxxxxxxx009923554798xxxxxxxxxradxrd"
+CREATURE = "resource_rdx1ntq7xkr0345fz8hkkappg2xsnepuj94a9wnu287km5tswu3323sjnl"
+
+FAULTS = {
+    "error_rate": 0.0,      # share of requests answered with 503
+    "throttle_rate": 0.0,   # share of requests answered with 429
+    "latency_ms": 0,        # added to every request
+    "drop_rate": 0.0,       # share of requests whose connection is closed
+}
+STATS = {"requests": 0}
+STATE_VERSION = 1000
+
+
+def _canned_response(path, body):
+    """Minimal, well-formed answers for the endpoints app.py uses"""
+    if path in ("/status/gateway-status", "/status/current"):
+        return {"ledger_state": {"state_version": STATE_VERSION, "epoch": 1}}
+    if path == "/state/entity/page/fungibles/":
+        return {"total_count": 1, "items": [{"resource_address": XRD, "amount": "1234.5"}]}
+    if path == "/state/entity/details":
+        return {"items": [{"non_fungible_resources": {"items": [{
+            "resource_address": CREATURE,
+            "vaults": {"items": [{"items": ["{stub-0001}", "{stub-0002}"]}]}
+        }]}}]}
+    if path == "/state/entity/page/non-fungible-vaults/":
+        return {"items": [{"vault": {"non_fungible_ids": ["{stub-0001}", "{stub-0002}"]}}]}
+    if path == "/state/non-fungible/data":
+        return {"non_fungible_ids": [
+            {"non_fungible_id": nfid, "data": {"programmatic_json": {
+                "kind": "Tuple", "fields": [
+                    {"kind": "U16", "field_name": "species_id", "value": "1"},
+                    {"kind": "U8", "field_name": "form", "value": "0"},
+                ]}}}
+            for nfid in body.get("non_fungible_ids", [])
+        ]}
+    if path == "/transaction/status":
+        return {"status": "CommittedSuccess", "intent_status": "CommittedSuccess"}
+    if path == "/transaction/committed-details":
+        return {"non_fungible_changes": []}
+    return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, payload):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path == "/__faults":
+            FAULTS.update(body)
+            return self._send(200, {"faults": FAULTS, "stats": STATS})
+
+        STATS["requests"] += 1
+        if FAULTS["latency_ms"]:
+            time.sleep(FAULTS["latency_ms"] / 1000)
+        roll = random.random()
+        if roll < FAULTS["drop_rate"]:
+            self.close_connection = True
+            return
+        if roll < FAULTS["drop_rate"] + FAULTS["error_rate"]:
+            return self._send(503, {"message": "injected fault"})
+        if roll < FAULTS["drop_rate"] + FAULTS["error_rate"] + FAULTS["throttle_rate"]:
+            return self._send(429, {"message": "injected throttle"})
+
+        payload = _canned_response(self.path, body)
+        if payload is None:
+            return self._send(404, {"message": f"unknown path {self.path}"})
+        self._send(200, payload)
+
+
+def start_stub(port=0):
+    """Start the stub in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_drill():
+    """Drive gateway_resilience through healthy -> brownout -> recovery"""
+    os.environ.setdefault("RADIX_PRIVATE_KEY", "0" * 64)
+    from gateway_resilience import (CircuitBreaker, GatewayClient, GatewayUnavailable,
+                                    StaleCache, TokenBucket)
+
+    server, base_url = start_stub()
+    client = GatewayClient(
+        base_url,
+        budget=TokenBucket(rate=50, capacity=10),
+        breaker=CircuitBreaker(error_threshold=0.5, cooldown=1.0, window=10, min_calls=4),
+        cache=StaleCache(fresh_ttl=0.2, stale_ttl=0.5, stale_if_error=60),
+        timeout=2,
+    )
+
+    def load_balance():
+        r = client.post("/state/entity/page/fungibles/", {"address": "account_stub"})
+        return r.json()["items"][0]["amount"]
+
+    failures = []
+
+    def check(name, ok):
+        print(f"  [{'ok' if ok else 'FAIL'}] {name}")
+        if not ok:
+            failures.append(name)
+
+    print("healthy gateway")
+    check("value loaded", client.cached("bal", load_balance) == "1234.5")
+
+    print("brownout: every call returns 503 after 800ms")
+    FAULTS.update(error_rate=1.0, latency_ms=800)
+    time.sleep(0.6)                       # let the cached value go past stale_ttl
+    for _ in range(4):
+        try:
+            client.post("/status/current", {})
+        except GatewayUnavailable:
+            pass
+    check("breaker opened", client.breaker.state == CircuitBreaker.OPEN)
+    started = time.monotonic()
+    value = client.cached("bal", load_balance)
+    elapsed = time.monotonic() - started
+    check("stale balance served while open", value == "1234.5")
+    check(f"failed fast ({elapsed * 1000:.1f}ms)", elapsed < 0.1)
+
+    print("token budget")
+    FAULTS.update(error_rate=0.0, latency_ms=0)
+    time.sleep(1.1)                       # cooldown -> half-open
+    client.post("/status/current", {})    # probe closes the breaker
+    check("breaker closed after probe", client.breaker.state == CircuitBreaker.CLOSED)
+    rejected = 0
+    for _ in range(40):
+        try:
+            client.post("/status/current", {})
+        except GatewayUnavailable:
+            rejected += 1
+    check(f"burst limited by budget ({rejected}/40 rejected)", rejected > 0)
+
+    print("throttling counts as failure")
+    FAULTS.update(throttle_rate=1.0)
+    time.sleep(0.3)
+    for _ in range(6):
+        try:
+            client.post("/status/current", {})
+        except GatewayUnavailable:
+            pass
+    check("breaker opened on 429s", client.breaker.state == CircuitBreaker.OPEN)
+
+    server.shutdown()
+    print(f"{STATS['requests']} requests reached the stub")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--drill", action="store_true", help="run the resilience drill and exit")
+    args = parser.parse_args()
+
+    if args.drill:
+        sys.exit(run_drill())
+
+    server, base_url = start_stub(args.port)
+    print(f"Gateway stub listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,280 @@
+// Generates combat_rules.json: inputs and results of the client combat
+// functions (frontend/src/utils), replayed by check_combat_rules.py against
+// pvp_combat_rules.py.
+//
+//     node golden/generate_combat_golden.js            # from pvp6/backend
+//
+// The client modules are evaluated as-is, with Math.random replaced by a
+// seeded generator whose draws are recorded per case, Date.now fixed and
+// console silenced.  Regenerate whenever the client rules change.
+const fs = require('fs');
+const path = require('path');
+
+const UTILS = path.join(__dirname, '..', '..', 'frontend', 'src', 'utils');
+const OUT = path.join(__dirname, 'combat_rules.json');
+const SEED = 20241;
+
+// mulberry32
+const makePrng = (seed) => () => {
+  seed |= 0; seed = seed + 0x6D2B79F5 | 0;
+  let t = Math.imul(seed ^ seed >>> 15, 1 | seed);
+  t = t + Math.imul(t ^ t >>> 7, 61 | t) ^ t;
+  return ((t ^ t >>> 14) >>> 0) / 4294967296;
+};
+const prng = makePrng(SEED);
+
+let recorded = null;
+const scriptedMath = Object.create(Math);
+scriptedMath.random = () => {
+  const roll = prng();
+  if (recorded) recorded.push(roll);
+  return roll;
+};
+const fixedDate = { now: () => 1700000000000 };
+const silent = { log() {}, error() {}, warn() {} };
+
+// Load an ES module's exports without a bundler: strip import/export
+// keywords and hand the imported names in as arguments.
+const loadModule = (file, available = {}) => {
+  let source = fs.readFileSync(path.join(UTILS, file), 'utf8');
+  const imports = {};
+  source = source.replace(/^import\s*\{([^}]*)\}\s*from\s+['"][^'"]+['"];?/gm, (_, names) => {
+    names.split(',').map((n) => n.trim()).filter(Boolean).forEach((n) => { imports[n] = available[n]; });
+    return '';
+  });
+  const exported = [];
+  source = source.replace(/^export\s+(const|function)\s+(\w+)/gm, (_, kind, name) => {
+    exported.push(name);
+    return `${kind} ${name}`;
+  });
+  // re-exports of imported names
+  source = source.replace(/^export\s*\{[^}]*\};?/gm, '');
+  const names = Object.keys(imports);
+  const body = `${source}\nreturn { ${exported.join(', ')} };`;
+  // eslint-disable-next-line no-new-func
+  return new Function('Math', 'Date', 'console', ...names, body)(
+    scriptedMath, fixedDate, silent, ...names.map((n) => imports[n]));
+};
+
+const items = loadModule('itemEffects.js');
+const calc = loadModule('battleCalculations.js');
+const core = loadModule('battleCore.js', { ...items, ...calc });
+
+// ── random inputs (drawn from a separate generator so they do not
+//    disturb the recorded rolls) ─────────────────────────────────
+const inputs = makePrng(SEED + 1);
+const pick = (list) => list[Math.floor(inputs() * list.length)];
+const int = (lo, hi) => lo + Math.floor(inputs() * (hi - lo + 1));
+const chance = (p) => inputs() < p;
+
+const STATS = ['energy', 'strength', 'magic', 'stamina', 'speed'];
+const TYPES = ['energy', 'strength', 'magic', 'stamina', 'speed'];
+const EFFECTS = ['Surge', 'Shield', 'Echo', 'Drain', 'Charge'];
+const RARITIES = ['Common', 'Rare', 'Epic', 'Legendary', undefined];
+const FORMS = [0, 1, 2, 3, 0, 1, 2, 3, '1', '3', undefined];
+const SPECIES = ['Bullx', 'Cudoge', 'Corvax', 'Etherion', 'Hodlphant', 'Moxer'];
+
+let nextId = 1;
+const creature = ({ withBattleStats = true } = {}) => {
+  const stats = {};
+  STATS.forEach((s) => { stats[s] = chance(0.08) ? 0 : int(1, 20); });
+  const c = {
+    id: `c${nextId++}`,
+    species_name: pick(SPECIES),
+    form: pick(FORMS),
+    rarity: pick(RARITIES),
+    stats,
+  };
+  if (chance(0.4)) c.combination_level = int(0, 3);
+  if (chance(0.5)) {
+    const count = int(1, 2);
+    c.specialty_stats = Array.from({ length: count }, () => pick(STATS));
+  }
+  if (withBattleStats) {
+    c.battleStats = calc.calculateDerivedStats(c);
+    if (chance(0.3)) c.battleStats.physicalAttack += int(-5, 15);
+    c.currentHealth = chance(0.5) ? c.battleStats.maxHealth : int(1, c.battleStats.maxHealth);
+  }
+  return c;
+};
+const item = (kind) => {
+  const it = { id: `i${nextId++}`, name: `Babylon ${pick(EFFECTS)}` };
+  if (!chance(0.05)) it[`${kind}_type`] = chance(0.05) ? 'chaos' : pick(TYPES);
+  if (!chance(0.05)) it[`${kind}_effect`] = chance(0.05) ? 'Mystery' : pick(EFFECTS);
+  return it;
+};
+const clone = (value) => (value === undefined ? undefined : JSON.parse(JSON.stringify(value)));
+
+// Battle fields the server keeps; other keys are display data
+const creatureResult = (c) => ({
+  battleStats: c.battleStats,
+  currentHealth: c.currentHealth,
+  activeEffects: c.activeEffects,
+  isDefending: c.isDefending,
+  nextAttackBonus: c.nextAttackBonus,
+});
+
+const cases = [];
+const record = (kind, input, run) => {
+  recorded = [];
+  const expected = run();
+  cases.push(clone({ kind, input, rolls: recorded, expected }));
+  recorded = null;
+};
+
+for (let i = 0; i < 100; i++) {
+  const c = creature({ withBattleStats: false });
+  const synergies = chance(0.3) ? [{ bonus: pick([0.05, 0.1, 0.15]) }, { bonus: 0.12 }] : [];
+  record('derived_stats', { creature: c, synergies },
+    () => calc.calculateDerivedStats(clone(c), synergies));
+}
+
+for (const type of [...TYPES, 'chaos', undefined]) {
+  for (const effect of [...EFFECTS, 'Mystery', undefined]) {
+    const tool = { tool_type: type, tool_effect: effect };
+    record('tool_effect', { tool }, () => items.getToolEffect(tool));
+    for (const magic of [1, 5, 12, 20]) {
+      const spell = { spell_type: type, spell_effect: effect };
+      record('spell_effect', { spell, casterMagic: magic },
+        () => items.getSpellEffect(spell, magic));
+    }
+  }
+}
+
+for (const type of ['physical', 'magical', 'special', 'normal']) {
+  for (let k = 0; k <= 12; k++) {
+    record('combo_bonus', { count: k, attackType: type }, () => calc.calculateComboBonus(k, type));
+  }
+}
+
+for (let i = 0; i < 120; i++) {
+  const attacker = creature();
+  const defender = creature();
+  const attackType = pick(['physical', 'magical']);
+  const combo = chance(0.3) ? calc.calculateComboBonus(int(1, 6), attackType) : 1.0;
+  record('damage', { attacker, defender, attackType, combo },
+    () => calc.calculateDamage(clone(attacker), clone(defender), attackType, combo));
+}
+
+for (let i = 0; i < 120; i++) {
+  const attacker = creature();
+  const defender = creature();
+  const turn = int(1, 12);
+  defender.currentTurn = turn;
+  if (chance(0.2)) attacker.nextAttackBonus = int(5, 25);
+  const attackType = pick(['auto', 'auto', 'physical', 'magical']);
+  const comboLevel = chance(0.3) ? int(1, 4) : 0;
+  record('attack', { attacker, defender, attackType, comboLevel, turn }, () => {
+    const r = core.processAttack(clone(attacker), clone(defender), attackType, comboLevel);
+    return {
+      attacker: creatureResult(r.updatedAttacker),
+      defender: creatureResult(r.updatedDefender),
+      damage: r.damage,
+      isCritical: r.isCritical,
+      isBlocked: r.isBlocked,
+      attackType: r.attackType,
+      battleLog: r.battleLog,
+    };
+  });
+}
+
+for (let i = 0; i < 100; i++) {
+  const c = creature();
+  const tool = item('tool');
+  const turn = int(0, 10);
+  record('tool', { creature: c, tool, turn }, () => {
+    const r = core.applyTool(clone(c), tool, 'medium', turn);
+    return { creature: creatureResult(r.updatedCreature), effect: r.toolEffect };
+  });
+}
+
+for (let i = 0; i < 100; i++) {
+  const caster = creature();
+  const target = chance(0.2) ? caster : creature();
+  const spell = item('spell');
+  const turn = int(0, 10);
+  record('spell', { caster, target, spell, turn }, () => {
+    const r = core.applySpell(clone(caster), clone(target), spell, 'medium', turn);
+    return {
+      caster: caster === target ? null : creatureResult(r.updatedCaster),
+      target: creatureResult(r.updatedTarget),
+      effect: r.spellEffect,
+    };
+  });
+}
+
+for (let i = 0; i < 50; i++) {
+  const c = creature();
+  const turn = int(0, 10);
+  c.currentTurn = turn;
+  record('defend', { creature: c, turn },
+    () => creatureResult(core.defendCreature(clone(c), 'medium')));
+}
+
+// Upkeep: a creature picks up a few effects, then goes through several
+// turns of applyOngoingEffects
+for (let i = 0; i < 60; i++) {
+  let c = creature();
+  const start = int(0, 5);
+  for (let n = int(1, 3); n > 0; n--) {
+    const roll = inputs();
+    if (roll < 0.5) {
+      c = core.applyTool(c, item('tool'), 'medium', start).updatedCreature;
+    } else if (roll < 0.85) {
+      const spell = item('spell');
+      c = core.applySpell(c, c, spell, 'medium', start).updatedTarget;
+    } else {
+      c.currentTurn = start;
+      c = core.defendCreature(c, 'medium');
+    }
+  }
+  const turns = [start, start + 1, start + 2, start + 3, start + 4];
+  const before = clone(c);
+  record('ongoing', { creature: before, turns }, () => {
+    let current = clone(before);
+    return turns.map((turn) => {
+      [current] = core.applyOngoingEffects([current], 'medium', turn);
+      return creatureResult(current);
+    });
+  });
+}
+
+const processDefeated = (() => {
+  // processDefeatedCreatures is private to battleCore; processTurn runs it
+  // after upkeep, so drive it through processTurn with no effects pending.
+  return (field, opposing) => {
+    const state = {
+      playerField: field, enemyField: opposing, playerHand: [], enemyHand: [],
+      playerDeck: [], enemyDeck: [], playerEnergy: 0, enemyEnergy: 0, turn: 0,
+    };
+    return core.processTurn(state, 'medium');
+  };
+})();
+
+for (let i = 0; i < 50; i++) {
+  const field = Array.from({ length: int(1, 4) }, () => {
+    const c = creature();
+    if (chance(0.4)) c.currentHealth = 0;
+    c.activeEffects = [];
+    c.currentTurn = 0;
+    return c;
+  });
+  const opposing = Array.from({ length: int(0, 3) }, () => {
+    const c = creature();
+    c.currentHealth = Math.max(1, c.currentHealth);
+    c.activeEffects = [];
+    c.currentTurn = 0;
+    return c;
+  });
+  record('defeated', { field, opposing }, () => {
+    const state = processDefeated(clone(field), clone(opposing));
+    return {
+      survivors: state.playerField.map((c) => ({ id: c.id, ...creatureResult(c) })),
+      opposing: state.enemyField.map((c) => ({ id: c.id, ...creatureResult(c) })),
+    };
+  });
+}
+
+// one case per line, so a regenerated corpus diffs readably
+fs.writeFileSync(OUT, `{"seed": ${SEED}, "cases": [\n${cases.map((c) => JSON.stringify(c)).join(',\n')}\n]}\n`);
+console.log(`wrote ${cases.length} cases to ${path.relative(process.cwd(), OUT)}`);
@@ -0,0 +1,197 @@
+"""
+Idempotency keys for retried POSTs.
+
+Telegram's mobile webview retries requests on flaky networks, and every
+retry used to run the endpoint again: SQLite writes, gateway calls and all.
+A client that sends an Idempotency-Key header now gets at most one
+execution per (user, URL path, key), so a key used on one battle's
+action endpoint means nothing on another's:
+
+  * the first request runs and its response is recorded;
+  * a retry is answered from the record, with an Idempotent-Replayed header;
+  * a retry that arrives while the first is still running waits for it
+    (up to IDEMPOTENCY_WAIT_SECONDS) instead of running alongside it;
+  * the same key with a different body is refused with 422.
+
+Responses of 500 and above are not recorded, so a retry after a server
+error runs again.  Requests without a key, or without a session, are not
+affected.
+
+Records live in memory, oldest first, and are dropped after
+IDEMPOTENCY_TTL_SECONDS or, oldest first, once there are more than
+IDEMPOTENCY_MAX_ENTRIES of them or their bodies exceed
+IDEMPOTENCY_MAX_BYTES.  IDEMPOTENCY.stats() counts replays, executions
+and evictions by cause.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Hashable, Optional, Tuple
+
+from flask import Response, jsonify, make_response, request, session
+
+from config import (IDEMPOTENCY_MAX_BYTES, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS,
+                    IDEMPOTENCY_WAIT_SECONDS)
+
+KEY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 128
+
+# IdempotencyStore.claim outcomes
+RUN = 'run'             # not seen before: execute, then finish() or release()
+REPLAY = 'replay'       # answered before: the record is returned
+MISMATCH = 'mismatch'   # the key was used for a different request body
+BUSY = 'busy'           # the first request is still running: wait on the event
+
+
+class _Record:
+    __slots__ = ("fingerprint", "status", "body", "mimetype", "stored_at")
+
+    def __init__(self, fingerprint: str, status: int, body: bytes, mimetype: str):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.body = body
+        self.mimetype = mimetype
+        self.stored_at = time.monotonic()
+
+    def response(self) -> Response:
+        response = Response(self.body, status=self.status, mimetype=self.mimetype)
+        response.headers[REPLAYED_HEADER] = 'true'
+        return response
+
+
+class IdempotencyStore:
+    """Recorded responses by scope, bounded in count, bytes and age"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._records: "OrderedDict[Hashable, _Record]" = OrderedDict()   # oldest first
+        self._pending: Dict[Hashable, Tuple[str, threading.Event]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {
+            'replayed': 0,
+            'executed': 0,
+            'recorded': 0,
+            'mismatched': 0,
+            'waited': 0,
+            'evicted_expired': 0,
+            'evicted_entries': 0,
+            'evicted_bytes': 0,
+        }
+
+    def claim(self, scope: Hashable, fingerprint: str) -> Tuple[str, Optional[object]]:
+        """
+        (RUN, None), (REPLAY, record), (MISMATCH, None) or (BUSY, event
+        set when the running request finishes).
+        """
+        with self._lock:
+            self._expire()
+            record = self._records.get(scope)
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    self._counts['mismatched'] += 1
+                    return MISMATCH, None
+                self._counts['replayed'] += 1
+                return REPLAY, record
+            pending = self._pending.get(scope)
+            if pending is not None:
+                if pending[0] != fingerprint:
+                    self._counts['mismatched'] += 1
+                    return MISMATCH, None
+                self._counts['waited'] += 1
+                return BUSY, pending[1]
+            self._pending[scope] = (fingerprint, threading.Event())
+            self._counts['executed'] += 1
+            return RUN, None
+
+    def finish(self, scope: Hashable, response: Response):
+        """Record the response of a claimed request (unless it is a server error)"""
+        with self._lock:
+            pending = self._pending.pop(scope, None)
+            if pending is None:
+                return
+            if response.status_code < 500:
+                record = _Record(pending[0], response.status_code, response.get_data(),
+                                 response.mimetype)
+                self._records[scope] = record
+                self._bytes += len(record.body)
+                self._counts['recorded'] += 1
+                self._evict()
+            pending[1].set()
+
+    def release(self, scope: Hashable):
+        """Give up a claim without recording anything; a retry runs again"""
+        with self._lock:
+            pending = self._pending.pop(scope, None)
+        if pending is not None:
+            pending[1].set()
+
+    def _drop_oldest(self, cause: str):
+        _, record = self._records.popitem(last=False)
+        self._bytes -= len(record.body)
+        self._counts[cause] += 1
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        while self._records and next(iter(self._records.values())).stored_at < deadline:
+            self._drop_oldest('evicted_expired')
+
+    def _evict(self):
+        self._expire()
+        while len(self._records) > self.max_entries:
+            self._drop_oldest('evicted_entries')
+        while self._bytes > self.max_bytes and self._records:
+            self._drop_oldest('evicted_bytes')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counts,
+                'entries': len(self._records),
+                'bytes': self._bytes,
+                'in_flight': len(self._pending),
+            }
+
+
+# Shared by the idempotent endpoints of app.py and pvp_routes.py
+IDEMPOTENCY = IdempotencyStore(IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_MAX_BYTES,
+                               IDEMPOTENCY_TTL_SECONDS)
+
+
+def idempotent(view):
+    """Route decorator: run the view once per Idempotency-Key (see module docstring)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(KEY_HEADER)
+        if not key or 'telegram_id' not in session:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{KEY_HEADER} is too long"}), 400
+
+        scope = (str(session['telegram_id']), request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        outcome, detail = IDEMPOTENCY.claim(scope, fingerprint)
+        if outcome == BUSY:
+            detail.wait(IDEMPOTENCY_WAIT_SECONDS)
+            outcome, detail = IDEMPOTENCY.claim(scope, fingerprint)
+
+        if outcome == REPLAY:
+            return detail.response()
+        if outcome == MISMATCH:
+            return jsonify({"error": f"{KEY_HEADER} was already used for a different request"}), 422
+        if outcome == BUSY:
+            return jsonify({"error": "A request with this key is still in progress"}), 409
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            IDEMPOTENCY.release(scope)
+            raise
+        IDEMPOTENCY.finish(scope, response)
+        return response
+    return wrapper
@@ -0,0 +1,266 @@
+"""
+Decoders for Babylon Gateway `programmatic_json`.
+
+`_unwrap` is the generic recursive decoder.  `decode_programmatic_json` is the
+fast path used by fetch_nft_data: for the known CreatureData / ToolData /
+SpellData layouts it compiles a positional extraction plan once per layout and
+reuses it for every NFT, and it falls back to `_unwrap` for any shape it does
+not recognise.  Both produce identical output.
+"""
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+# ────────────────────────────────────────────────────────────
+# Helper: recursively unwrap Babylon programmatic JSON
+#          (PATCHED – tuple of named fields ⇒ dict)
+# ────────────────────────────────────────────────────────────
+def _unwrap(val):
+    """
+    Convert Radix Gateway programmatic_json to plain Python objects.
+
+    • Struct  → dict  {field_name: value, …}
+    • Tuple   → *if* its elements look like {field_name: …} records,
+                return the same dict; otherwise regular list
+    • Array   → list
+    • Enum    → unwrap & keep "variant" info if needed
+    • Decimal → Decimal()
+    • others  → primitive
+    """
+    if not isinstance(val, dict) or "kind" not in val:
+        return val                                # already plain
+
+    kind = val["kind"]
+
+    # ── Struct ───────────────────────────────────────────────
+    if kind == "Struct":
+        return {f["field_name"]: _unwrap(f["value"])
+                for f in val.get("fields", [])}
+
+    # ── Tuple (patched) ──────────────────────────────────────
+    if kind == "Tuple":
+        elems = val.get("elements") or val.get("fields") or []
+        # If every element has a `field_name`, treat as a record
+        if all(isinstance(e, dict) and "field_name" in e for e in elems):
+            return {e["field_name"]:
+                    _unwrap(e.get("value", e)) for e in elems}
+        # otherwise: anonymous tuple → list
+        return [_unwrap(e) for e in elems]
+
+    # ── Array ────────────────────────────────────────────────
+    if kind == "Array":
+        return [_unwrap(v) for v in val.get("elements", [])]
+
+    # ── Enum ─────────────────────────────────────────────────
+    # PATCH ‒ replace ONLY the Enum branch inside _unwrap
+    # ── Enum ─────────────────────────────────────────────────
+    if kind == "Enum":
+        variant = (val.get("name")          # old (<= v1.9)
+                   or val.get("variant_name")   # new (v1.10+)
+                   or val.get("variant")        # already-unwrapped
+                   or "Unknown")
+        fields  = val.get("fields") or []
+        if fields:                               # payload-carrying enum
+            inner = _unwrap(fields[0])
+            if isinstance(inner, dict):
+                inner["variant"] = variant
+                return inner
+            return {"variant": variant, "value": inner}
+        return variant                           # simple enum
+
+    # ── Decimal ──────────────────────────────────────────────
+    if kind == "Decimal":
+        return Decimal(val["value"])
+
+    # ── Fallback for primitive kinds ─────────────────────────
+    return val.get("value", val)
+
+
+# ────────────────────────────────────────────────────────────
+# Fast path – kind dispatch table
+# ────────────────────────────────────────────────────────────
+def _fast_struct(val):
+    return {f["field_name"]: unwrap_fast(f["value"])
+            for f in val.get("fields", [])}
+
+def _fast_tuple(val):
+    elems = val.get("elements") or val.get("fields") or []
+    named = {}
+    for e in elems:
+        if type(e) is not dict or "field_name" not in e:
+            # anonymous tuple → list
+            return [unwrap_fast(x) for x in elems]
+        named[e["field_name"]] = unwrap_fast(e["value"]) if "value" in e else unwrap_fast(e)
+    return named
+
+def _fast_array(val):
+    return [unwrap_fast(v) for v in val.get("elements", [])]
+
+def _fast_enum(val):
+    variant = (val.get("name")
+               or val.get("variant_name")
+               or val.get("variant")
+               or "Unknown")
+    fields = val.get("fields")
+    if fields:
+        inner = unwrap_fast(fields[0])
+        if type(inner) is dict:
+            inner["variant"] = variant
+            return inner
+        return {"variant": variant, "value": inner}
+    return variant
+
+def _fast_decimal(val):
+    return Decimal(val["value"])
+
+_KIND_DECODERS: Dict[str, Callable[[dict], Any]] = {
+    "Struct":  _fast_struct,
+    "Tuple":   _fast_tuple,
+    "Array":   _fast_array,
+    "Enum":    _fast_enum,
+    "Decimal": _fast_decimal,
+}
+
+def unwrap_fast(val):
+    """Same result as `_unwrap`, with a dict dispatch instead of an if-chain."""
+    if type(val) is not dict or "kind" not in val:
+        return val                                # already plain
+    decoder = _KIND_DECODERS.get(val["kind"])
+    if decoder is not None:
+        return decoder(val)
+    return val.get("value", val)
+
+
+# ────────────────────────────────────────────────────────────
+# Fast path – schema-specialised plans for known NFT layouts
+# ────────────────────────────────────────────────────────────
+# Fields each known layout must carry (extra fields are fine)
+KNOWN_LAYOUTS: Dict[str, frozenset] = {
+    "CreatureData": frozenset({"species_id", "form", "stats"}),
+    "ToolData":     frozenset({"tool_name", "tool_type", "tool_effect"}),
+    "SpellData":    frozenset({"spell_name", "spell_type", "spell_effect"}),
+}
+
+MAX_PLANS = 64
+
+class _ShapeMismatch(Exception):
+    """Raised by a compiled plan when an NFT does not match its layout"""
+
+# How a compiled field is extracted
+_VALUE, _RECORD, _OPTION, _GENERIC = range(4)
+
+def _compile_field(elem) -> tuple:
+    """
+    Build the plan entry for one named tuple element, specialised on its kind:
+    (field_name, kind, how, sub_plan)
+    """
+    name = elem["field_name"]
+    kind = elem.get("kind")
+
+    if "value" in elem:
+        # Named primitives (String, U8, Decimal, …) carry their payload in
+        # "value"; `_unwrap` returns it as is
+        return (name, kind, _VALUE, None)
+
+    if kind == "Tuple":
+        inner = elem.get("elements") or elem.get("fields") or []
+        if inner and all(type(x) is dict and "field_name" in x for x in inner):
+            return (name, kind, _RECORD, _compile_record(inner))
+
+    if kind == "Enum":
+        # Option<Record>: payload plans are compiled lazily per variant
+        return (name, kind, _OPTION, {})
+
+    # Arrays, maps … vary per NFT – decode generically
+    return (name, kind, _GENERIC, None)
+
+def _compile_record(elems) -> tuple:
+    return tuple(_compile_field(e) for e in elems)
+
+def _run_option(e, payload_plans: dict):
+    variant = (e.get("name")
+               or e.get("variant_name")
+               or e.get("variant")
+               or "Unknown")
+    fields = e.get("fields")
+    if not fields:
+        return variant
+    payload = fields[0]
+    if type(payload) is dict and payload.get("kind") == "Tuple":
+        elems = payload.get("elements") or payload.get("fields")
+        if elems:
+            plan = payload_plans.get(variant)
+            if plan is None and len(payload_plans) < 8 \
+                    and all(type(x) is dict and "field_name" in x for x in elems):
+                plan = payload_plans[variant] = _compile_record(elems)
+            if plan is not None:
+                inner = _run_record(elems, plan)
+                inner["variant"] = variant
+                return inner
+    return _fast_enum(e)
+
+def _run_record(elems, plan) -> dict:
+    if len(elems) != len(plan):
+        raise _ShapeMismatch("field count")
+    out = {}
+    for e, (name, kind, how, sub) in zip(elems, plan):
+        if e["field_name"] != name or e["kind"] != kind:
+            raise _ShapeMismatch(name)
+        if how == _VALUE:
+            out[name] = e["value"]
+        elif how == _RECORD:
+            out[name] = _run_record(e.get("elements") or e.get("fields") or (), sub)
+        elif how == _OPTION:
+            out[name] = _run_option(e, sub)
+        else:
+            out[name] = unwrap_fast(e)
+    return out
+
+def _layout_of(names) -> Optional[str]:
+    present = set(names)
+    for layout, required in KNOWN_LAYOUTS.items():
+        if required <= present:
+            return layout
+    return None
+
+# plan key -> compiled record plan; None marks a shape we decided not to specialise
+_PLANS: Dict[tuple, Optional[tuple]] = {}
+_PLANS_LOCK = threading.Lock()
+
+def _plan_key(val, elems) -> tuple:
+    return (val.get("type_name"), len(elems),
+            elems[0].get("field_name"), elems[-1].get("field_name"))
+
+def decode_programmatic_json(val):
+    """
+    Decode an NFT's programmatic_json.
+
+    Known layouts are decoded with a compiled positional plan; anything else
+    (or any NFT that deviates from its plan) goes through `_unwrap`.
+    """
+    if type(val) is not dict or val.get("kind") != "Tuple":
+        return _unwrap(val)
+
+    elems = val.get("elements") or val.get("fields")
+    if not elems or type(elems[0]) is not dict:
+        return _unwrap(val)
+
+    key = _plan_key(val, elems)
+    plan = _PLANS.get(key, False)
+
+    if plan is False:
+        plan = None
+        if all(type(e) is dict and "field_name" in e for e in elems) \
+                and _layout_of(e["field_name"] for e in elems):
+            plan = _compile_record(elems)
+        with _PLANS_LOCK:
+            if len(_PLANS) < MAX_PLANS:
+                _PLANS[key] = plan
+
+    if plan is None:
+        return _unwrap(val)
+
+    try:
+        return _run_record(elems, plan)
+    except (_ShapeMismatch, KeyError, TypeError, AttributeError):
+        return _unwrap(val)
@@ -0,0 +1,306 @@
+"""
+Local index of which NFIDs each account owns, kept in SQLite.
+
+    nft_ownership       (account_address, resource_address, nfid, state_version)
+    nft_ownership_sync  (account_address, state_version, synced_at)
+
+An account is indexed once from a full /state/entity/details snapshot.  After
+that it is brought up to date with a delta: the committed transactions that
+touched the account since the stored state_version, read from
+/stream/transactions with balance changes.  Freshly minted NFTs are recorded
+eagerly from the mint transaction, so they show up before the next sync.
+"""
+import sqlite3
+import time
+import traceback
+from typing import Dict, Iterable, List, Optional
+
+from config import DATABASE_PATH
+from gateway_resilience import GATEWAY, GatewayUnavailable
+
+# Same resources as app.py: creatures, tools, spells
+CREATURE_NFT_RESOURCE = "resource_rdx1ntq7xkr0345fz8hkkappg2xsnepuj94a9wnu287km5tswu3323sjnl"
+TOOL_NFT_RESOURCE = "resource_rdx1ntg0wsnuxq05z75f2jy7k20w72tgkt4crmdzcpyfvvgte3uvr9d5f0"
+SPELL_NFT_RESOURCE = "resource_rdx1nfjm7ecgxk4m54pyy3mc75wgshh9usmyruy5rx7gkt3w2megc9s8jf"
+TRACKED_RESOURCES = (CREATURE_NFT_RESOURCE, TOOL_NFT_RESOURCE, SPELL_NFT_RESOURCE)
+
+SYNC_MIN_INTERVAL = 10      # seconds between delta queries for one account
+DELTA_PAGE_LIMIT = 100      # transactions per /stream/transactions page
+DELTA_MAX_PAGES = 5         # more than this -> take a fresh snapshot instead
+
+
+def get_db_connection():
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_nft_ownership_tables():
+    """Create the ownership index tables if they don't exist"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS nft_ownership (
+            account_address TEXT NOT NULL,
+            resource_address TEXT NOT NULL,
+            nfid TEXT NOT NULL,
+            state_version INTEGER NOT NULL,
+            PRIMARY KEY (account_address, resource_address, nfid)
+        )
+    """)
+    # Lookup of an NFID's current owner
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_nft_ownership_nfid
+        ON nft_ownership(resource_address, nfid)
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS nft_ownership_sync (
+            account_address TEXT PRIMARY KEY,
+            state_version INTEGER NOT NULL,
+            synced_at INTEGER NOT NULL
+        )
+    """)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+# ──────────────────────────────────────────────────────────────
+# Writes
+# ──────────────────────────────────────────────────────────────
+def _apply_changes(cur, account_address: str, resource_address: str,
+                   added: Iterable[str], removed: Iterable[str], state_version: int):
+    for nfid in removed:
+        cur.execute("""
+            DELETE FROM nft_ownership
+            WHERE account_address = ? AND resource_address = ? AND nfid = ?
+              AND state_version <= ?
+        """, (account_address, resource_address, nfid, state_version))
+    for nfid in added:
+        # An NFID has one owner: drop any older row held by another account
+        cur.execute("""
+            DELETE FROM nft_ownership
+            WHERE resource_address = ? AND nfid = ? AND account_address != ?
+              AND state_version <= ?
+        """, (resource_address, nfid, account_address, state_version))
+        cur.execute("""
+            INSERT INTO nft_ownership (account_address, resource_address, nfid, state_version)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(account_address, resource_address, nfid)
+            DO UPDATE SET state_version = MAX(state_version, excluded.state_version)
+        """, (account_address, resource_address, nfid, state_version))
+
+
+def record_balance_changes(transaction: Dict) -> int:
+    """
+    Apply the non-fungible balance changes of one committed transaction
+    (a /transaction/committed-details `transaction` object fetched with the
+    balance_changes opt-in).  Used to index mints eagerly.
+    Returns the number of NFID changes recorded.
+    """
+    changes = (transaction.get("balance_changes") or {}).get("non_fungible_balance_changes") or []
+    state_version = transaction.get("state_version")
+    if not changes or state_version is None:
+        return 0
+
+    recorded = 0
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        for change in changes:
+            resource = change.get("resource_address")
+            account = change.get("entity_address", "")
+            if resource not in TRACKED_RESOURCES or not account.startswith("account_"):
+                continue
+            added = change.get("added") or []
+            removed = change.get("removed") or []
+            _apply_changes(cur, account, resource, added, removed, state_version)
+            recorded += len(added) + len(removed)
+        conn.commit()
+    finally:
+        conn.close()
+    return recorded
+
+
+def _store_snapshot(account_address: str, owned: Dict[str, List[str]], state_version: int):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("DELETE FROM nft_ownership WHERE account_address = ?", (account_address,))
+        for resource, nfids in owned.items():
+            _apply_changes(cur, account_address, resource, nfids, (), state_version)
+        cur.execute("""
+            INSERT OR REPLACE INTO nft_ownership_sync (account_address, state_version, synced_at)
+            VALUES (?, ?, ?)
+        """, (account_address, state_version, int(time.time())))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ──────────────────────────────────────────────────────────────
+# Gateway reads
+# ──────────────────────────────────────────────────────────────
+def _snapshot_from_gateway(account_address: str):
+    """Full list of tracked NFIDs held by the account at one ledger state"""
+    resp = GATEWAY.post("/state/entity/details", {
+        "addresses": [account_address],
+        "aggregation_level": "Vault",
+        "opt_ins": {"non_fungible_include_nfids": True}
+    }, timeout=15)
+    if resp.status_code != 200:
+        raise GatewayUnavailable(f"entity/details: HTTP {resp.status_code}")
+
+    data = resp.json()
+    state_version = data["ledger_state"]["state_version"]
+    owned = {resource: [] for resource in TRACKED_RESOURCES}
+
+    items = data.get("items") or []
+    resources = ((items[0].get("non_fungible_resources") or {}).get("items") or []) if items else []
+    for res in resources:
+        resource = res.get("resource_address")
+        if resource not in owned:
+            continue
+        for vault in (res.get("vaults") or {}).get("items") or []:
+            owned[resource].extend(vault.get("items") or [])
+            cursor = vault.get("next_cursor")
+            while cursor:
+                page = GATEWAY.post("/state/entity/page/non-fungible-vault/ids", {
+                    "address": account_address,
+                    "resource_address": resource,
+                    "vault_address": vault.get("vault_address"),
+                    "cursor": cursor,
+                    "at_ledger_state": {"state_version": state_version}
+                }, timeout=15)
+                page.raise_for_status()
+                page_data = page.json()
+                owned[resource].extend(page_data.get("items") or [])
+                cursor = page_data.get("next_cursor")
+    return owned, state_version
+
+
+def _delta_from_gateway(account_address: str, from_state_version: int):
+    """
+    Committed transactions touching the account after `from_state_version`.
+    Returns (transactions, state_version) or None when the gap is too large
+    to be worth replaying.
+    """
+    transactions = []
+    at_state = None
+    cursor = None
+    for _ in range(DELTA_MAX_PAGES):
+        payload = {
+            "from_ledger_state": {"state_version": from_state_version + 1},
+            "affected_global_entities_filter": [account_address],
+            "order": "Asc",
+            "limit_per_page": DELTA_PAGE_LIMIT,
+            "opt_ins": {"balance_changes": True}
+        }
+        if at_state is not None:
+            payload["at_ledger_state"] = {"state_version": at_state}
+        if cursor:
+            payload["cursor"] = cursor
+
+        resp = GATEWAY.post("/stream/transactions", payload, timeout=15)
+        if resp.status_code != 200:
+            raise GatewayUnavailable(f"stream/transactions: HTTP {resp.status_code}")
+        data = resp.json()
+        if at_state is None:
+            at_state = data["ledger_state"]["state_version"]
+
+        transactions.extend(data.get("items") or [])
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return transactions, at_state
+    return None
+
+
+def sync_account(account_address: str, force: bool = False) -> bool:
+    """
+    Bring the index for `account_address` up to date.
+    Returns True when the index now reflects the ledger; False when the
+    gateway was unavailable (any previously indexed rows are kept).
+    """
+    conn = get_db_connection()
+    row = conn.execute("""
+        SELECT state_version, synced_at FROM nft_ownership_sync WHERE account_address = ?
+    """, (account_address,)).fetchone()
+    conn.close()
+
+    if row and not force and time.time() - row["synced_at"] < SYNC_MIN_INTERVAL:
+        return True
+
+    try:
+        delta = _delta_from_gateway(account_address, row["state_version"]) if row else None
+        if delta is None:
+            owned, state_version = _snapshot_from_gateway(account_address)
+            _store_snapshot(account_address, owned, state_version)
+            print(f"[nft_ownership] snapshot of {account_address} at {state_version}: "
+                  f"{sum(len(v) for v in owned.values())} NFTs")
+            return True
+
+        transactions, state_version = delta
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            for tx in transactions:
+                changes = (tx.get("balance_changes") or {}).get("non_fungible_balance_changes") or []
+                for change in changes:
+                    if (change.get("entity_address") != account_address
+                            or change.get("resource_address") not in TRACKED_RESOURCES):
+                        continue
+                    _apply_changes(cur, account_address, change["resource_address"],
+                                   change.get("added") or [], change.get("removed") or [],
+                                   tx["state_version"])
+            cur.execute("""
+                UPDATE nft_ownership_sync SET state_version = ?, synced_at = ?
+                WHERE account_address = ?
+            """, (state_version, int(time.time()), account_address))
+            conn.commit()
+        finally:
+            conn.close()
+        return True
+    except GatewayUnavailable as e:
+        print(f"[nft_ownership] sync of {account_address} deferred: {e}")
+        return False
+    except Exception as e:
+        print(f"[nft_ownership] sync of {account_address} failed: {e}")
+        traceback.print_exc()
+        return False
+
+
+# ──────────────────────────────────────────────────────────────
+# Reads
+# ──────────────────────────────────────────────────────────────
+def indexed_nfids(account_address: str, resource_address: str) -> Optional[List[str]]:
+    """
+    NFIDs of `resource_address` the index says the account owns, with no
+    gateway call.  None if the account has never been indexed.
+    """
+    conn = get_db_connection()
+    try:
+        if not conn.execute("SELECT 1 FROM nft_ownership_sync WHERE account_address = ?",
+                            (account_address,)).fetchone():
+            return None
+        rows = conn.execute("""
+            SELECT nfid FROM nft_ownership
+            WHERE account_address = ? AND resource_address = ?
+            ORDER BY state_version, nfid
+        """, (account_address, resource_address)).fetchall()
+        return [row["nfid"] for row in rows]
+    finally:
+        conn.close()
+
+
+def owned_nfids(account_address: str, resource_address: str, force: bool = False) -> Optional[List[str]]:
+    """
+    Sync the account (delta query, rate limited) and return its NFIDs of
+    `resource_address` from the index.  None if the account could not be
+    indexed at all.
+    """
+    sync_account(account_address, force=force)
+    return indexed_nfids(account_address, resource_address)
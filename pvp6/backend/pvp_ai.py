@@ -0,0 +1,377 @@
+"""
+PvP decision policies, shared by the bot opponents (pvp_bots.py) and the
+headless simulator (pvp_simulator.py).
+
+    random     picks uniformly among the actions it can afford
+    greedy     deploys its strongest creature, then takes the attack with the
+               best expected damage (kills first)
+    heuristic  a condensed port of the planner in frontend/src/utils/battleAI.js,
+               tuned per difficulty tier from difficultySettings.js
+
+A policy's turn() is a generator of action dicts for PvPBattleState; it sees
+the battle after each action it yields, so later choices account for
+earlier results.  Policies never end the turn themselves: the caller sends
+endTurn when the generator is exhausted.
+"""
+import math
+from typing import Dict, Iterator, List, NamedTuple
+
+from pvp_battle_state import PvPBattleState
+from pvp_combat_rules import expected_field_damage, parse_form
+
+FIELD_LIMIT = 4             # PvPBattleState._process_deploy
+ATTACK_COST = 2
+DEFEND_COST = 1
+SPELL_COST = 4
+
+
+class Difficulty(NamedTuple):
+    """The difficultySettings.js / battleAI.js values the heuristic policy reads"""
+    name: str
+    min_form: int
+    max_form: int
+    rarity_weights: Dict[str, float]
+    focus_fire_chance: float
+    max_actions: int            # getMaxActionsForDifficulty
+    always_aggressive: bool     # hard and expert attack regardless of the board
+
+
+DIFFICULTIES = {
+    "easy": Difficulty("easy", 1, 2, {"Common": 0.4, "Rare": 0.35, "Epic": 0.2, "Legendary": 0.05},
+                       0.4, 3, False),
+    "medium": Difficulty("medium", 1, 3, {"Common": 0.2, "Rare": 0.35, "Epic": 0.35, "Legendary": 0.1},
+                         0.6, 4, False),
+    "hard": Difficulty("hard", 2, 3, {"Common": 0.05, "Rare": 0.25, "Epic": 0.45, "Legendary": 0.25},
+                       0.8, 5, True),
+    "expert": Difficulty("expert", 2, 3, {"Common": 0.0, "Rare": 0.1, "Epic": 0.5, "Legendary": 0.4},
+                         0.95, 7, True),
+}
+
+
+def _deploy_cost(creature) -> int:
+    return 5 + parse_form(creature.form)
+
+
+def _health_fraction(view: Dict) -> float:
+    return view["currentHealth"] / (view["battleStats"].get("maxHealth") or 50)
+
+
+class RandomPolicy:
+    """Uniform over the legal action kinds (PvPBattleState.legal_actions), then over their targets"""
+    name = "random"
+
+    def __init__(self, end_turn_chance: float = 0.15):
+        self.end_turn_chance = end_turn_chance
+
+    def turn(self, battle: PvPBattleState, player_id: int, rng) -> Iterator[Dict]:
+        while rng.random() >= self.end_turn_chance:
+            legal = battle.legal_actions(player_id)
+            options = []
+            if "deploy" in legal:
+                options.append(lambda: {"type": "deploy", "creatureId": rng.choice(legal["deploy"])})
+            if "attack" in legal:
+                attack = legal["attack"]
+                options.append(lambda: {"type": "attack",
+                                        "attackerId": rng.choice(attack["attackerIds"]),
+                                        "targetId": rng.choice(attack["targetIds"])})
+            if "defend" in legal:
+                options.append(lambda: {"type": "defend", "creatureId": rng.choice(legal["defend"])})
+            if "useTool" in legal:
+                tool = legal["useTool"]
+                options.append(lambda: {"type": "useTool", "toolId": rng.choice(tool["toolIds"]),
+                                        "targetId": rng.choice(tool["targetIds"])})
+            if "useSpell" in legal:
+                spell = legal["useSpell"]
+                options.append(lambda: {"type": "useSpell",
+                                        "spellId": rng.choice(spell["spellIds"]),
+                                        "casterId": rng.choice(spell["casterIds"]),
+                                        "targetId": rng.choice(spell["targetIds"])})
+            if not options:
+                return
+            yield rng.choice(options)()
+
+
+class GreedyPolicy:
+    """Strongest affordable deployment, then the best expected attack, repeated"""
+    name = "greedy"
+
+    def turn(self, battle: PvPBattleState, player_id: int, rng) -> Iterator[Dict]:
+        me = battle.get_player_state(player_id)
+        foe = battle.get_opponent_state(player_id)
+
+        # Tools cost no energy: put them all on the hardest hitter
+        if me.tools and me.field:
+            target = max(me.field, key=lambda c: _attack_power(c.combat_view()))
+            for tool in list(me.tools):
+                yield {"type": "useTool", "toolId": tool.id, "targetId": target.id}
+
+        while True:
+            affordable = [c for c in me.hand if _deploy_cost(c) <= me.energy]
+            if affordable and len(me.field) < FIELD_LIMIT:
+                best = max(affordable, key=lambda c: creature_power(c.combat_view()))
+                yield {"type": "deploy", "creatureId": best.id}
+                continue
+            if me.energy < ATTACK_COST or not me.field or not foe.field:
+                return
+            targets = [c.combat_view() for c in foe.field]
+            best, best_score = None, -1.0
+            for attacker in me.field:
+                damage = expected_field_damage(attacker.combat_view(), targets, "auto")
+                for target, dealt in zip(targets, damage):
+                    # a kill beats any amount of chip damage
+                    score = dealt + 1000 if dealt >= target["currentHealth"] else dealt
+                    if score > best_score:
+                        best, best_score = (attacker.id, target["id"]), score
+            yield {"type": "attack", "attackerId": best[0], "targetId": best[1]}
+
+
+# battleAI.js scoring helpers
+_RARITY_POWER = {"Legendary": 1.5, "Epic": 1.3, "Rare": 1.15, "Common": 1.0}
+_RARITY_PRIORITY = {"Legendary": 80, "Epic": 60, "Rare": 40, "Common": 20}
+_RARITY_DEPLOY_BONUS = {"Legendary": 30, "Epic": 20, "Rare": 10, "Common": 5}
+_TYPE_ADVANTAGES = (("strength", "stamina"), ("stamina", "speed"), ("speed", "magic"),
+                    ("magic", "energy"), ("energy", "strength"))
+_FIELD_SYNERGIES = (("strength", "stamina", 1.5), ("magic", "energy", 1.5), ("speed", "strength", 1),
+                    ("stamina", "magic", 1), ("energy", "speed", 1))
+
+def _attack_power(view: Dict) -> float:
+    stats = view.get("battleStats") or {}
+    return max(stats.get("physicalAttack") or 0, stats.get("magicalAttack") or 0)
+
+
+def creature_power(view: Dict) -> int:
+    """calculateCreaturePower"""
+    stats = view.get("battleStats")
+    if not stats:
+        return 0
+    power = float(sum((view.get("stats") or {}).values()))
+    power += _attack_power(view) * 2
+    power += max(stats.get("physicalDefense") or 0, stats.get("magicalDefense") or 0)
+    power += (stats.get("maxHealth") or 50) / 10
+    power *= view.get("currentHealth", 0) / (stats.get("maxHealth") or 50)
+    power *= _RARITY_POWER.get(view.get("rarity"), 1.0)
+    power *= 1 + parse_form(view.get("form")) * 0.2
+    if view.get("activeEffects"):
+        power *= 1.1
+    if view.get("isDefending"):
+        power *= 0.8
+    return round(power)
+
+
+def estimate_attack_damage(attacker: Dict, defender: Dict) -> int:
+    """estimateAttackDamage: the better of attack minus half defence, either kind"""
+    a = attacker.get("battleStats") or {}
+    d = defender.get("battleStats") or {}
+    physical = max(1, (a.get("physicalAttack") or 0) - (d.get("physicalDefense") or 0) * 0.5)
+    magical = max(1, (a.get("magicalAttack") or 0) - (d.get("magicalDefense") or 0) * 0.5)
+    damage = max(physical, magical)
+    if defender.get("isDefending"):
+        damage = math.floor(damage * 0.3)
+    return damage
+
+
+def _has_type_advantage(attacker: Dict, defender: Dict) -> bool:
+    a, d = attacker.get("stats"), defender.get("stats")
+    if not a or not d:
+        return False
+    return any((a.get(strong) or 0) > 7 and (d.get(weak) or 0) > 6 for strong, weak in _TYPE_ADVANTAGES)
+
+
+def _field_synergy(creature: Dict, field: List[Dict]) -> float:
+    score = 0.0
+    stats = creature.get("stats") or {}
+    for other in field:
+        if creature.get("species_name") == other.get("species_name"):
+            score += 2
+        other_stats = other.get("stats") or {}
+        for first, second, bonus in _FIELD_SYNERGIES:
+            if (stats.get(first) or 0) > 7 and (other_stats.get(second) or 0) > 7:
+                score += bonus
+    return score
+
+
+def target_priority(target: Dict, attackers: List[Dict]) -> float:
+    """calculateTargetPriority"""
+    priority = creature_power(target)
+    health = _health_fraction(target)
+    if health < 0.25:
+        priority += 100
+    elif health < 0.5:
+        priority += 50
+    priority += _RARITY_PRIORITY.get(target.get("rarity"), 20)
+    priority += parse_form(target.get("form")) * 25
+    if len(target.get("specialty_stats") or ()) >= 2:
+        priority += 30
+    priority += 20 * len(target.get("activeEffects") or ())
+    if any(estimate_attack_damage(a, target) >= target["currentHealth"] for a in attackers):
+        priority += 150
+    return priority
+
+
+def _can_eliminate(target: Dict, attackers: List[Dict], energy: int) -> bool:
+    total, spent = 0, 0
+    for attacker in attackers:
+        if not attacker.get("isDefending") and spent + ATTACK_COST <= energy:
+            total += estimate_attack_damage(attacker, target)
+            spent += ATTACK_COST
+    return total >= target["currentHealth"]
+
+
+def deployment_value(creature: Dict, field: List[Dict], enemies: List[Dict]) -> float:
+    """calculateDeploymentValue without a strategy bonus"""
+    power = creature_power(creature)
+    value = power + power / ((creature.get("battleStats") or {}).get("energyCost") or 5) * 10
+    value += _field_synergy(creature, field) * 5
+    value += 20 * sum(1 for enemy in enemies if _has_type_advantage(creature, enemy))
+    value += parse_form(creature.get("form")) * 20
+    value += _RARITY_DEPLOY_BONUS.get(creature.get("rarity"), 5)
+    return value
+
+
+class HeuristicPolicy:
+    """
+    planEnhancedActions from battleAI.js, planned once at the start of the
+    turn.  Item combos and named strategies are left out; attacks whose
+    target has already died are redirected to the best remaining target.
+    """
+    name = "heuristic"
+
+    def __init__(self, difficulty: str = "medium"):
+        self.difficulty = DIFFICULTIES[difficulty]
+
+    def turn(self, battle: PvPBattleState, player_id: int, rng) -> Iterator[Dict]:
+        me = battle.get_player_state(player_id)
+        foe = battle.get_opponent_state(player_id)
+        own = [c.combat_view() for c in me.field]
+        enemies = [c.combat_view() for c in foe.field]
+        energy = me.energy
+        tools = list(me.tools)
+        spells = list(me.spells)
+
+        own_power = sum(creature_power(c) for c in own)
+        enemy_power = sum(creature_power(c) for c in enemies)
+        own_health = sum(_health_fraction(c) for c in own) / len(own) if own else 0
+        enemy_health = sum(_health_fraction(c) for c in enemies) / len(enemies) if enemies else 0
+        weak = [c for c in enemies if _health_fraction(c) < 0.4]
+        critical = [c for c in own if _health_fraction(c) < 0.15
+                    or (c.get("rarity") == "Legendary" and _health_fraction(c) < 0.25)]
+        tension = abs(own_power - enemy_power) / max(own_power, enemy_power, 1)
+        aggressive = (own_power > enemy_power * 1.1
+                      or own_health > enemy_health * 1.2
+                      or len(own) / max(len(enemies), 1) >= 1.2
+                      or len(weak) >= 2
+                      or (tension > 0.5 and own_power >= enemy_power)
+                      or self.difficulty.always_aggressive)
+        focus_fire = (rng.random() < self.difficulty.focus_fire_chance or bool(weak)
+                      or (self.difficulty.name == "expert" and len(enemies) <= 3))
+        priorities = sorted(((target_priority(c, own), _can_eliminate(c, own, energy), c)
+                             for c in enemies), key=lambda entry: -entry[0])
+        used = set()
+        planned = 0
+
+        # 0: emergency defence
+        for creature in critical:
+            shield = next((t for t in tools if t.effect == "Shield"
+                           or (t.item_type == "stamina" and t.effect == "Echo")), None)
+            if shield:
+                tools.remove(shield)
+                yield {"type": "useTool", "toolId": shield.id, "targetId": creature["id"]}
+                planned += 1
+            elif energy >= DEFEND_COST:
+                energy -= DEFEND_COST
+                used.add(creature["id"])
+                yield {"type": "defend", "creatureId": creature["id"]}
+                planned += 1
+
+        # 2: deployment up to the optimal field size
+        optimal = min(len(enemies) + 1, FIELD_LIMIT)
+        if energy >= 15:
+            optimal = min(optimal + 1, FIELD_LIMIT)
+        if len(own) < optimal and me.hand:
+            hand = sorted((c.combat_view() for c in me.hand),
+                          key=lambda c: -deployment_value(c, own, enemies))
+            wanted = 2 if aggressive else 1
+            for creature in hand:
+                cost = creature["battleStats"].get("energyCost") or 5
+                if wanted and cost <= energy and len(own) < FIELD_LIMIT:
+                    energy -= cost
+                    wanted -= 1
+                    own.append(creature)
+                    yield {"type": "deploy", "creatureId": creature["id"]}
+                    planned += 1
+
+        # 3: buff the strongest attackers before attacking
+        if aggressive and tools:
+            buffs = [t for t in tools if t.effect == "Surge" or t.item_type == "strength"]
+            attackers = sorted((c for c in own if not c.get("isDefending") and c["id"] not in used),
+                               key=lambda c: -_attack_power(c))
+            for tool, attacker in zip(buffs, attackers):
+                tools.remove(tool)
+                yield {"type": "useTool", "toolId": tool.id, "targetId": attacker["id"]}
+                planned += 1
+
+        # 4: damage spells on the priority targets
+        if own and enemies:
+            damage_spells = [s for s in spells if s.effect in ("Surge", "Drain")
+                             or s.item_type in ("strength", "magic")]
+            for index, spell in enumerate(damage_spells):
+                if energy < SPELL_COST:
+                    break
+                caster = max(own, key=lambda c: (c.get("battleStats") or {}).get("magicalAttack") or 0)
+                target = priorities[index][2] if index < len(priorities) else enemies[0]
+                energy -= SPELL_COST
+                used.add(caster["id"])
+                yield {"type": "useSpell", "spellId": spell.id, "casterId": caster["id"],
+                       "targetId": target["id"]}
+                planned += 1
+
+        # 5: attacks, focused on one target or spread over the best pairings
+        attackers = [c for c in own if not c.get("isDefending") and c["id"] not in used]
+        plan = []
+        if attackers and priorities and energy >= ATTACK_COST:
+            if focus_fire:
+                focus = next((c for _, kill, c in priorities if kill), priorities[0][2])
+                plan = [(a, focus) for a in attackers]
+            else:
+                scores = {c["id"]: score for score, _, c in priorities}
+                pairings = []
+                for attacker in attackers:
+                    for target in enemies:
+                        damage = estimate_attack_damage(attacker, target)
+                        pairings.append((damage >= target["currentHealth"],
+                                         damage + scores[target["id"]], attacker, target))
+                pairings.sort(key=lambda p: (not p[0], -p[1]))
+                seen = set()
+                for _, _, attacker, target in pairings:
+                    if attacker["id"] not in seen:
+                        seen.add(attacker["id"])
+                        plan.append((attacker, target))
+        for attacker, target in plan[:energy // ATTACK_COST]:
+            if not foe.field.get(target["id"]):
+                # planned target already died: next best one still standing
+                target = next((c for _, _, c in priorities if foe.field.get(c["id"])), None)
+                if target is None:
+                    break
+            energy -= ATTACK_COST
+            used.add(attacker["id"])
+            yield {"type": "attack", "attackerId": attacker["id"], "targetId": target["id"]}
+            planned += 1
+
+        # 6: setup for the next turn, if the difficulty allows more actions
+        if planned >= self.difficulty.max_actions:
+            return
+        echo = next((t for t in tools if t.effect == "Echo"), None)
+        candidates = [c for c in own if c["id"] not in used and me.field.get(c["id"])]
+        if echo and candidates:
+            tools.remove(echo)
+            yield {"type": "useTool", "toolId": echo.id,
+                   "targetId": max(candidates, key=creature_power)["id"]}
+        if energy >= DEFEND_COST:
+            idle = [c for c in candidates if not c.get("isDefending")]
+            if idle:
+                valuable = max(idle, key=lambda c: creature_power(c) * _health_fraction(c))
+                if _health_fraction(valuable) > 0.5:
+                    yield {"type": "defend", "creatureId": valuable["id"]}
+
+
+POLICIES = {policy.name: policy for policy in (RandomPolicy, GreedyPolicy, HeuristicPolicy)}
@@ -0,0 +1,173 @@
+"""
+Battle log events.
+
+PvPBattleState records what happened as compact BattleEvent tuples instead
+of English sentences:
+
+    (id, turn, code, player, actor, target, amount, flags)
+
+  * id      - 1-based, increasing within the battle
+  * turn    - the turn it happened in
+  * code    - one of the EVENT_* constants below
+  * player  - the player who acted (or, for EVENT_DEFEATED, who lost the
+              creature; for EVENT_TURN, whose turn starts)
+  * actor / target / amount - depend on the code:
+
+      EVENT_TURN      -                  -                  turn number
+      EVENT_DEPLOY    creature id        -                  energy cost
+      EVENT_ATTACK    attacker id        defender id        damage
+      EVENT_DEFEND    creature id        -                  -
+      EVENT_TOOL      tool id            target creature id -
+      EVENT_SPELL     caster id          spell id           -
+      EVENT_DEFEATED  creature id        -                  -
+
+  * flags   - attack details, see attack_flags(); 0 otherwise.
+
+Events are stored in the battle state's battleLog (and pvp_battle_log) as
+JSON arrays, so stats jobs can sum damage or count creatures without
+parsing text.  Nothing renders text on the way in: format_event() turns an
+event into the old sentence on demand, with the id -> name table that
+create_initial_battle_state puts in the state under "names"
+(battle_names() rebuilds one for older states).  The frontend has the same
+formatter in utils/battleEvents.js.
+
+Logs written before events are dicts with a ready "message"; as_event()
+and format_event() accept those too.
+"""
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+EVENT_TURN = 0
+EVENT_DEPLOY = 1
+EVENT_ATTACK = 2
+EVENT_DEFEND = 3
+EVENT_TOOL = 4
+EVENT_SPELL = 5
+EVENT_DEFEATED = 6
+EVENT_LEGACY = 7        # a pre-event dict entry, see as_event()
+
+# Attack flags: three bits, then small indexes into the tuples below
+ATTACK_MAGICAL = 1
+ATTACK_CRITICAL = 2
+ATTACK_DODGED = 4
+_EFFECTIVENESS_SHIFT = 4
+_DAMAGE_TYPE_SHIFT = 8
+_WOUNDS_SHIFT = 12
+
+EFFECTIVENESS = ("normal", "very effective", "effective", "slightly effective",
+                 "not very effective", "resisted")
+DAMAGE_TYPES = ("normal", "devastating", "powerful", "glancing", "reduced", "dodged")
+WOUNDS = (None, "wounded", "critically wounded")
+
+
+class BattleEvent(NamedTuple):
+    id: int
+    turn: int
+    code: int
+    player: Optional[int]
+    actor: Optional[str] = None
+    target: Optional[str] = None
+    amount: int = 0
+    flags: int = 0
+
+
+LogEntry = Union[BattleEvent, list, Dict]
+
+
+def attack_flags(attack_type: str, result: Dict, health: int, max_health: Optional[int]) -> int:
+    """Pack a process_attack result, and the defender's health after it, into flags"""
+    flags = ATTACK_MAGICAL if attack_type == "magical" else 0
+    if result["isCritical"]:
+        flags |= ATTACK_CRITICAL
+    if result["isDodged"]:
+        flags |= ATTACK_DODGED
+    flags |= EFFECTIVENESS.index(result["effectiveness"]) << _EFFECTIVENESS_SHIFT
+    flags |= DAMAGE_TYPES.index(result.get("damageType") or "normal") << _DAMAGE_TYPE_SHIFT
+    if max_health and 0 < health < max_health * 0.5:
+        flags |= (2 if health < max_health * 0.2 else 1) << _WOUNDS_SHIFT
+    return flags
+
+
+def as_event(entry: LogEntry) -> BattleEvent:
+    """
+    The event for a stored log entry.  A pre-event dict becomes EVENT_LEGACY
+    with its playerId, creatureId and damage, which is all stats ever read.
+    """
+    if isinstance(entry, dict):
+        return BattleEvent(entry['id'], entry.get('turn', 0), EVENT_LEGACY, entry.get('playerId'),
+                           entry.get('creatureId'), None, entry.get('damage') or 0)
+    return BattleEvent(*entry)
+
+
+def battle_names(state: Dict) -> Dict[str, str]:
+    """
+    id -> display name for every creature, tool and spell of the battle.
+    States from before the names table only know the cards still in play.
+    """
+    if state.get('names'):
+        return state['names']
+    names = {}
+    for side in ('player1', 'player2'):
+        player = state[side]
+        for zone in ('hand', 'field', 'deck'):
+            for creature in player.get(zone) or ():
+                names[creature['id']] = creature.get('species_name')
+        for zone in ('tools', 'spells'):
+            for item in player.get(zone) or ():
+                names[item['id']] = item.get('name')
+    return names
+
+
+def format_event(entry: LogEntry, names: Dict[str, str]) -> str:
+    """The log sentence for an event"""
+    if isinstance(entry, dict):
+        return entry.get('message', '')
+    event = BattleEvent(*entry)
+
+    def name(item_id):
+        return names.get(item_id) or str(item_id)
+
+    code = event.code
+    if code == EVENT_TURN:
+        return f"Turn {event.amount} - Player {event.player}'s turn"
+    if code == EVENT_DEPLOY:
+        return f"Player deployed {name(event.actor)} (-{event.amount} energy)"
+    if code == EVENT_DEFEND:
+        return f"{name(event.actor)} took a defensive stance"
+    if code == EVENT_TOOL:
+        return f"Used {name(event.actor)} on {name(event.target)}"
+    if code == EVENT_SPELL:
+        return f"{name(event.actor)} cast {name(event.target)}"
+    if code == EVENT_DEFEATED:
+        return f"{name(event.actor)} was defeated!"
+    if code == EVENT_ATTACK:
+        return _format_attack(event, name(event.actor), name(event.target))
+    return ""
+
+
+def _format_attack(event: BattleEvent, attacker: str, defender: str) -> str:
+    flags = event.flags
+    attack_type = "magical" if flags & ATTACK_MAGICAL else "physical"
+    if flags & ATTACK_DODGED:
+        return f"{attacker}'s {attack_type} attack was dodged by {defender}!"
+
+    message = f"{attacker} used {attack_type} attack on {defender}"
+    if flags & ATTACK_CRITICAL:
+        message += " (Critical Hit!)"
+    effectiveness = EFFECTIVENESS[flags >> _EFFECTIVENESS_SHIFT & 0xF]
+    if effectiveness != "normal":
+        message += f" - {effectiveness}!"
+    damage_type = DAMAGE_TYPES[flags >> _DAMAGE_TYPE_SHIFT & 0xF]
+    if damage_type != "normal":
+        message += f" [{damage_type}]"
+    message += f" dealing {event.amount} damage."
+    wounds = WOUNDS[flags >> _WOUNDS_SHIFT & 0x3]
+    if wounds:
+        message += f" {defender} is {wounds}!"
+    return message
+
+
+def format_log(log: Iterable[LogEntry], names: Dict[str, str]) -> Iterator[Dict]:
+    """Entries as {id, turn, message}, rendered one at a time"""
+    for entry in log:
+        event = as_event(entry)
+        yield {'id': event.id, 'turn': event.turn, 'message': format_event(entry, names)}
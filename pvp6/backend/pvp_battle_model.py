@@ -0,0 +1,303 @@
+"""
+Typed in-memory model of a PvP battle.
+
+The stored / API form of a battle is the nested dict built by
+pvp_battle_state.create_initial_battle_state.  PvPBattleState works on this model
+instead: players, creatures and item cards are __slots__ classes, and every
+zone (hand, field, deck, tools, spells) keeps an id -> position map, so a
+creature or item is found without scanning.
+
+BattleModel.from_dict / to_dict convert at the boundary.  Keys the model
+has no slot for (NFT metadata) are kept in `extra` and written back
+unchanged, and optional keys that were absent stay absent, so
+to_dict(from_dict(d)) == d.
+
+To keep thousands of battles resident, `extra` is stored as a Packed
+record: a key tuple shared by every card of the same shape plus a tuple of
+values, with repeated strings (names, URLs, rarities) interned.
+"""
+import sys
+from typing import Dict, Iterator, List, Optional
+
+
+class _Missing:
+    """Marks an optional key that is not present in the source dict"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()
+
+_INTERN_KEYS = frozenset((
+    "species_name", "rarity", "preferred_token", "key_image_url", "image_url",
+    "display_form", "display_combination", "name", "type",
+    "tool_type", "tool_effect", "spell_type", "spell_effect",
+))
+
+
+_SHAPES: Dict[tuple, tuple] = {}
+
+
+class Packed:
+    """
+    A read-only dict stored as a shared key tuple plus a value tuple.
+    Cards of the same kind have the same keys, so the key tuple (the
+    "shape") is stored once per process instead of once per card.
+    """
+    __slots__ = ("keys", "values")
+
+    def __init__(self, data: Dict):
+        keys = tuple(data)
+        self.keys = _SHAPES.setdefault(keys, keys)
+        self.values = tuple(_pack_value(key, value) for key, value in data.items())
+
+    def to_dict(self) -> Dict:
+        return {key: _unpack_value(value) for key, value in zip(self.keys, self.values)}
+
+    def get(self, key: str, default=None):
+        try:
+            return _unpack_value(self.values[self.keys.index(key)])
+        except ValueError:
+            return default
+
+
+def _pack_value(key: str, value):
+    if isinstance(value, str) and key in _INTERN_KEYS:
+        return sys.intern(value)
+    if isinstance(value, dict) and all(not isinstance(v, (dict, list)) for v in value.values()):
+        return Packed(value)
+    return value
+
+
+def _unpack_value(value):
+    return value.to_dict() if isinstance(value, Packed) else value
+
+
+def _pack_extra(data: Dict) -> Optional[Packed]:
+    """Pack the keys the model has no slot for; None if there are none"""
+    return Packed(data) if data else None
+
+
+class Zone:
+    """An ordered list of cards with an id -> position index"""
+    __slots__ = ("items", "index")
+
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.index = {}
+        self._reindex()
+
+    def _reindex(self):
+        index = {}
+        # reversed, so the first card with a given id wins (same as a scan)
+        for position in range(len(self.items) - 1, -1, -1):
+            index[self.items[position].id] = position
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def position(self, card_id) -> int:
+        """Position of `card_id`, or -1"""
+        try:
+            return self.index.get(card_id, -1)
+        except TypeError:          # unhashable id from a malformed action
+            return -1
+
+    def get(self, card_id):
+        position = self.position(card_id)
+        return self.items[position] if position >= 0 else None
+
+    def append(self, card):
+        self.items.append(card)
+        self.index.setdefault(card.id, len(self.items) - 1)
+
+    def pop_at(self, position: int):
+        card = self.items.pop(position)
+        self._reindex()
+        return card
+
+    def pop_first(self):
+        return self.pop_at(0)
+
+
+class BattleCreature:
+    """A creature card.  Battle fields are slots; NFT metadata lives in `extra`."""
+    __slots__ = ("id", "species_name", "form", "stats", "battle_stats",
+                 "current_health", "is_defending", "defense_bonus",
+                 "active_effects", "next_attack_bonus", "extra")
+
+    # (slot, dict key) for the optional keys; absent keys stay MISSING
+    _FIELDS = (
+        ("species_name", "species_name"),
+        ("form", "form"),
+        ("stats", "stats"),
+        ("battle_stats", "battleStats"),
+        ("current_health", "currentHealth"),
+        ("is_defending", "isDefending"),
+        ("defense_bonus", "defenseBonus"),
+        ("active_effects", "activeEffects"),
+        ("next_attack_bonus", "nextAttackBonus"),
+    )
+    _KEYS = frozenset(["id"] + [key for _, key in _FIELDS])
+    # Fields pvp_combat_rules may change, and NFT metadata it reads from `extra`
+    _COMBAT_FIELDS = ("battle_stats", "current_health", "is_defending",
+                      "active_effects", "next_attack_bonus")
+    _COMBAT_EXTRA = ("rarity", "combination_level", "specialty_stats", "permanentModifications")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BattleCreature":
+        creature = cls.__new__(cls)
+        creature.id = data["id"]
+        for slot, key in cls._FIELDS:
+            setattr(creature, slot, data.get(key, MISSING))
+        if isinstance(creature.species_name, str):
+            creature.species_name = sys.intern(creature.species_name)
+        creature.extra = _pack_extra({k: v for k, v in data.items() if k not in cls._KEYS})
+        return creature
+
+    def to_dict(self) -> Dict:
+        out = {"id": self.id}
+        if self.extra:
+            out.update(self.extra.to_dict())
+        for slot, key in self._FIELDS:
+            value = getattr(self, slot)
+            if value is not MISSING:
+                out[key] = value
+        return out
+
+    def combat_view(self) -> Dict:
+        """
+        The creature as the dict pvp_combat_rules works on.  Mutable values
+        are shared with the slots; write changes back with apply_combat_view.
+        """
+        view = {"id": self.id}
+        for slot, key in self._FIELDS:
+            value = getattr(self, slot)
+            if value is not MISSING:
+                view[key] = value
+        if self.extra:
+            for key in self._COMBAT_EXTRA:
+                value = self.extra.get(key, MISSING)
+                if value is not MISSING:
+                    view[key] = value
+        return view
+
+    def apply_combat_view(self, view: Dict):
+        fields = dict(self._FIELDS)
+        for slot in self._COMBAT_FIELDS:
+            setattr(self, slot, view.get(fields[slot], MISSING))
+
+    def require(self, slot: str):
+        """Slot value; KeyError with the dict key name if it was never set"""
+        value = getattr(self, slot)
+        if value is MISSING:
+            raise KeyError(dict(self._FIELDS)[slot])
+        return value
+
+
+class BattleItem:
+    """A tool or spell card (`kind` is "tool" or "spell")"""
+    __slots__ = ("id", "kind", "name", "item_type", "effect", "extra")
+
+    @classmethod
+    def from_dict(cls, data: Dict, kind: str) -> "BattleItem":
+        item = cls.__new__(cls)
+        item.id = data["id"]
+        item.kind = kind
+        item.name = data.get("name", MISSING)
+        item.item_type = data.get(f"{kind}_type", MISSING)
+        item.effect = data.get(f"{kind}_effect", MISSING)
+        known = ("id", "name", f"{kind}_type", f"{kind}_effect")
+        item.extra = _pack_extra({k: v for k, v in data.items() if k not in known})
+        return item
+
+    def to_dict(self) -> Dict:
+        out = {"id": self.id}
+        if self.name is not MISSING:
+            out["name"] = self.name
+        if self.extra:
+            out.update(self.extra.to_dict())
+        if self.item_type is not MISSING:
+            out[f"{self.kind}_type"] = self.item_type
+        if self.effect is not MISSING:
+            out[f"{self.kind}_effect"] = self.effect
+        return out
+
+
+class BattlePlayer:
+    __slots__ = ("id", "name", "energy", "hand", "field", "deck", "tools", "spells", "extra")
+
+    _ZONES = ("hand", "field", "deck")
+    _KEYS = frozenset(("id", "name", "energy", "hand", "field", "deck", "tools", "spells"))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BattlePlayer":
+        player = cls.__new__(cls)
+        player.id = data["id"]
+        player.name = data.get("name", MISSING)
+        player.energy = data["energy"]
+        for zone in cls._ZONES:
+            setattr(player, zone, Zone(BattleCreature.from_dict(c) for c in data.get(zone) or ()))
+        player.tools = Zone(BattleItem.from_dict(t, "tool") for t in data.get("tools") or ())
+        player.spells = Zone(BattleItem.from_dict(s, "spell") for s in data.get("spells") or ())
+        player.extra = {k: v for k, v in data.items() if k not in cls._KEYS} or None
+        return player
+
+    def to_dict(self) -> Dict:
+        out = {"id": self.id}
+        if self.name is not MISSING:
+            out["name"] = self.name
+        for zone in self._ZONES:
+            out[zone] = [creature.to_dict() for creature in getattr(self, zone)]
+        out["energy"] = self.energy
+        out["tools"] = [tool.to_dict() for tool in self.tools]
+        out["spells"] = [spell.to_dict() for spell in self.spells]
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+
+class BattleModel:
+    """A whole battle: both players, turn bookkeeping and the battle log"""
+    __slots__ = ("turn", "active_player", "player1", "player2", "battle_log", "extra")
+
+    _KEYS = frozenset(("turn", "activePlayer", "player1", "player2", "battleLog"))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BattleModel":
+        model = cls.__new__(cls)
+        model.turn = data["turn"]
+        model.active_player = data["activePlayer"]
+        model.player1 = BattlePlayer.from_dict(data["player1"])
+        model.player2 = BattlePlayer.from_dict(data["player2"])
+        model.battle_log = list(data["battleLog"]) if "battleLog" in data else None
+        model.extra = {k: v for k, v in data.items() if k not in cls._KEYS} or None
+        return model
+
+    def to_dict(self) -> Dict:
+        out = {
+            "turn": self.turn,
+            "activePlayer": self.active_player,
+            "player1": self.player1.to_dict(),
+            "player2": self.player2.to_dict(),
+        }
+        if self.battle_log is not None:
+            out["battleLog"] = self.battle_log
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def players(self) -> List[BattlePlayer]:
+        return [self.player1, self.player2]
@@ -1,42 +1,77 @@
 import json
+import random
 import traceback
+from collections import deque
 from typing import Dict, List, Tuple, Optional
 
+from battle_codec import encode_battle_state, decode_battle_state
+from pvp_battle_events import (EVENT_ATTACK, EVENT_DEFEATED, EVENT_DEFEND, EVENT_DEPLOY,
+                               EVENT_SPELL, EVENT_TOOL, EVENT_TURN, BattleEvent, as_event,
+                               attack_flags, battle_names)
+from pvp_battle_model import (MISSING, BattleCreature, BattleModel,
+                              BattlePlayer, Zone)
+from pvp_combat_rules import (apply_ongoing_effects, apply_spell, apply_tool,
+                              battle_ready, defend_creature, ensure_battle_stats, process_attack,
+                              remove_defeated)
+
+ATTACK_TYPES = ('auto', 'physical', 'magical')
+
+# Log entries kept in the live state; pvp_routes archives every entry to
+# pvp_battle_log, so the state (and each response) stays the same size
+LIVE_LOG_ENTRIES = 30
+
+
 class PvPBattleState:
     """Handles PvP battle state management and action processing"""
     
-    def __init__(self, battle_state: Dict):
-        self.state = battle_state
-        self.player1 = battle_state['player1']
-        self.player2 = battle_state['player2']
-        self.turn = battle_state['turn']
-        self.active_player_id = battle_state['activePlayer']
-        self.battle_log = battle_state.get('battleLog', [])
+    def __init__(self, battle_state: Dict, rng=None):
+        # Work on the typed model; the dict form is only used at the API boundary
+        self.model = BattleModel.from_dict(battle_state)
+        # Anything with random(); pvp_combat_rules draws rolls in client order
+        self.rng = rng or random
+        self.player1 = self.model.player1
+        self.player2 = self.model.player2
+        self.turn = self.model.turn
+        self.active_player_id = self.model.active_player
+        stored_log = self.model.battle_log or []
+        self.battle_log = deque(stored_log, maxlen=LIVE_LOG_ENTRIES)
+        self._next_log_id = as_event(stored_log[-1]).id + 1 if stored_log else 1
+        # Entries added since loading, to be archived; a state from before
+        # the cap hands over its whole log once
+        self.new_log_entries = list(stored_log) if len(stored_log) > LIVE_LOG_ENTRIES else []
+        # (player id, legal_actions()) until the next action changes the state
+        self._legal_actions: Optional[Tuple[int, Dict]] = None
         
     def get_state(self) -> Dict:
         """Get current battle state"""
-        return self.state
-        
-    def get_player_state(self, player_id: int) -> Dict:
+        # Events as the plain lists they decode to, so a stored state round-trips
+        self.model.battle_log = [list(e) if isinstance(e, tuple) else e for e in self.battle_log]
+        state = self.model.to_dict()
+        # Derived, and added to responses only; states stored with it drop it here
+        state.pop('legalActions', None)
+        return state
+        
+    def get_player_state(self, player_id: int) -> BattlePlayer:
         """Get state for specific player"""
-        if self.player1['id'] == player_id:
+        if self.player1.id == player_id:
             return self.player1
-        elif self.player2['id'] == player_id:
+        elif self.player2.id == player_id:
             return self.player2
         else:
             raise ValueError(f"Player {player_id} not in battle")
             
-    def get_opponent_state(self, player_id: int) -> Dict:
+    def get_opponent_state(self, player_id: int) -> BattlePlayer:
         """Get opponent state for a player"""
-        if self.player1['id'] == player_id:
+        if self.player1.id == player_id:
             return self.player2
-        elif self.player2['id'] == player_id:
+        elif self.player2.id == player_id:
             return self.player1
         else:
             raise ValueError(f"Player {player_id} not in battle")
             
     def process_action(self, player_id: int, action: Dict) -> Dict:
         """Process a player action and update state"""
+        self._legal_actions = None
         try:
             # Verify it's player's turn
             if self.active_player_id != player_id:
@@ -67,44 +102,87 @@ class PvPBattleState:
             traceback.print_exc()
             return {"success": False, "error": str(e)}
             
-    def _process_deploy(self, player_state: Dict, action: Dict) -> Dict:
+    def legal_actions(self, player_id: int) -> Dict:
+        """
+        What process_action would accept from the player right now, grouped
+        by action type (any attackType goes with an attack):
+
+            {"deploy": [creature ids],
+             "attack": {"attackerIds": [...], "targetIds": [...]},
+             "defend": [creature ids],
+             "useTool": {"toolIds": [...], "targetIds": [...]},
+             "useSpell": {"spellIds": [...], "casterIds": [...], "targetIds": [...]},
+             "endTurn": True}
+
+        Every listed id combines with every other id of its group; a spell's
+        target is optional.  Types the player can't take are left out, so
+        it's {} off turn or once the battle is over.  Kept until the next
+        process_action.
+        """
+        if self._legal_actions and self._legal_actions[0] == player_id:
+            return self._legal_actions[1]
+        
+        legal = {}
+        if self.active_player_id == player_id and not self.check_battle_end()[0]:
+            player_state = self.get_player_state(player_id)
+            opponent_state = self.get_opponent_state(player_id)
+            own = [c.id for c in player_state.field]
+            opposing = [c.id for c in opponent_state.field]
+            energy = player_state.energy
+            
+            if len(own) < 4:
+                deployable = [c.id for c in player_state.hand
+                              if self._calculate_energy_cost(c) <= energy]
+                if deployable:
+                    legal['deploy'] = deployable
+            if own and opposing and energy >= 2:
+                legal['attack'] = {"attackerIds": own, "targetIds": opposing}
+            if own and energy >= 1:
+                legal['defend'] = own
+            if player_state.tools and (own or opposing):
+                legal['useTool'] = {"toolIds": [t.id for t in player_state.tools],
+                                    "targetIds": own + opposing}
+            if player_state.spells and own and energy >= 4:
+                legal['useSpell'] = {"spellIds": [s.id for s in player_state.spells],
+                                     "casterIds": own, "targetIds": own + opposing}
+            legal['endTurn'] = True
+        
+        self._legal_actions = (player_id, legal)
+        return legal
+        
+    def _process_deploy(self, player_state: BattlePlayer, action: Dict) -> Dict:
         """Process creature deployment"""
         creature_id = action.get('creatureId')
         if not creature_id:
             return {"success": False, "error": "No creature ID provided"}
             
         # Find creature in hand
-        creature = None
-        hand_index = -1
-        for i, c in enumerate(player_state['hand']):
-            if c['id'] == creature_id:
-                creature = c
-                hand_index = i
-                break
-                
-        if not creature:
+        hand_index = player_state.hand.position(creature_id)
+        if hand_index < 0:
             return {"success": False, "error": "Creature not in hand"}
+        creature = player_state.hand.items[hand_index]
             
         # Check energy cost
         energy_cost = self._calculate_energy_cost(creature)
-        if player_state['energy'] < energy_cost:
+        if player_state.energy < energy_cost:
             return {"success": False, "error": f"Not enough energy. Need {energy_cost}"}
             
         # Check field limit
-        if len(player_state['field']) >= 4:
+        if len(player_state.field) >= 4:
             return {"success": False, "error": "Field is full"}
             
         # Deploy creature
-        player_state['hand'].pop(hand_index)
-        player_state['field'].append(creature)
-        player_state['energy'] -= energy_cost
+        player_state.hand.pop_at(hand_index)
+        self._combatant(creature)
+        player_state.field.append(creature)
+        player_state.energy -= energy_cost
         
         # Add to battle log
-        self._add_log(f"Player deployed {creature['species_name']} (-{energy_cost} energy)")
+        self._add_log(EVENT_DEPLOY, player_state.id, creature.id, amount=energy_cost)
         
         return {"success": True, "energyCost": energy_cost}
         
-    def _process_attack(self, player_state: Dict, opponent_state: Dict, action: Dict) -> Dict:
+    def _process_attack(self, player_state: BattlePlayer, opponent_state: BattlePlayer, action: Dict) -> Dict:
         """Process attack action"""
         attacker_id = action.get('attackerId')
         target_id = action.get('targetId')
@@ -113,77 +191,79 @@ class PvPBattleState:
             return {"success": False, "error": "Missing attacker or target"}
             
         # Find attacker
-        attacker = None
-        for c in player_state['field']:
-            if c['id'] == attacker_id:
-                attacker = c
-                break
-                
+        attacker = player_state.field.get(attacker_id)
         if not attacker:
             return {"success": False, "error": "Attacker not on field"}
             
         # Find target
-        target = None
-        target_index = -1
-        for i, c in enumerate(opponent_state['field']):
-            if c['id'] == target_id:
-                target = c
-                target_index = i
-                break
-                
-        if not target:
+        target_index = opponent_state.field.position(target_id)
+        if target_index < 0:
             return {"success": False, "error": "Target not on field"}
+        target = opponent_state.field.items[target_index]
+            
+        attack_type = action.get('attackType', 'auto')
+        if attack_type not in ATTACK_TYPES:
+            return {"success": False, "error": f"Unknown attack type: {attack_type}"}
             
         # Check energy
-        if player_state['energy'] < 2:
+        if player_state.energy < 2:
             return {"success": False, "error": "Not enough energy to attack"}
             
-        # Calculate damage
-        damage = self._calculate_damage(attacker, target)
-        
-        # Apply damage
-        target['currentHealth'] -= damage
-        player_state['energy'] -= 2
+        # Resolve the attack with the client's rules
+        attacker_view = self._combatant(attacker)
+        target_view = self._combatant(target)
+        result = process_attack(attacker_view, target_view, attack_type,
+                                rng=self.rng, turn=self.turn)
+        attacker.apply_combat_view(attacker_view)
+        target.apply_combat_view(target_view)
+        player_state.energy -= 2
+        
+        self._add_log(EVENT_ATTACK, player_state.id, attacker.id, target.id, result['damage'],
+                      attack_flags(result['attackType'], result, target.current_health,
+                                   target_view['battleStats'].get('maxHealth')))
         
         # Check if target defeated
-        if target['currentHealth'] <= 0:
-            opponent_state['field'].pop(target_index)
-            self._add_log(f"{attacker['species_name']} defeated {target['species_name']}!")
-        else:
-            self._add_log(f"{attacker['species_name']} dealt {damage} damage to {target['species_name']}")
+        target_defeated = target.current_health <= 0
+        if target_defeated:
+            self._log_defeated(opponent_state, self._remove_defeated(opponent_state, player_state))
             
-        return {"success": True, "damage": damage, "targetDefeated": target['currentHealth'] <= 0}
-        
-    def _process_defend(self, player_state: Dict, action: Dict) -> Dict:
+        return {
+            "success": True,
+            "damage": result['damage'],
+            "targetDefeated": target_defeated,
+            "attackType": result['attackType'],
+            "isCritical": result['isCritical'],
+            "isDodged": result['isDodged'],
+            "effectiveness": result['effectiveness'],
+            "damageType": result['damageType']
+        }
+        
+    def _process_defend(self, player_state: BattlePlayer, action: Dict) -> Dict:
         """Process defend action"""
         creature_id = action.get('creatureId')
         if not creature_id:
             return {"success": False, "error": "No creature ID provided"}
             
         # Find creature
-        creature = None
-        for c in player_state['field']:
-            if c['id'] == creature_id:
-                creature = c
-                break
-                
+        creature = player_state.field.get(creature_id)
         if not creature:
             return {"success": False, "error": "Creature not on field"}
             
         # Check energy
-        if player_state['energy'] < 1:
+        if player_state.energy < 1:
             return {"success": False, "error": "Not enough energy to defend"}
             
-        # Apply defend status
-        creature['isDefending'] = True
-        creature['defenseBonus'] = 0.5  # 50% damage reduction
-        player_state['energy'] -= 1
+        # Defensive stance: raised defenses until the creature's next upkeep
+        view = self._combatant(creature)
+        defend_creature(view, self.turn)
+        creature.apply_combat_view(view)
+        player_state.energy -= 1
         
-        self._add_log(f"{creature['species_name']} took a defensive stance")
+        self._add_log(EVENT_DEFEND, player_state.id, creature.id)
         
         return {"success": True}
         
-    def _process_tool(self, player_state: Dict, opponent_state: Dict, action: Dict) -> Dict:
+    def _process_tool(self, player_state: BattlePlayer, opponent_state: BattlePlayer, action: Dict) -> Dict:
         """Process tool usage"""
         tool_id = action.get('toolId')
         target_id = action.get('targetId')
@@ -192,47 +272,29 @@ class PvPBattleState:
             return {"success": False, "error": "Missing tool or target"}
             
         # Find tool
-        tool = None
-        tool_index = -1
-        for i, t in enumerate(player_state['tools']):
-            if t['id'] == tool_id:
-                tool = t
-                tool_index = i
-                break
-                
-        if not tool:
+        tool_index = player_state.tools.position(tool_id)
+        if tool_index < 0:
             return {"success": False, "error": "Tool not available"}
+        tool = player_state.tools.items[tool_index]
             
         # Find target (can be on either field)
-        target = None
-        is_friendly = False
-        
-        for c in player_state['field']:
-            if c['id'] == target_id:
-                target = c
-                is_friendly = True
-                break
-                
-        if not target:
-            for c in opponent_state['field']:
-                if c['id'] == target_id:
-                    target = c
-                    break
-                    
+        target = player_state.field.get(target_id) or opponent_state.field.get(target_id)
         if not target:
             return {"success": False, "error": "Target not found"}
             
         # Apply tool effect
-        effect = self._apply_tool_effect(tool, target)
+        view = self._combatant(target)
+        effect = apply_tool(view, tool.to_dict(), self.turn)
+        target.apply_combat_view(view)
         
         # Remove tool
-        player_state['tools'].pop(tool_index)
+        player_state.tools.pop_at(tool_index)
         
-        self._add_log(f"Used {tool['name']} on {target['species_name']}")
+        self._add_log(EVENT_TOOL, player_state.id, tool.id, target.id)
         
         return {"success": True, "effect": effect}
         
-    def _process_spell(self, player_state: Dict, opponent_state: Dict, action: Dict) -> Dict:
+    def _process_spell(self, player_state: BattlePlayer, opponent_state: BattlePlayer, action: Dict) -> Dict:
         """Process spell usage"""
         spell_id = action.get('spellId')
         caster_id = action.get('casterId')
@@ -242,78 +304,77 @@ class PvPBattleState:
             return {"success": False, "error": "Missing spell or caster"}
             
         # Check energy
-        if player_state['energy'] < 4:
+        if player_state.energy < 4:
             return {"success": False, "error": "Not enough energy for spell"}
             
         # Find spell
-        spell = None
-        spell_index = -1
-        for i, s in enumerate(player_state['spells']):
-            if s['id'] == spell_id:
-                spell = s
-                spell_index = i
-                break
-                
-        if not spell:
+        spell_index = player_state.spells.position(spell_id)
+        if spell_index < 0:
             return {"success": False, "error": "Spell not available"}
+        spell = player_state.spells.items[spell_index]
             
         # Find caster
-        caster = None
-        for c in player_state['field']:
-            if c['id'] == caster_id:
-                caster = c
-                break
-                
+        caster = player_state.field.get(caster_id)
         if not caster:
             return {"success": False, "error": "Caster not on field"}
             
+        # Find target (either field); without one the caster targets itself
+        target = caster
+        if target_id:
+            target = player_state.field.get(target_id) or opponent_state.field.get(target_id)
+            if not target:
+                return {"success": False, "error": "Target not found"}
+            
         # Apply spell effect
-        effect = self._apply_spell_effect(spell, caster, target_id, player_state, opponent_state)
+        caster_view = self._combatant(caster)
+        target_view = caster_view if target is caster else self._combatant(target)
+        effect = apply_spell(caster_view, target_view, spell.to_dict(), self.turn, self.rng)
+        caster.apply_combat_view(caster_view)
+        target.apply_combat_view(target_view)
         
         # Remove spell and deduct energy
-        player_state['spells'].pop(spell_index)
-        player_state['energy'] -= 4
+        player_state.spells.pop_at(spell_index)
+        player_state.energy -= 4
+        defeated_opponents = self._remove_defeated(opponent_state, player_state)
+        defeated_own = self._remove_defeated(player_state, opponent_state)
         
-        self._add_log(f"{caster['species_name']} cast {spell['name']}")
+        self._add_log(EVENT_SPELL, player_state.id, caster.id, spell.id)
+        self._log_defeated(opponent_state, defeated_opponents)
+        self._log_defeated(player_state, defeated_own)
         
         return {"success": True, "effect": effect}
         
     def _process_end_turn(self, player_id: int) -> Dict:
         """Process end turn"""
-        # Apply end of turn effects
         player_state = self.get_player_state(player_id)
         opponent_state = self.get_opponent_state(player_id)
         
-        # Reset defend status
-        for creature in player_state['field']:
-            if creature.get('isDefending'):
-                creature['isDefending'] = False
-                creature.pop('defenseBonus', None)
-                
-        # Process ongoing effects
-        self._process_ongoing_effects(player_state)
-        self._process_ongoing_effects(opponent_state)
-        
         # Switch active player
-        self.active_player_id = self.player2['id'] if self.active_player_id == self.player1['id'] else self.player1['id']
+        self.active_player_id = self.player2.id if self.active_player_id == self.player1.id else self.player1.id
         
         # Increment turn if switching back to player 1
-        if self.active_player_id == self.player1['id']:
+        if self.active_player_id == self.player1.id:
             self.turn += 1
             
+        # Upkeep for the player whose turn starts: each side's effects tick
+        # once per round, and a defensive stance lasts through the
+        # opponent's turn
+        self._process_ongoing_effects(opponent_state)
+        self._log_defeated(opponent_state, self._remove_defeated(opponent_state, player_state))
+            
         # Regenerate energy
-        player_state['energy'] = min(25, player_state['energy'] + 3)
-        opponent_state['energy'] = min(25, opponent_state['energy'] + 3)
+        player_state.energy = min(25, player_state.energy + 3)
+        opponent_state.energy = min(25, opponent_state.energy + 3)
         
         # Draw cards
-        if len(player_state['deck']) > 0 and len(player_state['hand']) < 5:
-            player_state['hand'].append(player_state['deck'].pop(0))
+        if len(player_state.deck) > 0 and len(player_state.hand) < 5:
+            player_state.hand.append(player_state.deck.pop_first())
             
-        self._add_log(f"Turn {self.turn} - Player {self.active_player_id}'s turn")
+        self._add_log(EVENT_TURN, self.active_player_id, amount=self.turn)
         
         # Update state
-        self.state['turn'] = self.turn
-        self.state['activePlayer'] = self.active_player_id
+        self.model.turn = self.turn
+        self.model.active_player = self.active_player_id
         
         return {"success": True, "newTurn": self.turn, "activePlayer": self.active_player_id}
         
@@ -321,142 +382,126 @@ class PvPBattleState:
         """Check if battle has ended and return (is_ended, winner_id)"""
         # Check if either player has no creatures left
         player1_defeated = (
-            len(self.player1['field']) == 0 and 
-            len(self.player1['hand']) == 0 and 
-            len(self.player1['deck']) == 0
+            len(self.player1.field) == 0 and 
+            len(self.player1.hand) == 0 and 
+            len(self.player1.deck) == 0
         )
         
         player2_defeated = (
-            len(self.player2['field']) == 0 and 
-            len(self.player2['hand']) == 0 and 
-            len(self.player2['deck']) == 0
+            len(self.player2.field) == 0 and 
+            len(self.player2.hand) == 0 and 
+            len(self.player2.deck) == 0
         )
         
         if player1_defeated and player2_defeated:
             # Draw - both defeated
             return True, None
         elif player1_defeated:
-            return True, self.player2['id']
+            return True, self.player2.id
         elif player2_defeated:
-            return True, self.player1['id']
+            return True, self.player1.id
         else:
             return False, None
             
-    def _calculate_energy_cost(self, creature: Dict) -> int:
+    def _calculate_energy_cost(self, creature: BattleCreature) -> int:
         """Calculate energy cost for creature deployment"""
-        form = creature.get('form', 0)
+        form = creature.form if creature.form is not MISSING else 0
         return 5 + int(form)  # Form 0=5, Form 1=6, Form 2=7, Form 3=8
         
-    def _calculate_damage(self, attacker: Dict, defender: Dict) -> int:
-        """Calculate attack damage"""
-        # Simplified damage calculation
-        attack_stat = max(
-            attacker.get('battleStats', {}).get('physicalAttack', 10),
-            attacker.get('battleStats', {}).get('magicalAttack', 10)
-        )
-        
-        defense_stat = max(
-            defender.get('battleStats', {}).get('physicalDefense', 5),
-            defender.get('battleStats', {}).get('magicalDefense', 5)
-        )
-        
-        # Base damage
-        damage = max(1, attack_stat - defense_stat // 2)
-        
-        # Apply defense bonus if defending
-        if defender.get('isDefending'):
-            damage = int(damage * (1 - defender.get('defenseBonus', 0)))
-            
-        return max(1, damage)
-        
-    def _apply_tool_effect(self, tool: Dict, target: Dict) -> Dict:
-        """Apply tool effect to target"""
-        effect = {}
-        tool_type = tool.get('tool_type', '')
-        tool_effect = tool.get('tool_effect', '')
-        
-        if tool_effect == 'Shield':
-            target['battleStats']['physicalDefense'] += 10
-            target['battleStats']['magicalDefense'] += 10
-            effect['defenseBoost'] = 10
-        elif tool_effect == 'Surge':
-            target['battleStats']['physicalAttack'] += 15
-            target['battleStats']['magicalAttack'] += 15
-            effect['attackBoost'] = 15
-        elif tool_type == 'stamina':
-            heal_amount = min(30, target['battleStats']['maxHealth'] - target['currentHealth'])
-            target['currentHealth'] += heal_amount
-            effect['healing'] = heal_amount
-            
-        return effect
-        
-    def _apply_spell_effect(self, spell: Dict, caster: Dict, target_id: Optional[str], 
-                          player_state: Dict, opponent_state: Dict) -> Dict:
-        """Apply spell effect"""
-        effect = {}
-        spell_type = spell.get('spell_type', '')
-        spell_effect = spell.get('spell_effect', '')
-        
-        # Find target if specified
-        target = None
-        if target_id:
-            for c in player_state['field'] + opponent_state['field']:
-                if c['id'] == target_id:
-                    target = c
-                    break
-                    
-        if spell_effect == 'Surge' and target:
-            # Damage spell
-            magic_power = caster.get('stats', {}).get('magic', 5)
-            damage = 20 + magic_power * 2
-            target['currentHealth'] -= damage
-            effect['damage'] = damage
-        elif spell_type == 'energy':
-            # AOE effect
-            damage = 15
-            for c in opponent_state['field']:
-                c['currentHealth'] -= damage
-            effect['aoeDamage'] = damage
-            
-        return effect
-        
-    def _process_ongoing_effects(self, player_state: Dict):
+    def _combatant(self, creature: BattleCreature) -> Dict:
+        """Combat rules view of a creature, with battle stats filled in if missing"""
+        view = creature.combat_view()
+        ensure_battle_stats(view)
+        creature.apply_combat_view(view)
+        return view
+        
+    def _remove_defeated(self, owner: BattlePlayer, opponent: BattlePlayer) -> List[str]:
+        """
+        Take defeated creatures off the owner's field and apply death
+        effects.  Returns the ids of the defeated creatures.
+        """
+        if all(c.current_health is MISSING or c.current_health > 0 for c in owner.field):
+            return []
+        creatures = list(owner.field)
+        views = [self._combatant(c) for c in creatures]
+        opposing = [(c, self._combatant(c)) for c in opponent.field]
+        survivors, defeated = remove_defeated(views, [view for _, view in opposing], self.turn)
+        
+        for creature, view in zip(creatures, views):
+            creature.apply_combat_view(view)
+        for creature, view in opposing:
+            creature.apply_combat_view(view)
+        surviving = {id(view) for view in survivors}
+        owner.field = Zone(c for c, view in zip(creatures, views) if id(view) in surviving)
+        return [view.get('id') for view in defeated]
+            
+    def _process_ongoing_effects(self, player_state: BattlePlayer):
         """Process ongoing effects for a player"""
-        for creature in player_state['field']:
-            # Process active effects
-            if 'activeEffects' in creature:
-                remaining_effects = []
-                for effect in creature['activeEffects']:
-                    effect['duration'] -= 1
-                    if effect['duration'] > 0:
-                        remaining_effects.append(effect)
-                creature['activeEffects'] = remaining_effects
+        for creature in player_state.field:
+            view = self._combatant(creature)
+            apply_ongoing_effects(view, self.turn)
+            creature.apply_combat_view(view)
+            # Left over from the flat 50% defend reduction
+            creature.defense_bonus = MISSING
                 
-    def _add_log(self, message: str):
-        """Add message to battle log"""
-        self.battle_log.append({
-            'id': len(self.battle_log) + 1,
-            'turn': self.turn,
-            'message': message
-        })
-        self.state['battleLog'] = self.battle_log
+    def _log_defeated(self, owner: BattlePlayer, creature_ids: List[str]):
+        for creature_id in creature_ids:
+            self._add_log(EVENT_DEFEATED, owner.id, creature_id)
+                
+    def _add_log(self, code: int, player_id: Optional[int], actor=None, target=None,
+                 amount: int = 0, flags: int = 0):
+        """Add an event to the battle log (see pvp_battle_events.py)"""
+        entry = BattleEvent(self._next_log_id, self.turn, code, player_id, actor, target, amount, flags)
+        self._next_log_id += 1
+        self.battle_log.append(entry)
+        self.new_log_entries.append(entry)
+
+def create_initial_battle_state(player1_data, player2_data):
+    """Create initial battle state from player data"""
+    # Initialize battle state structure
+    battle_state = {
+        "turn": 1,
+        "activePlayer": player1_data['user_id'],
+        "player1": {
+            "id": player1_data['user_id'],
+            "name": player1_data.get('name', f"Player {player1_data['user_id']}"),
+            "hand": [],
+            "field": [],
+            # Battle stats are computed here, not taken from the client
+            "deck": [battle_ready(c) for c in player1_data['selected_creatures']],
+            "energy": 10,
+            "tools": player1_data.get('selected_tools', []),
+            "spells": player1_data.get('selected_spells', [])
+        },
+        "player2": {
+            "id": player2_data['user_id'],
+            "name": player2_data.get('name', f"Player {player2_data['user_id']}"),
+            "hand": [],
+            "field": [],
+            "deck": [battle_ready(c) for c in player2_data['selected_creatures']],
+            "energy": 10,
+            "tools": player2_data.get('selected_tools', []),
+            "spells": player2_data.get('selected_spells', [])
+        },
+        "battleLog": []
+    }
+    
+    # Draw initial hands (3 cards each)
+    for _ in range(3):
+        if battle_state["player1"]["deck"]:
+            battle_state["player1"]["hand"].append(battle_state["player1"]["deck"].pop(0))
+        if battle_state["player2"]["deck"]:
+            battle_state["player2"]["hand"].append(battle_state["player2"]["deck"].pop(0))
+    
+    # Names for rendering log events; cards leave the state when used or defeated
+    battle_state["names"] = battle_names(battle_state)
+    
+    return battle_state
 
 def compress_battle_state(state):
-    """Compress battle state for storage"""
-    import gzip
-    import base64
-    json_str = json.dumps(state)
-    compressed = gzip.compress(json_str.encode('utf-8'))
-    return base64.b64encode(compressed).decode('utf-8')
+    """Encode battle state for storage (versioned binary, see battle_codec.py)"""
+    return encode_battle_state(state)
 
 def decompress_battle_state(compressed_state):
-    """Decompress battle state from storage"""
-    import gzip
-    import base64
-    try:
-        compressed = base64.b64decode(compressed_state.encode('utf-8'))
-        json_str = gzip.decompress(compressed).decode('utf-8')
-        return json.loads(json_str)
-    except:
-        # Fallback for uncompressed states
-        return json.loads(compressed_state)
+    """Decode a stored battle state in any format it was ever written in"""
+    return decode_battle_state(compressed_state)
@@ -0,0 +1,197 @@
+"""
+Read-only battle views, encoded once per state version.
+
+Every poll of a battle used to read the row, decode the state and encode
+the JSON again, so each spectator added a full read per poll interval.
+BattleViewCache keeps, per battle, the encoded body of each view built
+for its current state_version: one per player (the perspective is the
+user id) and one for spectators.  Polls are answered from those bytes,
+and a view is built (one read, one decode, one encode) at most once per
+version however many clients poll it.  Each body has an ETag, so a poll
+with a matching If-None-Match gets a 304 without touching the database
+(view_response()).
+
+The battle state writers in pvp_routes.py call invalidate() with the
+version they wrote, once it is committed, which drops the old bodies.
+A body built from an older version than the cache has seen is not
+stored, so a reader racing a writer can't put a stale view back.  Battles are kept least recently
+used first, at most BATTLE_VIEW_CACHE_BATTLES of them.
+
+Views hide what their viewer may not see (perspective_state()): a player
+sees the opponent's hand, deck, tools and spells only as counts, and a
+spectator sees both players that way.
+"""
+import hashlib
+import json
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Response, request
+
+from config import BATTLE_VIEW_CACHE_BATTLES
+from pvp_battle_events import as_event, battle_names
+
+# Cards a player holds but hasn't played
+HIDDEN_ZONES = ('hand', 'deck', 'tools', 'spells')
+
+SPECTATOR = 'spectator'
+
+
+def redact_player(player: Dict) -> Dict:
+    """A player's state with the hidden zones replaced by their sizes"""
+    redacted = {k: v for k, v in player.items() if k not in HIDDEN_ZONES}
+    for zone in HIDDEN_ZONES:
+        redacted[f'{zone}Count'] = len(player.get(zone) or ())
+    return redacted
+
+
+def visible_names(state: Dict, side: Optional[str] = None) -> Dict[str, str]:
+    """
+    The names table cut down to the cards on the field or in the log, and
+    the cards of `side` ('player1' or 'player2') if given
+    """
+    names = battle_names(state)
+    shown = {c['id'] for s in ('player1', 'player2') for c in state[s].get('field') or ()}
+    for entry in state.get('battleLog') or ():
+        event = as_event(entry)
+        shown.update((event.actor, event.target))
+    if side:
+        shown.update(item['id'] for zone in HIDDEN_ZONES for item in state[side].get(zone) or ())
+    return {item_id: name for item_id, name in names.items() if item_id in shown}
+
+
+def perspective_state(state: Dict, side: Optional[str] = None,
+                      legal_actions: Optional[Dict] = None) -> Dict:
+    """
+    The battle state as `side` ('player1' or 'player2') sees it: the other
+    player redacted, and the side's `legal_actions`
+    (PvPBattleState.legal_actions) as legalActions while it's the side's
+    turn.  Without a side, as a spectator sees it: both players redacted.
+    """
+    # States stored before legal actions were left out of them may carry some
+    redacted = {k: v for k, v in state.items() if k != 'legalActions'}
+    for other in ('player1', 'player2'):
+        if other != side:
+            redacted[other] = redact_player(state[other])
+    if side and state[side]['id'] == state['activePlayer'] and legal_actions is not None:
+        redacted['legalActions'] = legal_actions
+    redacted['names'] = visible_names(state, side)
+    return redacted
+
+
+class BattleView:
+    """An encoded view: the JSON body, its ETag, and facts the route reads without decoding"""
+    __slots__ = ("body", "etag", "meta")
+
+    def __init__(self, body: bytes, meta: Optional[Dict]):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.meta = meta or {}
+
+
+def view_response(view: BattleView) -> Response:
+    """200 with the view, or 304 if the client's If-None-Match has it"""
+    if request.if_none_match.contains(view.etag):
+        response = Response(status=304)
+    else:
+        response = Response(view.body, mimetype='application/json')
+    response.set_etag(view.etag)
+    # Per user, and always revalidated: the body changes with every action
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class _Entry:
+    __slots__ = ("version", "views")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.views: Dict[Hashable, BattleView] = {}
+
+
+class BattleViewCache:
+    """Encoded battle views by (battle, perspective), for the latest state version"""
+
+    def __init__(self, max_battles: int):
+        self.max_battles = max_battles
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()    # least recently used first
+        self._lock = threading.Lock()
+        self._build_locks = weakref.WeakValueDictionary()            # battle_id -> Lock
+        self._counts = {'hits': 0, 'builds': 0, 'stale_builds': 0, 'invalidated': 0, 'evicted': 0}
+
+    def get(self, battle_id: int, perspective: Hashable) -> Optional[BattleView]:
+        with self._lock:
+            entry = self._entries.get(battle_id)
+            view = entry.views.get(perspective) if entry else None
+            if view is not None:
+                self._entries.move_to_end(battle_id)
+                self._counts['hits'] += 1
+            return view
+
+    def view(self, battle_id: int, perspective: Hashable,
+             build: Callable[[], Optional[Tuple[int, Dict, Optional[Dict]]]]) -> Optional[BattleView]:
+        """
+        The cached view, or build() -> (state_version, payload, meta)
+        encoded and stored.  Concurrent misses on one battle wait for a
+        single build.  None if build() returns None (nothing to show).
+        """
+        view = self.get(battle_id, perspective)
+        if view is not None:
+            return view
+        with self._build_lock(battle_id):
+            view = self.get(battle_id, perspective)
+            if view is not None:
+                return view
+            built = build()
+            if built is None:
+                return None
+            version, payload, meta = built
+            view = BattleView(json.dumps(payload, separators=(',', ':')).encode(), meta)
+            self._put(battle_id, version, perspective, view)
+            return view
+
+    def invalidate(self, battle_id: int, version: int):
+        """A new state_version was written: drop the views of older ones"""
+        with self._lock:
+            entry = self._entries.get(battle_id)
+            if entry is None or entry.version < version:
+                self._entries[battle_id] = _Entry(version)
+                self._counts['invalidated'] += 1
+            self._entries.move_to_end(battle_id)
+            self._evict()
+
+    def _build_lock(self, battle_id: int) -> threading.Lock:
+        with self._lock:
+            lock = self._build_locks.get(battle_id)
+            if lock is None:
+                lock = self._build_locks[battle_id] = threading.Lock()
+            return lock
+
+    def _put(self, battle_id: int, version: int, perspective: Hashable, view: BattleView):
+        with self._lock:
+            entry = self._entries.get(battle_id)
+            if entry is not None and entry.version > version:
+                # Built from a read that a write has overtaken
+                self._counts['stale_builds'] += 1
+                return
+            if entry is None or entry.version < version:
+                entry = self._entries[battle_id] = _Entry(version)
+            entry.views[perspective] = view
+            self._entries.move_to_end(battle_id)
+            self._counts['builds'] += 1
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_battles:
+            self._entries.popitem(last=False)
+            self._counts['evicted'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, 'battles': len(self._entries)}
+
+
+# Shared by every view of pvp_routes.py
+BATTLE_VIEWS = BattleViewCache(BATTLE_VIEW_CACHE_BATTLES)
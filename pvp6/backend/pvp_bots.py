@@ -0,0 +1,126 @@
+"""
+Server-controlled PvP opponents.
+
+When a player has waited PVP_BOT_WAIT_SECONDS in pvp_queue without a human
+match, pvp_routes pairs them with a bot instead.  The bot's tier follows the
+player's rating and sets its deck (forms and rarities from
+difficultySettings.js) and how it plays (pvp_ai.HeuristicPolicy).  Its
+creature stats are drawn around the player's own deck so the match stays
+close.
+
+Bots are identified by negative user ids, one per tier; they have no users
+or pvp_stats rows.  Their turns are played by pvp_routes' background
+executor through play_bot_turn.
+"""
+import time
+from typing import Dict, List, Optional
+
+from pvp_ai import DIFFICULTIES, HeuristicPolicy
+from pvp_battle_state import PvPBattleState
+from pvp_combat_rules import ITEM_EFFECTS, ITEM_TYPES, STAT_NAMES
+from species_data import SPECIES_REGISTRY
+
+BOT_IDS = {"easy": -1, "medium": -2, "hard": -3, "expert": -4}
+BOT_NAMES = {"easy": "Training Bot", "medium": "Sparring Bot",
+             "hard": "Veteran Bot", "expert": "Champion Bot"}
+BOT_DIFFICULTY = {bot_id: difficulty for difficulty, bot_id in BOT_IDS.items()}
+
+# Rating at or above which each tier starts
+DIFFICULTY_RATINGS = (("expert", 1500), ("hard", 1200), ("medium", 900), ("easy", 0))
+
+MAX_BOT_ACTIONS = 20        # hard stop per turn, whatever the policy plans
+
+_SPECIES_BY_RARITY = {}
+for _species in SPECIES_REGISTRY.values():
+    _SPECIES_BY_RARITY.setdefault(_species.rarity, []).append(_species)
+
+
+def is_bot(user_id) -> bool:
+    return user_id in BOT_DIFFICULTY
+
+
+def difficulty_for_rating(rating: int) -> str:
+    for difficulty, floor in DIFFICULTY_RATINGS:
+        if rating >= floor:
+            return difficulty
+    return "easy"
+
+
+def _mean_stat(creatures: List[Dict]) -> float:
+    values = [value for creature in creatures
+              for value in (creature.get('stats') or {}).values()
+              if isinstance(value, (int, float))]
+    return sum(values) / len(values) if values else 8.0
+
+
+def _bot_creature(rng, difficulty, mean_stat: float) -> Dict:
+    rarities = [r for r, weight in difficulty.rarity_weights.items() if weight > 0 and r in _SPECIES_BY_RARITY]
+    rarity = rng.choices(rarities, weights=[difficulty.rarity_weights[r] for r in rarities])[0]
+    species = rng.choice(_SPECIES_BY_RARITY[rarity])
+    form = rng.randint(difficulty.min_form, difficulty.max_form)
+    return {
+        "id": f"bot-{rng.getrandbits(48):012x}",
+        "species_id": species.id,
+        "species_name": species.name,
+        "form": form,
+        "rarity": species.rarity,
+        "key_image_url": species.image_url(form),
+        "image_url": species.image_url(form),
+        "stats": {stat: max(1, round(rng.gauss(mean_stat, mean_stat * 0.25))) for stat in STAT_NAMES},
+        "combination_level": 0,
+    }
+
+
+def _bot_item(rng, kind: str) -> Dict:
+    effect = rng.choice(ITEM_EFFECTS)
+    return {
+        "id": f"bot-{rng.getrandbits(48):012x}",
+        "name": f"Babylon {effect}",
+        f"{kind}_type": rng.choice(ITEM_TYPES),
+        f"{kind}_effect": effect,
+    }
+
+
+def bot_player(rating: int, opponent_creatures: List[Dict], tool_count: int,
+               spell_count: int, rng) -> Dict:
+    """
+    Player data for create_initial_battle_state: a bot of the tier for
+    `rating`, with as many creatures, tools and spells as its opponent.
+    """
+    difficulty = DIFFICULTIES[difficulty_for_rating(rating)]
+    mean_stat = _mean_stat(opponent_creatures)
+    return {
+        "user_id": BOT_IDS[difficulty.name],
+        "name": BOT_NAMES[difficulty.name],
+        "selected_creatures": [_bot_creature(rng, difficulty, mean_stat)
+                               for _ in range(max(1, len(opponent_creatures)))],
+        "selected_tools": [_bot_item(rng, "tool") for _ in range(tool_count)],
+        "selected_spells": [_bot_item(rng, "spell") for _ in range(spell_count)],
+    }
+
+
+def play_bot_turn(battle: PvPBattleState, rng, budget_seconds: float) -> Optional[int]:
+    """
+    Play the active bot's whole turn, ending it unless the battle is over.
+    Planning stops after `budget_seconds` of wall time or MAX_BOT_ACTIONS,
+    so a single decision can never hold a worker for long.
+    Returns the number of actions taken, or None if it is not a bot's turn.
+    """
+    bot_id = battle.active_player_id
+    if not is_bot(bot_id):
+        return None
+
+    policy = HeuristicPolicy(BOT_DIFFICULTY[bot_id])
+    deadline = time.monotonic() + budget_seconds
+    taken = 0
+    for action in policy.turn(battle, bot_id, rng):
+        result = battle.process_action(bot_id, action)
+        taken += 1
+        if not result['success']:
+            print(f"Bot {bot_id} action rejected: {result['error']}")
+        if battle.check_battle_end()[0]:
+            return taken
+        if taken >= MAX_BOT_ACTIONS or time.monotonic() >= deadline:
+            break
+    battle.process_action(bot_id, {"type": "endTurn"})
+    return taken + 1
@@ -0,0 +1,1076 @@
+"""
+PvP combat rules, ported from the client's frontend/src/utils/
+battleCalculations.js, itemEffects.js and the action functions of
+battleCore.js (processAttack, applyTool, applySpell, defendCreature,
+applyOngoingEffects, processDefeatedCreatures), so the server resolves an
+action to the same numbers the client shows.
+
+Creatures are the dicts stored in the battle state (battleStats,
+currentHealth, activeEffects, ...).  Where the JS returns an updated clone,
+these functions update the creature in place.  PvP has no difficulty
+setting, so the JS 'medium' values are used throughout.
+
+Randomness comes from an `rng` argument with a random() method (the random
+module, a random.Random, or ScriptedRolls).  Rolls are drawn in the same
+order as the JS Math.random() calls, which is what lets
+golden/combat_rules.json replay recorded client results exactly
+(check_combat_rules.py).  Effect ids are the exception: the JS uses
+Date.now() + Math.random(), the server uses deterministic per-creature ids
+and draws nothing for them.
+
+JS semantics that affect results are kept explicit: js_round is Math.round
+(halves round up, also for negatives), `x or default` mirrors
+`x || default`, and form levels go through parse_form (parseInt(x) || 0).
+"""
+import copy
+import math
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+STAT_NAMES = ("energy", "strength", "magic", "stamina", "speed")
+ITEM_TYPES = ("energy", "strength", "magic", "stamina", "speed")
+ITEM_EFFECTS = ("Surge", "Shield", "Echo", "Drain", "Charge")
+
+DEFAULT_BATTLE_STATS = {
+    "physicalAttack": 10,
+    "magicalAttack": 10,
+    "physicalDefense": 5,
+    "magicalDefense": 5,
+    "maxHealth": 50,
+    "initiative": 10,
+    "criticalChance": 5,
+    "dodgeChance": 3,
+    "energyCost": 5,
+}
+
+RARITY_MULTIPLIERS = {"Legendary": 1.3, "Epic": 1.2, "Rare": 1.1}
+# Extra flat defense while defending, and scaling of health-over-time effects
+DEFEND_RARITY_BONUS = {"Legendary": 3, "Epic": 2, "Rare": 1}
+HEALTH_OVER_TIME_RARITY = {"Legendary": 1.2, "Epic": 1.15, "Rare": 1.1}
+DEFEND_BOOST = 0.3          # defendCreature at 'medium'
+COUNTER_ATTACK_CHANCE = 0.05
+
+# Derived stats: (stat, base, (primary stat, weight), (secondary stat, weight),
+# multiplier order, soft cap, hard cap).  The primary stat also gets the
+# specialty multiplier.  Multipliers are applied in the listed order, as in
+# the JS, so the floating point results match.
+_DERIVED_STATS = (
+    ("physicalAttack", 10, ("strength", 2.5), ("speed", 0.5),
+     ("form", "combination", "rarity", "synergy"), 60, 120),
+    ("magicalAttack", 10, ("magic", 2.5), ("energy", 0.5),
+     ("form", "combination", "rarity", "synergy"), 60, 120),
+    ("physicalDefense", 5, ("stamina", 2), ("strength", 0.5),
+     ("form", "combination", "rarity", "synergy"), 40, 80),
+    ("magicalDefense", 5, ("energy", 2), ("magic", 0.5),
+     ("form", "combination", "rarity", "synergy"), 40, 80),
+    ("maxHealth", 50, ("stamina", 4), ("energy", 1.5),
+     ("rarity", "form", "combination", "synergy"), 200, 400),
+    ("initiative", 10, ("speed", 2.5), ("energy", 0.3),
+     ("form", "combination", "synergy"), 40, 60),
+)
+# Chance stats: (stat, base, (primary, weight), (secondary, weight), cap)
+_CHANCE_STATS = (
+    ("criticalChance", 5, ("speed", 0.6), ("magic", 0.2), 30),
+    ("dodgeChance", 3, ("speed", 0.4), ("stamina", 0.1), 20),
+)
+
+# calculateFormDamageModifier: attacker form - defender form ->
+# (damage multiplier, cap as a fraction of the defender's max health)
+FORM_DAMAGE_MODIFIERS = {
+    3: (0.5, 0.6),
+    2: (0.6, 0.5),
+    1: (0.8, 0.35),
+    0: (1.0, None),
+    -1: (0.75, None),
+    -2: (0.5, None),
+}
+
+# calculateComboBonus: attack type -> (bonus per hit, falloff, max multiplier)
+COMBO_SCALING = {
+    "physical": (0.1, 0.9, 2.0),
+    "magical": (0.15, 0.85, 2.5),
+    "special": (0.2, 0.8, 3.0),
+    "normal": (0.05, 0.95, 1.5),
+}
+
+EFFECT_DESCRIPTIONS = {
+    "Surge": {"weak": "Minor surge of power", "normal": "Surge of enhanced abilities",
+              "strong": "Powerful surge of overwhelming might",
+              "maximum": "Ultimate surge of devastating power"},
+    "Shield": {"weak": "Basic protective barrier", "normal": "Solid defensive enhancement",
+               "strong": "Powerful defensive fortress",
+               "maximum": "Impenetrable defensive barrier"},
+    "Echo": {"weak": "Faint repeating effect", "normal": "Resonating enhancement",
+             "strong": "Powerful echoing phenomenon", "maximum": "Overwhelming echo cascade"},
+    "Drain": {"weak": "Minor energy drain", "normal": "Life force absorption",
+              "strong": "Powerful vampiric drain", "maximum": "Devastating soul drain"},
+    "Charge": {"weak": "Slow power buildup", "normal": "Steady power accumulation",
+               "strong": "Rapid power concentration",
+               "maximum": "Explosive power convergence"},
+}
+TOOL_ICONS = {"Surge": "⚡", "Shield": "🛡️", "Echo": "🔊", "Drain": "🩸", "Charge": "🔋"}
+SPELL_ICONS = {"Surge": "💥", "Shield": "✨", "Echo": "🌊", "Drain": "🌙", "Charge": "☄️"}
+
+
+class ScriptedRolls:
+    """An rng that replays recorded Math.random() values in order"""
+    __slots__ = ("rolls", "position")
+
+    def __init__(self, rolls: Sequence[float]):
+        self.rolls = list(rolls)
+        self.position = 0
+
+    def random(self) -> float:
+        if self.position >= len(self.rolls):
+            raise IndexError("scripted rolls exhausted")
+        roll = self.rolls[self.position]
+        self.position += 1
+        return roll
+
+
+# ──────────────────────────────────────────────────────────────
+# JS number semantics
+# ──────────────────────────────────────────────────────────────
+_LEADING_INT = re.compile(r"\s*([+-]?\d+)")
+
+
+def js_round(value: float) -> int:
+    """Math.round: nearest integer, halves towards +infinity"""
+    floor = math.floor(value)
+    return floor + 1 if value - floor >= 0.5 else floor
+
+
+def parse_form(form) -> int:
+    """parseInt(form) || 0"""
+    if isinstance(form, bool):
+        return 0
+    if isinstance(form, int):
+        return form
+    if isinstance(form, float):
+        return int(form) if math.isfinite(form) else 0
+    if isinstance(form, str):
+        match = _LEADING_INT.match(form)
+        return int(match.group(1)) if match else 0
+    return 0
+
+
+def _sign(value) -> int:
+    return (value > 0) - (value < 0)
+
+
+# ──────────────────────────────────────────────────────────────
+# Stats
+# ──────────────────────────────────────────────────────────────
+def rarity_multiplier(rarity: Optional[str]) -> float:
+    return RARITY_MULTIPLIERS.get(rarity, 1.0)
+
+
+def apply_soft_cap(value: float, soft_cap: float, hard_cap: float) -> float:
+    if value <= soft_cap:
+        return value
+    remaining = hard_cap - soft_cap
+    return soft_cap + remaining * (1 - math.exp(-(value - soft_cap) / remaining))
+
+
+def specialty_multipliers(specialty_stats) -> Dict[str, float]:
+    multipliers = dict.fromkeys(STAT_NAMES, 1.0)
+    if isinstance(specialty_stats, list):
+        if len(specialty_stats) == 1:
+            if specialty_stats[0] in multipliers:
+                multipliers[specialty_stats[0]] = 1.8
+        elif len(specialty_stats) >= 2:
+            for stat in specialty_stats:
+                if stat in multipliers:
+                    multipliers[stat] = 1.4
+    return multipliers
+
+
+def calculate_derived_stats(creature: Optional[Dict], synergies: Sequence[Dict] = ()) -> Dict:
+    """battleStats of a creature from its base stats (calculateDerivedStats)"""
+    stats = creature.get("stats") if creature else None
+    if not isinstance(stats, dict):
+        return dict(DEFAULT_BATTLE_STATS)
+
+    form_level = parse_form(creature.get("form"))
+    synergy = 1.0
+    for entry in synergies:
+        synergy += entry.get("bonus") or 0
+    factors = {
+        "rarity": rarity_multiplier(creature.get("rarity")),
+        "form": 1 + form_level * 0.25,
+        "combination": (creature.get("combination_level") or 0) * 0.1 + 1,
+        "synergy": synergy,
+    }
+    specialty = specialty_multipliers(creature.get("specialty_stats"))
+    values = {name: stats.get(name, 0) for name in STAT_NAMES}
+
+    result = {}
+    for stat, base, (primary, weight), (secondary, weight2), order, soft, hard in _DERIVED_STATS:
+        raw = base + (values[primary] * weight * specialty[primary]) + (values[secondary] * weight2)
+        for factor in order:
+            raw *= factors[factor]
+        result[stat] = js_round(apply_soft_cap(raw, soft, hard))
+    for stat, base, (primary, weight), (secondary, weight2), cap in _CHANCE_STATS:
+        raw = base + (values[primary] * weight * specialty[primary]) + (values[secondary] * weight2)
+        result[stat] = js_round(min(raw, cap))
+    result["energyCost"] = 5 + form_level
+    return result
+
+
+def derive_field_stats(creatures: Sequence[Dict], synergies: Sequence[Dict] = ()) -> List[Dict]:
+    """calculate_derived_stats for every creature of a field"""
+    return [calculate_derived_stats(creature, synergies) for creature in creatures]
+
+
+def _clamp_modified_stat(stat: str, value):
+    if "Attack" in stat or "Defense" in stat:
+        return max(1, value)
+    if stat == "maxHealth":
+        return max(10, value)
+    if stat == "initiative" or "Chance" in stat:
+        return max(0, value)
+    return value
+
+
+def recalculate_stats(creature: Dict) -> Dict:
+    """
+    battleStats from base stats plus active effect, permanent and
+    combination modifiers (recalculateDerivedStats).  Caps currentHealth at
+    the new maxHealth as a side effect, like the JS.
+    """
+    if not creature or not creature.get("stats"):
+        return creature.get("battleStats") or {}
+
+    modified = calculate_derived_stats(creature)
+    for effect in creature.get("activeEffects") or ():
+        if effect and effect.get("statModifications"):
+            for stat, value in effect["statModifications"].items():
+                if stat in modified:
+                    modified[stat] = _clamp_modified_stat(stat, modified[stat] + value)
+
+    for stat, value in (creature.get("permanentModifications") or {}).items():
+        if stat in modified:
+            modified[stat] += value
+
+    combination_level = creature.get("combination_level")
+    if combination_level and combination_level > 0:
+        multiplier = 1 + (combination_level * 0.08)
+        for stat in modified:
+            if "Chance" not in stat and stat != "energyCost":
+                modified[stat] = js_round(modified[stat] * multiplier)
+
+    current = creature.get("currentHealth")
+    if current and current > modified["maxHealth"]:
+        creature["currentHealth"] = modified["maxHealth"]
+    return modified
+
+
+def battle_ready(creature: Dict) -> Dict:
+    """
+    A copy of a deck creature with server-computed battleStats and full
+    health.  Any battle fields sent by the client are discarded.
+    """
+    ready = {key: value for key, value in creature.items()
+             if key not in ("activeEffects", "isDefending", "nextAttackBonus", "currentTurn")}
+    ready["battleStats"] = calculate_derived_stats(ready)
+    ready["currentHealth"] = ready["battleStats"]["maxHealth"]
+    return ready
+
+
+def ensure_battle_stats(creature: Dict):
+    """Fill in battleStats / currentHealth for creatures stored without them"""
+    if creature.get("battleStats") is None:
+        creature["battleStats"] = calculate_derived_stats(creature)
+    if creature.get("currentHealth") is None:
+        creature["currentHealth"] = creature["battleStats"]["maxHealth"]
+
+
+# ──────────────────────────────────────────────────────────────
+# Damage
+# ──────────────────────────────────────────────────────────────
+def effectiveness_multiplier(attack_type: str, attacker_stats: Optional[Dict],
+                             defender_stats: Optional[Dict]) -> float:
+    """Type advantage of an attack (getEffectivenessMultiplier)"""
+    if attacker_stats is None or defender_stats is None:
+        return 1.0
+
+    effectiveness = 1.0
+    if attack_type == "physical":
+        strength = attacker_stats.get("strength") or 5
+        stamina = defender_stats.get("stamina") or 5
+        magic = defender_stats.get("magic") or 5
+        if strength > 7 and stamina > magic:
+            effectiveness = 1.4
+        elif magic > 7 and magic > stamina:
+            effectiveness = 0.75
+        elif strength > stamina + 2:
+            effectiveness = 1.2
+        if (attacker_stats.get("speed") or 5) > (defender_stats.get("speed") or 5) + 3:
+            effectiveness *= 1.1
+    else:
+        magic = attacker_stats.get("magic") or 5
+        speed = defender_stats.get("speed") or 5
+        energy = defender_stats.get("energy") or 5
+        if magic > 7 and speed > energy:
+            effectiveness = 1.4
+        elif energy > 7 and energy > speed:
+            effectiveness = 0.75
+        elif magic > energy + 2:
+            effectiveness = 1.2
+        if (attacker_stats.get("energy") or 5) > (defender_stats.get("magic") or 5) + 3:
+            effectiveness *= 1.1
+
+    return max(0.5, min(1.8, effectiveness))
+
+
+def effectiveness_text(multiplier: float) -> str:
+    if multiplier >= 1.6:
+        return "very effective"
+    if multiplier >= 1.3:
+        return "effective"
+    if multiplier >= 1.1:
+        return "slightly effective"
+    if multiplier <= 0.6:
+        return "not very effective"
+    if multiplier <= 0.8:
+        return "resisted"
+    return "normal"
+
+
+def form_damage_modifier(attacker_form, defender_form) -> Tuple[float, Optional[float]]:
+    difference = parse_form(attacker_form) - parse_form(defender_form)
+    return FORM_DAMAGE_MODIFIERS[max(-2, min(3, difference))]
+
+
+def combo_bonus(combo_count, attack_type: str = "normal") -> float:
+    """Damage multiplier for consecutive attacks (calculateComboBonus)"""
+    if not combo_count or combo_count <= 0:
+        return 1.0
+    bonus, falloff, maximum = COMBO_SCALING.get(attack_type, COMBO_SCALING["normal"])
+    multiplier = 1.0
+    i = 0
+    while i < combo_count:
+        multiplier += bonus * math.pow(falloff, i)
+        i += 1
+    return min(multiplier, maximum)
+
+
+_NO_BATTLE_STATS = {
+    "damage": 1, "isDodged": False, "isCritical": False,
+    "effectiveness": "normal", "damageType": "normal",
+}
+
+
+def _attack_profile(attacker: Dict, attack_type: str) -> Tuple:
+    """The attacker's side of calculate_damage, shared by every defender"""
+    battle_stats = attacker["battleStats"]
+    attack_value = battle_stats.get("physicalAttack" if attack_type == "physical" else "magicalAttack", 0)
+    return (attack_type, attack_value, parse_form(attacker.get("form")),
+            battle_stats.get("criticalChance") or 5, attacker.get("stats") or {})
+
+
+def _resolve_damage(profile: Tuple, defender: Dict, combo_multiplier: float,
+                    variance_roll: float, critical_roll: float, dodge_roll: float) -> Dict:
+    attack_type, attack_value, attacker_form, critical_chance, attacker_stats = profile
+    defender_stats = defender["battleStats"]
+    defense_value = defender_stats.get(
+        "physicalDefense" if attack_type == "physical" else "magicalDefense", 0)
+    defender_form = parse_form(defender.get("form"))
+    form_difference = attacker_form - defender_form
+    effectiveness = effectiveness_multiplier(attack_type, attacker_stats, defender.get("stats") or {})
+
+    variance = 0.85 + (variance_roll * 0.3)
+    is_critical = critical_roll * 100 <= critical_chance
+    if dodge_roll * 100 <= (defender_stats.get("dodgeChance") or 3):
+        return {"damage": 0, "isDodged": True, "isCritical": False,
+                "effectiveness": "normal", "damageType": "dodged"}
+
+    raw_damage = attack_value * effectiveness * variance * (1.5 if is_critical else 1) * combo_multiplier
+    # Defense reduces damage by up to 70%, with diminishing returns
+    defense_reduction = defense_value / (defense_value + 100) * 0.7
+    damage = max(1, js_round(raw_damage * (1 - defense_reduction)))
+
+    multiplier, cap = FORM_DAMAGE_MODIFIERS[max(-2, min(3, form_difference))]
+    damage = js_round(damage * multiplier)
+
+    damage_type = "normal"
+    if cap:
+        max_health = defender_stats.get("maxHealth")
+        if max_health is not None:
+            max_allowed = js_round(max_health * cap)
+            if damage > max_allowed:
+                damage = max_allowed
+                if form_difference >= 2:
+                    damage_type = "devastating"
+                elif form_difference >= 1:
+                    damage_type = "powerful"
+    elif form_difference <= -2:
+        damage_type = "glancing"
+    elif form_difference <= -1:
+        damage_type = "reduced"
+
+    damage = max(max(1, math.floor(attacker_form * 2 + 1)), damage)
+    return {
+        "damage": damage,
+        "isDodged": False,
+        "isCritical": is_critical,
+        "effectiveness": effectiveness_text(effectiveness),
+        "damageType": damage_type,
+        "formDifference": form_difference,
+        "comboMultiplier": combo_multiplier,
+    }
+
+
+def calculate_damage(attacker: Dict, defender: Dict, attack_type: str = "physical",
+                     combo_multiplier: float = 1.0, rng=random) -> Dict:
+    """
+    Damage of one attack (calculateDamage).  Draws three rolls: variance,
+    critical hit, dodge.
+    """
+    if (not attacker or not defender or attacker.get("battleStats") is None
+            or defender.get("battleStats") is None):
+        return dict(_NO_BATTLE_STATS)
+    profile = _attack_profile(attacker, attack_type)
+    return _resolve_damage(profile, defender, combo_multiplier,
+                           rng.random(), rng.random(), rng.random())
+
+
+def field_damage(attacker: Dict, defenders: Sequence[Dict], attack_type: str = "physical",
+                 combo_multiplier: float = 1.0, rng=random) -> List[Dict]:
+    """
+    calculate_damage against every defender of a field, in order, with the
+    attacker's side computed once.  Consumes the same rolls as calling
+    calculate_damage once per defender.
+    """
+    if not attacker or attacker.get("battleStats") is None:
+        return [dict(_NO_BATTLE_STATS) for _ in defenders]
+    profile = _attack_profile(attacker, attack_type)
+    results = []
+    for defender in defenders:
+        if not defender or defender.get("battleStats") is None:
+            results.append(dict(_NO_BATTLE_STATS))
+            continue
+        results.append(_resolve_damage(profile, defender, combo_multiplier,
+                                       rng.random(), rng.random(), rng.random()))
+    return results
+
+
+def expected_field_damage(attacker: Dict, defenders: Sequence[Dict],
+                          attack_type: str = "physical") -> List[int]:
+    """
+    Damage against every defender with average variance and no critical
+    hit or dodge.  Deterministic; meant for planning, not for resolving.
+    """
+    if not attacker or attacker.get("battleStats") is None:
+        return [1 for _ in defenders]
+    profile = _attack_profile(attacker, attack_type)
+    return [_resolve_damage(profile, defender, 1.0, 0.5, 1.0, 1.0)["damage"]
+            if defender and defender.get("battleStats") is not None else 1
+            for defender in defenders]
+
+
+# ──────────────────────────────────────────────────────────────
+# Tool and spell effects
+# ──────────────────────────────────────────────────────────────
+_TOOL_BASE = {
+    "energy": {"statChanges": {"energyCost": -0.5}, "energyGain": 2, "duration": 3},
+    "strength": {"statChanges": {"physicalAttack": 10, "physicalDefense": 5}, "duration": 2},
+    "magic": {"statChanges": {"physicalDefense": 10, "magicalDefense": 10, "maxHealth": 15},
+              "healthChange": 5, "duration": 2},
+    "stamina": {"statChanges": {"physicalDefense": 5}, "healthChange": 10,
+                "chargeEffect": {"targetStat": "physicalDefense", "perTurnBonus": 3,
+                                 "maxTurns": 3, "finalBurst": 25},
+                "duration": 3},
+    "speed": {"statChanges": {"physicalAttack": 8, "magicalAttack": 8,
+                              "physicalDefense": -2, "magicalDefense": -2},
+              "healthChange": 5, "duration": 3},
+}
+_TOOL_BASE_FALLBACK = {"statChanges": {"physicalAttack": 3}, "duration": 3}
+_INVALID_TOOL_EFFECT = {"statChanges": {"physicalDefense": 2}, "duration": 1}
+
+
+def _build_tool_effect(tool_type: str, effect: str) -> Dict:
+    """getToolEffect for a valid (type, effect) pair"""
+    base = copy.deepcopy(_TOOL_BASE.get(tool_type, _TOOL_BASE_FALLBACK))
+    base_changes = base.get("statChanges") or {}
+
+    if effect == "Surge":
+        if tool_type == "strength":
+            return {"statChanges": {"physicalAttack": 10, "physicalDefense": 5}, "duration": 2}
+        return {**base,
+                "statChanges": {stat: value * 2 for stat, value in base_changes.items()},
+                "healthChange": (base.get("healthChange") or 0) * 1.5,
+                "duration": 1}
+    if effect == "Shield":
+        if tool_type == "magic":
+            return {"statChanges": {"physicalDefense": 10, "magicalDefense": 10, "maxHealth": 15},
+                    "healthChange": 5, "duration": 2}
+        return {"statChanges": {"physicalDefense": 10, "magicalDefense": 10, "maxHealth": 15},
+                "healthChange": 8, "duration": 3}
+    if effect == "Echo":
+        if tool_type == "energy":
+            return {"statChanges": {"energyCost": -0.5}, "healthOverTime": 2, "duration": 3}
+        return {**base,
+                "statChanges": {stat: js_round(value * 0.7) for stat, value in base_changes.items()},
+                "healthOverTime": js_round((base.get("healthChange") or 0) * 0.25),
+                "duration": 5}
+    if effect == "Drain":
+        penalty = -2 if tool_type == "speed" else -3
+        return {"statChanges": {"physicalAttack": 8, "magicalAttack": 8,
+                                "physicalDefense": penalty, "magicalDefense": penalty},
+                "healthChange": 5, "duration": 3}
+    if effect == "Charge":
+        if tool_type == "stamina":
+            return {"statChanges": {"physicalDefense": 3},
+                    "chargeEffect": {"targetStat": "physicalDefense", "perTurnBonus": 3,
+                                     "maxTurns": 3, "finalBurst": 25},
+                    "duration": 3}
+        return {"statChanges": {},
+                "chargeEffect": {"targetStat": next(iter(base_changes), "physicalAttack"),
+                                 "perTurnBonus": 3, "maxTurns": 3, "finalBurst": 15},
+                "duration": 3}
+    return {**base,
+            "statChanges": {stat: js_round(value * 1.1) for stat, value in base_changes.items()},
+            "healthChange": js_round((base.get("healthChange") or 0) * 1.1)}
+
+
+# Every tool the game mints is one of these; anything else is built on demand
+TOOL_EFFECTS = {(tool_type, effect): _build_tool_effect(tool_type, effect)
+                for tool_type in ITEM_TYPES for effect in ITEM_EFFECTS}
+
+
+def tool_effect(tool: Optional[Dict]) -> Dict:
+    """
+    Unscaled effect of a tool (getToolEffect).  Entries of TOOL_EFFECTS are
+    shared: treat the result as read-only.
+    """
+    if not tool or not tool.get("tool_effect") or not tool.get("tool_type"):
+        return _INVALID_TOOL_EFFECT
+    key = (tool["tool_type"], tool["tool_effect"])
+    return TOOL_EFFECTS.get(key) or _build_tool_effect(*key)
+
+
+def _drain_effect(magic_power: float) -> Dict:
+    return {"damage": 18 * magic_power, "selfHeal": 10 * magic_power,
+            "statDrain": {"physicalAttack": -3, "magicalAttack": -3},
+            "statGain": {"physicalAttack": 2, "magicalAttack": 2},
+            "duration": 2}
+
+
+def _charge_spell_effect(magic_power: float) -> Dict:
+    return {"prepareEffect": {"name": "Charging Spell", "turns": 1, "damage": 35 * magic_power,
+                              "areaEffect": True, "stunChance": 0.2},
+            "chargeBonus": 5 * magic_power,
+            "duration": 1}
+
+
+# Base spell effect per spell type, as a function of the caster's magic power
+_SPELL_BASE = {
+    "energy": lambda mp: {"damage": 20 * mp, "criticalChance": 15, "armorPiercing": True,
+                          "duration": 0},
+    "strength": _drain_effect,
+    "magic": _charge_spell_effect,
+    "stamina": lambda mp: {"statChanges": {"physicalDefense": 8, "magicalDefense": 8,
+                                           "maxHealth": 15},
+                           "healing": 15 * mp, "damageReduction": 0.15, "duration": 3},
+    "speed": lambda mp: {"statChanges": {"initiative": 5, "dodgeChance": 3, "criticalChance": 3},
+                         "healthOverTime": 3, "duration": 3},
+}
+_SPELL_BASE_FALLBACK = lambda mp: {"damage": 10 * mp, "duration": 2}
+_INVALID_SPELL_EFFECT = {"damage": 5, "duration": 1}
+
+
+def spell_effect(spell: Optional[Dict], caster_magic=5) -> Dict:
+    """Unscaled effect of a spell cast with `caster_magic` (getSpellEffect)"""
+    if not spell or not spell.get("spell_effect") or not spell.get("spell_type"):
+        return dict(_INVALID_SPELL_EFFECT)
+
+    effect = spell["spell_effect"]
+    spell_type = spell["spell_type"]
+    magic_power = 1 + (caster_magic * 0.15)
+    base = _SPELL_BASE.get(spell_type, _SPELL_BASE_FALLBACK)(magic_power)
+
+    if effect == "Surge":
+        if spell_type == "energy":
+            return {"damage": 25 * magic_power, "criticalChance": 15, "armorPiercing": True,
+                    "duration": 0}
+        return {"damage": (base.get("damage") or 15) * 2.5, "criticalChance": 15,
+                "armorPiercing": True, "duration": 0}
+    if effect == "Shield":
+        if spell_type == "stamina":
+            return _SPELL_BASE["stamina"](magic_power)
+        return {"statChanges": {"physicalDefense": 12, "magicalDefense": 12, "maxHealth": 20},
+                "healing": 15 * magic_power, "damageReduction": 0.2, "duration": 3}
+    if effect == "Echo":
+        if spell_type == "speed":
+            return _SPELL_BASE["speed"](magic_power)
+        if base.get("healing"):
+            health_over_time = js_round((base["healing"] / 3) * magic_power)
+        elif base.get("damage"):
+            health_over_time = js_round(-(base["damage"] / 3) * magic_power)
+        else:
+            health_over_time = 0
+        return {"healthOverTime": health_over_time,
+                "statChanges": {stat: js_round(value * 0.3)
+                                for stat, value in (base.get("statChanges") or {}).items()},
+                "duration": 3}
+    if effect == "Drain":
+        return _drain_effect(magic_power)
+    if effect == "Charge":
+        return _charge_spell_effect(magic_power)
+
+    result = {**base,
+              "damage": (base.get("damage") or 0) * 1.2,
+              "healing": (base.get("healing") or 0) * 1.2}
+    if base.get("statChanges"):
+        result["statChanges"] = {stat: js_round(value * 1.15)
+                                 for stat, value in base["statChanges"].items()}
+    else:
+        result.pop("statChanges", None)
+    return result
+
+
+def effect_power(item: Dict, caster_stats: Optional[Dict]) -> float:
+    """Power multiplier of a tool or spell (calculateEffectPower at 'medium')"""
+    power = 1.0
+    if caster_stats and item.get("spell_type"):
+        relevant = caster_stats.get(item["spell_type"]) or 5
+        power *= (1 + (relevant - 5) * 0.05)
+    return power
+
+
+def _power_level(power: float) -> str:
+    return "strong" if power >= 1.3 else "normal" if power >= 1.1 else "weak"
+
+
+def effect_description(effect_type: str, power_level: str = "normal") -> str:
+    return (EFFECT_DESCRIPTIONS.get(effect_type) or {}).get(power_level) or f"{effect_type.lower()} effect"
+
+
+def _next_effect_id(creature: Dict, turn: int) -> str:
+    """A deterministic id, unique among the creature's active effects"""
+    taken = {effect.get("id") for effect in creature.get("activeEffects") or () if effect}
+    n = len(taken) + 1
+    while f"{turn}.{n}" in taken:
+        n += 1
+    return f"{turn}.{n}"
+
+
+def _add_effect(creature: Dict, effect: Dict, turn: int):
+    effect = {"id": _next_effect_id(creature, turn), **effect}
+    creature["activeEffects"] = list(creature.get("activeEffects") or ()) + [effect]
+
+
+def _scale_stat_changes(changes: Optional[Dict], cap: float, power: float) -> Dict:
+    if not changes:
+        return {}
+    scale = min(power, 1.5)
+    return {stat: js_round(min(abs(value), cap) * _sign(value) * scale)
+            for stat, value in changes.items()}
+
+
+def _apply_stat_changes(battle_stats: Dict, changes: Dict):
+    for stat, value in changes.items():
+        if stat in battle_stats:
+            battle_stats[stat] = max(0, battle_stats[stat] + value)
+
+
+def apply_tool(creature: Dict, tool: Dict, turn: int = 0) -> Optional[Dict]:
+    """
+    Use a tool on a creature (applyTool).  Returns the scaled effect, or
+    None if the creature has no battleStats.
+    """
+    if not creature or not tool or creature.get("battleStats") is None:
+        return None
+
+    power = effect_power(tool, creature.get("stats"))
+    effect = tool_effect(tool)
+    scaled = dict(effect)
+    scaled["statChanges"] = _scale_stat_changes(effect.get("statChanges"), 10, power)
+    scaled["healthChange"] = (js_round(min(effect["healthChange"] * power, 50))
+                              if effect.get("healthChange") else 0)
+    scaled["healthOverTime"] = (js_round(effect["healthOverTime"] * power)
+                                if effect.get("healthOverTime") else 0)
+    scaled["duration"] = effect.get("duration") or 1
+
+    _apply_stat_changes(creature["battleStats"], scaled["statChanges"])
+
+    if scaled["duration"] > 0:
+        power_level = _power_level(power)
+        active = {
+            "name": f"{tool.get('name') or 'Tool'} Effect",
+            "icon": TOOL_ICONS.get(tool.get("tool_effect"), "🔧"),
+            "type": tool.get("tool_type") or "enhancement",
+            "description": effect_description(tool.get("tool_effect") or "enhancement", power_level),
+            "duration": scaled["duration"],
+            "statModifications": scaled["statChanges"],
+            "healthOverTime": scaled["healthOverTime"],
+            "powerLevel": power_level,
+            "startTurn": turn,
+        }
+        if tool.get("tool_effect") is not None:
+            active["effectType"] = tool["tool_effect"]
+        if tool.get("tool_effect") == "Charge" and effect.get("chargeEffect"):
+            charge = effect["chargeEffect"]
+            active["type"] = "charge"
+            active["chargeEffect"] = {**charge,
+                                      "perTurnBonus": js_round(charge["perTurnBonus"] * power),
+                                      "finalBurst": js_round(charge["finalBurst"] * power)}
+        _add_effect(creature, active, turn)
+
+    if scaled["healthChange"] > 0:
+        creature["currentHealth"] = min(creature["currentHealth"] + scaled["healthChange"],
+                                        creature["battleStats"]["maxHealth"])
+
+    creature["battleStats"] = recalculate_stats(creature)
+    return scaled
+
+
+def apply_spell(caster: Dict, target: Dict, spell: Dict, turn: int = 0, rng=random) -> Optional[Dict]:
+    """
+    Cast a spell (applySpell).  Damage spells draw one critical-hit roll.
+    Returns the scaled effect, or None if the caster has no stats or the
+    target no battleStats.
+
+    A creature can target itself; it is then updated as the target only
+    (no self-heal or stat gain), which is how the client treats it.
+    """
+    if not caster or not target or not spell:
+        return None
+    if not caster.get("stats") or target.get("battleStats") is None:
+        return None
+
+    same_creature = caster.get("id") == target.get("id")
+    caster_magic = caster["stats"].get("magic") or 5
+    power = effect_power(spell, caster["stats"])
+    effect = spell_effect(spell, caster_magic)
+
+    scaled = dict(effect)
+    scaled["damage"] = js_round(min(effect["damage"] * power, 100)) if effect.get("damage") else 0
+    scaled["healing"] = js_round(min(effect["healing"] * power, 80)) if effect.get("healing") else 0
+    scaled["selfHeal"] = js_round(min(effect["selfHeal"] * power, 40)) if effect.get("selfHeal") else 0
+    scaled["healthOverTime"] = (js_round(effect["healthOverTime"] * power)
+                                if effect.get("healthOverTime") else 0)
+    scaled["statChanges"] = _scale_stat_changes(effect.get("statChanges"), 12, power)
+
+    if scaled["damage"]:
+        damage = scaled["damage"]
+        critical_chance = min(3 + math.floor(caster_magic * 0.3), 15)
+        is_critical = rng.random() * 100 <= critical_chance
+        if is_critical:
+            damage = js_round(damage * 1.5)
+        if scaled.get("armorPiercing") or power >= 1.3:
+            # Ignores a fifth of the target's defenses
+            damage += js_round(damage * 0.2)
+        target["currentHealth"] = max(0, target["currentHealth"] - damage)
+        scaled["actualDamage"] = damage
+        scaled["wasCritical"] = is_critical
+
+    if scaled["healing"] and same_creature:
+        target["currentHealth"] = min(target["currentHealth"] + scaled["healing"],
+                                      target["battleStats"]["maxHealth"])
+
+    if scaled["selfHeal"] and not same_creature:
+        caster["currentHealth"] = min(caster["currentHealth"] + scaled["selfHeal"],
+                                      caster["battleStats"]["maxHealth"])
+
+    if scaled["statChanges"]:
+        _apply_stat_changes(target["battleStats"], scaled["statChanges"])
+
+    if scaled.get("statDrain") and scaled.get("statGain"):
+        caster_stats = caster.get("battleStats") or {}
+        for stat, value in scaled["statDrain"].items():
+            if stat in target["battleStats"] and stat in caster_stats:
+                target["battleStats"][stat] = max(0, target["battleStats"][stat] + value)
+                if not same_creature:
+                    caster_stats[stat] = caster_stats[stat] + (scaled["statGain"].get(stat) or 0)
+
+    if effect.get("duration", 0) > 0:
+        power_level = _power_level(power)
+        active = {
+            "name": f"{spell.get('name') or 'Spell'} Effect",
+            "icon": SPELL_ICONS.get(spell.get("spell_effect"), "✨"),
+            "type": spell.get("spell_type") or "magic",
+            "description": effect_description(spell.get("spell_effect") or "magic", power_level),
+            "duration": effect["duration"],
+            "statModifications": scaled["statChanges"],
+            "healthOverTime": scaled["healthOverTime"],
+            "casterMagic": caster_magic,
+            "powerLevel": power_level,
+            "startTurn": turn,
+        }
+        if spell.get("spell_effect") is not None:
+            active["effectType"] = spell["spell_effect"]
+        if spell.get("spell_effect") == "Charge" and effect.get("prepareEffect"):
+            active["type"] = "charge"
+            active["prepareEffect"] = {**effect["prepareEffect"],
+                                       "damage": js_round(effect["prepareEffect"]["damage"] * power)}
+        _add_effect(target, active, turn)
+
+    if scaled["statChanges"]:
+        target["battleStats"] = recalculate_stats(target)
+    return scaled
+
+
+# ──────────────────────────────────────────────────────────────
+# Actions and upkeep
+# ──────────────────────────────────────────────────────────────
+def defend_creature(creature: Dict, turn: int = 0) -> Dict:
+    """Put a creature in a defensive stance until its next upkeep (defendCreature)"""
+    if not creature or creature.get("battleStats") is None:
+        return creature
+
+    creature["isDefending"] = True
+    battle_stats = creature["battleStats"]
+    physical_boost = js_round(battle_stats["physicalDefense"] * DEFEND_BOOST)
+    magical_boost = js_round(battle_stats["magicalDefense"] * DEFEND_BOOST)
+    rarity_bonus = DEFEND_RARITY_BONUS.get(creature.get("rarity"), 0)
+
+    creature["battleStats"] = {
+        **battle_stats,
+        "physicalDefense": battle_stats["physicalDefense"] + physical_boost + rarity_bonus,
+        "magicalDefense": battle_stats["magicalDefense"] + magical_boost + rarity_bonus,
+    }
+    _add_effect(creature, {
+        "name": "Defensive Stance",
+        "icon": "🛡️",
+        "type": "defense",
+        "description": f"Defensive posture (+{physical_boost + rarity_bonus} defense)",
+        "duration": 1,
+        "statModifications": {
+            "physicalDefense": physical_boost + rarity_bonus,
+            "magicalDefense": magical_boost + rarity_bonus,
+        },
+        "damageReduction": 0.05,
+        "counterAttackChance": COUNTER_ATTACK_CHANCE,
+        "startTurn": turn,
+    }, turn)
+    creature["battleStats"] = recalculate_stats(creature)
+    return creature
+
+
+def _attack_log(attacker: Dict, defender: Dict, attack_type: str, result: Dict, combo_level) -> str:
+    attacker_name = attacker.get("species_name")
+    defender_name = defender.get("species_name")
+    if result["isDodged"]:
+        return f"{attacker_name}'s {attack_type} attack was dodged by {defender_name}!"
+
+    message = f"{attacker_name} used {attack_type} attack on {defender_name}"
+    if result["isCritical"]:
+        message += " (Critical Hit!)"
+    if combo_level > 1:
+        message += f" [Combo x{combo_level}!]"
+    if result["effectiveness"] != "normal":
+        message += f" - {result['effectiveness']}!"
+    if result.get("damageType") and result["damageType"] != "normal":
+        message += f" [{result['damageType']}]"
+    message += f" dealing {result['damage']} damage."
+
+    max_health = defender["battleStats"]["maxHealth"]
+    if defender["currentHealth"] <= 0:
+        if defender.get("rarity") == "Legendary":
+            message += f" {defender_name} falls in battle!"
+        elif defender.get("rarity") == "Epic":
+            message += f" {defender_name} has been defeated!"
+        else:
+            message += f" {defender_name} was defeated!"
+    elif defender["currentHealth"] < max_health * 0.2:
+        message += f" {defender_name} is critically wounded!"
+    elif defender["currentHealth"] < max_health * 0.5:
+        message += f" {defender_name} is wounded!"
+    return message
+
+
+def process_attack(attacker: Dict, defender: Dict, attack_type: str = "auto",
+                   combo_level=0, rng=random, turn: int = 0) -> Dict:
+    """
+    Resolve an attack (processAttack).  Draws the three damage rolls, then
+    one more after a critical hit (trauma debuff) and one more after an
+    effective hit (weakness debuff).
+    """
+    battle_stats = attacker["battleStats"]
+    if attack_type == "auto":
+        attack_type = ("physical" if battle_stats["physicalAttack"] >= battle_stats["magicalAttack"]
+                       else "magical")
+
+    # A finished charge effect powers up the next attack, once
+    if attacker.get("nextAttackBonus"):
+        stat = "physicalAttack" if attack_type == "physical" else "magicalAttack"
+        battle_stats[stat] += attacker.pop("nextAttackBonus")
+
+    combo_multiplier = combo_bonus(combo_level)
+    result = calculate_damage(attacker, defender, attack_type, combo_multiplier, rng)
+
+    if not result["isDodged"]:
+        previous = defender["currentHealth"]
+        defender["currentHealth"] = max(0, previous - result["damage"])
+        actual_damage = previous - defender["currentHealth"]
+
+        if result["isCritical"] and rng.random() < 0.2:
+            _add_effect(defender, {
+                "name": "Critical Strike Trauma", "icon": "💥", "type": "debuff",
+                "description": "Suffering from critical strike", "duration": 1,
+                "statModifications": {"physicalDefense": -2, "magicalDefense": -2},
+                "startTurn": turn,
+            }, turn)
+        if result["effectiveness"] in ("very effective", "effective") and rng.random() < 0.25:
+            _add_effect(defender, {
+                "name": "Elemental Weakness", "icon": "⚡", "type": "debuff",
+                "description": "Vulnerable to attacks", "duration": 2,
+                "statModifications": {"physicalDefense": -1, "magicalDefense": -1},
+                "startTurn": turn,
+            }, turn)
+
+        result["damage"] = actual_damage
+        result["actualDamage"] = actual_damage
+
+    return {
+        "damage": result["damage"] or 0,
+        "isCritical": result["isCritical"] or False,
+        "isDodged": result["isDodged"],
+        "attackType": attack_type,
+        "effectiveness": result["effectiveness"],
+        "damageType": result.get("damageType"),
+        "damageResult": {**result, "comboMultiplier": combo_multiplier},
+        "battleLog": _attack_log(attacker, defender, attack_type, result, combo_level),
+    }
+
+
+def process_timed_effect(effect: Dict, turn: int, start_turn: int) -> Dict:
+    """Charge and Echo effects that change with time (processTimedEffect)"""
+    turns_passed = turn - start_turn
+    processed = dict(effect)
+
+    charge = effect.get("chargeEffect")
+    if effect.get("effectType") == "Charge" and charge:
+        progress = min(turns_passed / (charge.get("maxTurns") or 3), 1.0)
+        if progress < 1.0:
+            processed["statModifications"] = {
+                **(processed.get("statModifications") or {}),
+                charge.get("targetStat"): math.floor(charge["perTurnBonus"] * progress),
+            }
+
+    if effect.get("effectType") == "Echo" and effect.get("healthOverTime"):
+        intensity = 0.8 + math.sin(turns_passed * math.pi / 3) * 0.3
+        processed["healthOverTime"] = js_round((effect.get("healthOverTime") or 0) * intensity)
+    return processed
+
+
+def apply_ongoing_effects(creature: Dict, turn: int = 0) -> Dict:
+    """
+    One upkeep step for a creature (applyOngoingEffects): apply stat
+    modifiers and health over time, advance charge effects, count every
+    effect's duration down by one and end a defensive stance.
+    """
+    if not creature or creature.get("battleStats") is None:
+        return creature
+
+    stat_mods: Dict[str, float] = {}
+    stats_modified = False
+    remaining = []
+
+    for effect in creature.get("activeEffects") or ():
+        if not effect:
+            continue
+        processed = process_timed_effect(effect, turn, effect.get("startTurn") or 0)
+
+        for stat, value in (processed.get("statModifications") or {}).items():
+            stat_mods[stat] = (stat_mods.get(stat) or 0) + value
+            stats_modified = True
+
+        health_change = processed.get("healthOverTime")
+        if health_change is not None and health_change != 0:
+            multiplier = HEALTH_OVER_TIME_RARITY.get(creature.get("rarity"))
+            if multiplier:
+                health_change = js_round(health_change * multiplier)
+            creature["currentHealth"] = min(creature["battleStats"]["maxHealth"],
+                                            max(0, creature["currentHealth"] + health_change))
+
+        charge = processed.get("chargeEffect")
+        if processed.get("type") == "charge" and charge:
+            turns_active = turn - (processed.get("startTurn") or 0)
+            progress = min(turns_active / (charge.get("maxTurns") or 3), 1.0)
+            if progress >= 1.0 and charge.get("finalBurst"):
+                creature["nextAttackBonus"] = (creature.get("nextAttackBonus") or 0) + charge["finalBurst"]
+                continue        # the charge is spent
+            increment = math.floor((charge.get("perTurnBonus") or 0) * progress)
+            if charge.get("targetStat") and increment > 0:
+                target_stat = charge["targetStat"]
+                stat_mods[target_stat] = (stat_mods.get(target_stat) or 0) + increment
+                stats_modified = True
+
+        duration = processed.get("duration")
+        if isinstance(duration, (int, float)) and duration - 1 > 0:
+            processed["duration"] = duration - 1
+            remaining.append(processed)
+
+    creature["activeEffects"] = remaining
+
+    if stats_modified:
+        battle_stats = calculate_derived_stats(creature)
+        for stat, value in stat_mods.items():
+            if stat in battle_stats:
+                battle_stats[stat] = max(0, battle_stats[stat] + value)
+        creature["battleStats"] = battle_stats
+
+    if creature.get("isDefending"):
+        creature["isDefending"] = False
+    return creature
+
+
+def apply_field_ongoing_effects(creatures: Sequence[Dict], turn: int = 0) -> List[Dict]:
+    return [apply_ongoing_effects(creature, turn) for creature in creatures]
+
+
+def remove_defeated(creatures: Sequence[Dict], opposing: Sequence[Dict] = (),
+                    turn: int = 0) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split a field into (survivors, defeated) and apply death effects
+    (processDefeatedCreatures).  As in the JS, a death blesses only the
+    allies listed before the fallen creature.
+    """
+    survivors, defeated = [], []
+    for creature in creatures:
+        if creature["currentHealth"] > 0:
+            survivors.append(creature)
+            continue
+        defeated.append(creature)
+
+        if creature.get("rarity") == "Legendary":
+            for ally in survivors:
+                ally["battleStats"]["physicalAttack"] += 2
+                ally["battleStats"]["magicalAttack"] += 2
+                _add_effect(ally, {
+                    "name": f"{creature.get('species_name')}'s Final Gift", "icon": "👑",
+                    "type": "legendary_blessing",
+                    "description": "Empowered by a fallen legendary creature", "duration": 5,
+                    "statModifications": {"physicalAttack": 2, "magicalAttack": 2},
+                    "startTurn": turn,
+                }, turn)
+        elif "energy" in (creature.get("specialty_stats") or ()):
+            for ally in survivors:
+                _add_effect(ally, {
+                    "name": "Energy Release", "icon": "⚡", "type": "energy_burst",
+                    "description": "Energized by released power", "duration": 2,
+                    "statModifications": {"energyCost": -1},
+                    "startTurn": turn,
+                }, turn)
+        elif creature.get("rarity") == "Epic":
+            for ally in survivors:
+                _add_effect(ally, {
+                    "name": "Epic Essence", "icon": "💜", "type": "epic_blessing",
+                    "description": "Blessed by epic essence", "duration": 3,
+                    "statModifications": {"physicalAttack": 1, "magicalAttack": 1},
+                    "startTurn": turn,
+                }, turn)
+
+        if creature.get("rarity") in ("Legendary", "Epic"):
+            for enemy in opposing:
+                _add_effect(enemy, {
+                    "name": "Guilty Conscience", "icon": "😰", "type": "debuff",
+                    "description": "Shaken by defeating a powerful foe", "duration": 2,
+                    "statModifications": {"initiative": -2, "dodgeChance": -1},
+                    "startTurn": turn,
+                }, turn)
+    return survivors, defeated
@@ -0,0 +1,223 @@
+"""
+In-memory PvP leaderboard.
+
+Keeps every player's rating in an order-statistic structure so that rank,
+top-N and leaderboard pages cost O(log n) instead of a scan of pvp_stats:
+
+  * a Fenwick tree counts players per rating bucket, one bucket per rating
+    point between RATING_FLOOR and RATING_CEILING (ratings outside share
+    the edge buckets);
+  * each bucket holds its players as a sorted list of (-rating, -user_id),
+    which is also the leaderboard order: rating high to low, ties broken by
+    the higher user_id, the order idx_pvp_stats_rating gives when read
+    backwards.
+
+pvp_routes loads it from pvp_stats at startup and calls set_rating whenever
+it writes a rating.  Positions are 1-based places in leaderboard order;
+rank() is the competition rank get_stats has always reported (players with
+equal ratings share it).
+
+WindowedLeaderboard ranks the rating gained over the last few days instead,
+from the pvp_daily_stats rollups.
+"""
+import bisect
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+RATING_FLOOR = -1024
+RATING_CEILING = 5119
+
+
+class Leaderboard:
+    def __init__(self, floor: int = RATING_FLOOR, ceiling: int = RATING_CEILING):
+        self._floor = floor
+        self._ceiling = ceiling
+        self._size = ceiling - floor + 1
+        self._step = 1 << (self._size.bit_length() - 1)  # highest power of two <= size
+        self._tree = [0] * (self._size + 1)              # Fenwick tree, 1-based
+        self._buckets: Dict[int, List[Tuple[int, int]]] = {}
+        self._ratings: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    # ── Fenwick tree over buckets (bucket 1 holds the highest ratings) ──
+    def _bucket(self, rating: int) -> int:
+        return self._ceiling - min(max(rating, self._floor), self._ceiling) + 1
+
+    def _add(self, bucket: int, delta: int):
+        while bucket <= self._size:
+            self._tree[bucket] += delta
+            bucket += bucket & -bucket
+
+    def _count_through(self, bucket: int) -> int:
+        """Players in buckets 1..bucket"""
+        total = 0
+        while bucket > 0:
+            total += self._tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+    def _find(self, index: int) -> Tuple[int, int]:
+        """Bucket holding the player at 0-based `index`, and the index within it"""
+        bucket, step = 0, self._step
+        while step:
+            if bucket + step <= self._size and self._tree[bucket + step] <= index:
+                bucket += step
+                index -= self._tree[bucket]
+            step >>= 1
+        return bucket + 1, index
+
+    # ── Updates ──
+    def load(self, rows: Iterable[Tuple[int, int]]):
+        """Replace the contents with (user_id, rating) rows, O(n)"""
+        with self._lock:
+            self._ratings = {user_id: rating for user_id, rating in rows}
+            self._buckets = {}
+            for user_id, rating in self._ratings.items():
+                self._buckets.setdefault(self._bucket(rating), []).append((-rating, -user_id))
+            self._tree = [0] * (self._size + 1)
+            for bucket, entries in self._buckets.items():
+                entries.sort()
+                self._tree[bucket] = len(entries)
+            for bucket in range(1, self._size + 1):
+                parent = bucket + (bucket & -bucket)
+                if parent <= self._size:
+                    self._tree[parent] += self._tree[bucket]
+
+    def set_rating(self, user_id: int, rating: int):
+        with self._lock:
+            self._remove(user_id)
+            bucket = self._bucket(rating)
+            bisect.insort(self._buckets.setdefault(bucket, []), (-rating, -user_id))
+            self._add(bucket, 1)
+            self._ratings[user_id] = rating
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: int):
+        rating = self._ratings.pop(user_id, None)
+        if rating is None:
+            return
+        bucket = self._bucket(rating)
+        entries = self._buckets[bucket]
+        del entries[bisect.bisect_left(entries, (-rating, -user_id))]
+        if not entries:
+            del self._buckets[bucket]
+        self._add(bucket, -1)
+
+    # ── Queries ──
+    def __len__(self) -> int:
+        return len(self._ratings)
+
+    def rating(self, user_id: int) -> Optional[int]:
+        return self._ratings.get(user_id)
+
+    def _players_before(self, key: Tuple[int, int]) -> int:
+        """Players that sort strictly before `key` in leaderboard order"""
+        rating = -key[0]
+        bucket = self._bucket(rating)
+        return (self._count_through(bucket - 1)
+                + bisect.bisect_left(self._buckets.get(bucket, ()), key))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1 + players rated strictly higher; None for unknown players"""
+        with self._lock:
+            rating = self._ratings.get(user_id)
+            if rating is None:
+                return None
+            return self._players_before((-rating, float('-inf'))) + 1
+
+    def position(self, user_id: int) -> Optional[int]:
+        """1-based place in leaderboard order; None for unknown players"""
+        with self._lock:
+            rating = self._ratings.get(user_id)
+            if rating is None:
+                return None
+            return self._players_before((-rating, -user_id)) + 1
+
+    def page(self, start: int, count: int) -> List[Tuple[int, int, int]]:
+        """
+        Up to `count` players from 0-based position `start`, as
+        (position, user_id, rating).  O((1 + buckets touched) log n).
+        """
+        with self._lock:
+            return self._page(start, count)
+
+    def _page(self, start: int, count: int) -> List[Tuple[int, int, int]]:
+        rows = []
+        index = max(start, 0)
+        while len(rows) < count and index < len(self._ratings):
+            bucket, offset = self._find(index)
+            for negative_rating, negative_user_id in self._buckets[bucket][offset:offset + count - len(rows)]:
+                index += 1
+                rows.append((index, -negative_user_id, -negative_rating))
+        return rows
+
+    def top(self, count: int) -> List[Tuple[int, int, int]]:
+        return self.page(0, count)
+
+    def after(self, rating: int, user_id: int, count: int) -> List[Tuple[int, int, int]]:
+        """Keyset page: the `count` players following (rating, user_id)"""
+        with self._lock:
+            start = self._players_before((-rating, -user_id))
+            if self._ratings.get(user_id) == rating:
+                start += 1
+            return self._page(start, count)
+
+
+class WindowedLeaderboard:
+    """
+    Rating gained over the last `days` UTC days, today included, ranked in
+    a Leaderboard.  Built from pvp_daily_stats by `load_window(first_day)`,
+    which returns (user_id, rating_change, wins, losses) per player active
+    since first_day, and kept current by record() as battles settle.  The
+    window is rebuilt only when a new day moves its first day, so the cost
+    follows the players active in the window, not the whole history.
+
+    A settlement must hold `lock` from before it commits its rollup rows
+    until it has called record(): a rebuild in between would read the rows
+    and record() would then count the result a second time.  Windows fed
+    by the same settlements can share one (reentrant) lock.
+    """
+
+    def __init__(self, days: int, load_window: Callable[[str], Iterable[Tuple[int, int, int, int]]],
+                 lock: Optional[threading.RLock] = None):
+        self.days = days
+        self._load_window = load_window
+        self._first_day = None
+        self._totals: Dict[int, List[int]] = {}     # user_id -> [rating_change, wins, losses]
+        self.board = Leaderboard()
+        self.lock = lock or threading.RLock()
+
+    def _current_first_day(self) -> str:
+        today = datetime.now(timezone.utc).date()
+        return (today - timedelta(days=self.days - 1)).isoformat()
+
+    def refresh(self):
+        """Rebuild from the rollups if the window has moved on since the last build"""
+        first_day = self._current_first_day()
+        with self.lock:
+            if first_day == self._first_day:
+                return
+            self._totals = {user_id: [rating_change, wins, losses]
+                            for user_id, rating_change, wins, losses in self._load_window(first_day)}
+            self.board.load((user_id, totals[0]) for user_id, totals in self._totals.items())
+            self._first_day = first_day
+
+    def record(self, user_id: int, rating_change: int, won: bool, lost: bool):
+        """Count a result settled today (see the class docstring for the lock)"""
+        with self.lock:
+            if self._first_day != self._current_first_day():
+                return      # stale or never built: the next refresh reads it from the rollups
+            totals = self._totals.setdefault(user_id, [0, 0, 0])
+            totals[0] += rating_change
+            totals[1] += won
+            totals[2] += lost
+            self.board.set_rating(user_id, totals[0])
+
+    def totals(self, user_id: int) -> Tuple[int, int, int]:
+        """(rating_change, wins, losses) in the window"""
+        with self.lock:
+            return tuple(self._totals.get(user_id, (0, 0, 0)))
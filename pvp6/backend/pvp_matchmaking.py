@@ -1,6 +1,15 @@
 import time
 from typing import Dict, Optional, List
 
+from species_data import find_species
+
+RARITY_MULTIPLIERS = {
+    'Common': 1.0,
+    'Rare': 1.3,
+    'Epic': 1.6,
+    'Legendary': 2.0
+}
+
 def find_match(user_id: int, rating: int, deck_power: int, cursor) -> Optional[Dict]:
     """
     Find a suitable opponent for matchmaking
@@ -118,15 +127,12 @@ def calculate_deck_power(creatures: List[Dict]) -> int:
         form = creature.get('form', 0)
         form_multiplier = 1 + (form * 0.3)
         
-        # Rarity multiplier
-        rarity = creature.get('rarity', 'Common')
-        rarity_multipliers = {
-            'Common': 1.0,
-            'Rare': 1.3,
-            'Epic': 1.6,
-            'Legendary': 2.0
-        }
-        rarity_multiplier = rarity_multipliers.get(rarity, 1.0)
+        # Rarity multiplier (species rarity when the creature carries none)
+        rarity = creature.get('rarity')
+        if not rarity:
+            species = find_species(creature.get('species_id'), creature.get('species_name'))
+            rarity = species.rarity if species else 'Common'
+        rarity_multiplier = RARITY_MULTIPLIERS.get(rarity, 1.0)
         
         # Combination level bonus
         combination_level = creature.get('combination_level', 0)
@@ -0,0 +1,196 @@
+"""
+Post-battle pipeline.
+
+settle_battle (pvp_routes.py) writes only what the result needs — ratings,
+history, rollups — plus a pvp_outbox row in the same transaction.
+PostBattleWorker drains those rows in the background:
+
+  * damage dealt and taken per player, summed from the attack events of
+    the battle log (pvp_battle_events.py), into pvp_stats.total_damage_dealt / total_damage_taken;
+  * per-creature usage into pvp_creature_usage, and the creature each
+    player has brought to the most battles into
+    pvp_stats.favorite_creature_id;
+  * the final state with its full log from pvp_battle_log (the live state
+    only keeps the latest entries), compressed, into
+    pvp_battle_history.battle_replay.
+
+Bot matches get a replay only: like their ratings, their damage does not
+count.  Jobs are applied and deleted from the outbox in one transaction
+per batch of at most PVP_OUTBOX_BATCH_SIZE, so each takes effect once.  A
+failing job is retried with backoff and kept after MAX_ATTEMPTS, with its
+last_error, for inspection.
+"""
+import threading
+import time
+import json
+import traceback
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from pvp_battle_events import EVENT_ATTACK, EVENT_DEPLOY, EVENT_LEGACY, as_event
+from pvp_battle_state import compress_battle_state, decompress_battle_state
+
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 30      # doubled on every failed attempt
+
+
+def battle_summary(state: Dict) -> Dict[int, Dict]:
+    """
+    Per player id: damage dealt and taken, and a Counter of the damage
+    dealt by every creature that was deployed or attacked.
+    """
+    player_ids = (state['player1']['id'], state['player2']['id'])
+    summary = {player_id: {'damage_dealt': 0, 'damage_taken': 0, 'creatures': Counter()}
+               for player_id in player_ids}
+    for entry in state.get('battleLog') or ():
+        event = as_event(entry)
+        if event.code not in (EVENT_ATTACK, EVENT_DEPLOY, EVENT_LEGACY) or event.player not in summary:
+            continue
+        player_id = event.player
+        damage = event.amount if event.code != EVENT_DEPLOY else 0
+        if event.actor is not None:
+            summary[player_id]['creatures'][event.actor] += damage
+        if damage:
+            opponent_id = player_ids[1] if player_id == player_ids[0] else player_ids[0]
+            summary[player_id]['damage_dealt'] += damage
+            summary[opponent_id]['damage_taken'] += damage
+    return summary
+
+
+def _apply_job(cur, battle_id: int):
+    cur.execute("""
+        SELECT battle_id, battle_state, is_bot_match FROM pvp_battles
+        WHERE battle_id = ? AND status = 'completed'
+    """, (battle_id,))
+    battle = cur.fetchone()
+    if not battle:
+        return
+
+    state = decompress_battle_state(battle['battle_state'])
+    cur.execute("SELECT entry FROM pvp_battle_log WHERE battle_id = ? ORDER BY entry_id", (battle_id,))
+    archived = [json.loads(row['entry']) for row in cur.fetchall()]
+    if archived:
+        state = {**state, 'battleLog': archived}
+
+    cur.execute("UPDATE pvp_battle_history SET battle_replay = ? WHERE battle_id = ?",
+                (compress_battle_state(state), battle_id))
+    if battle['is_bot_match']:
+        return
+
+    summary = battle_summary(state)
+    for player_id, totals in summary.items():
+        cur.execute("""
+            UPDATE pvp_stats
+            SET total_damage_dealt = total_damage_dealt + ?,
+                total_damage_taken = total_damage_taken + ?
+            WHERE user_id = ?
+        """, (totals['damage_dealt'], totals['damage_taken'], player_id))
+        if not totals['creatures']:
+            continue
+        cur.executemany("""
+            INSERT INTO pvp_creature_usage (user_id, creature_id, battles, damage_dealt)
+            VALUES (?, ?, 1, ?)
+            ON CONFLICT(user_id, creature_id) DO UPDATE SET
+                battles = battles + 1,
+                damage_dealt = damage_dealt + excluded.damage_dealt
+        """, [(player_id, str(creature_id), damage)
+              for creature_id, damage in totals['creatures'].items()])
+        cur.execute("""
+            UPDATE pvp_stats
+            SET favorite_creature_id = (
+                SELECT creature_id FROM pvp_creature_usage
+                WHERE user_id = ?
+                ORDER BY battles DESC, damage_dealt DESC
+                LIMIT 1
+            )
+            WHERE user_id = ?
+        """, (player_id, player_id))
+
+
+def drain_post_battle_jobs(conn, batch_size: int) -> int:
+    """
+    Apply up to `batch_size` due jobs and remove them from the outbox, in
+    one transaction.  Returns the number of jobs taken, failed ones included.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""
+            SELECT job_id, battle_id, attempts FROM pvp_outbox
+            WHERE available_at <= ? AND attempts < ?
+            ORDER BY available_at
+            LIMIT ?
+        """, (time.time(), MAX_ATTEMPTS, batch_size))
+        jobs = cur.fetchall()
+        for job in jobs:
+            cur.execute("SAVEPOINT post_battle_job")
+            try:
+                _apply_job(cur, job['battle_id'])
+                cur.execute("DELETE FROM pvp_outbox WHERE job_id = ?", (job['job_id'],))
+                cur.execute("RELEASE post_battle_job")
+            except Exception as e:
+                print(f"Error in post-battle job for battle {job['battle_id']}: {e}")
+                traceback.print_exc()
+                cur.execute("ROLLBACK TO post_battle_job")
+                cur.execute("RELEASE post_battle_job")
+                cur.execute("""
+                    UPDATE pvp_outbox
+                    SET attempts = attempts + 1, available_at = ?, last_error = ?
+                    WHERE job_id = ?
+                """, (time.time() + RETRY_SECONDS * 2 ** job['attempts'], str(e), job['job_id']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(jobs)
+
+
+class PostBattleWorker:
+    """
+    Background thread draining pvp_outbox batch by batch.  notify() wakes it
+    as soon as a battle settles; otherwise it looks every `poll_seconds`,
+    which also picks up jobs left by a restart or another process.
+    """
+
+    def __init__(self, connect: Callable, batch_size: int, poll_seconds: float,
+                 after_batch: Optional[Callable[[], None]] = None, name: str = "pvp-post-battle"):
+        self._connect = connect
+        self._batch_size = batch_size
+        self._poll_seconds = poll_seconds
+        self._after_batch = after_batch
+        self._name = name
+        self._wake = threading.Event()
+        self._thread = None
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def drain(self) -> int:
+        """Run batches until the outbox has no due jobs; returns the jobs taken"""
+        taken = 0
+        while True:
+            conn = self._connect()
+            try:
+                batch = drain_post_battle_jobs(conn, self._batch_size)
+            finally:
+                conn.close()
+            taken += batch
+            if batch and self._after_batch:
+                self._after_batch()
+            if batch < self._batch_size:
+                return taken
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._poll_seconds)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Error draining post-battle jobs: {e}")
+                traceback.print_exc()
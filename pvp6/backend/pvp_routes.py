@@ -5,8 +5,27 @@ import time
 import traceback
 from datetime import datetime
 import random
-from pvp_battle_state import PvPBattleState, compress_battle_state, decompress_battle_state
-from config import DATABASE_PATH
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from idempotency import idempotent
+from pvp_battle_events import as_event, battle_names, format_log
+from pvp_battle_state import (PvPBattleState, compress_battle_state, create_initial_battle_state,
+                              decompress_battle_state)
+from pvp_battle_views import BATTLE_VIEWS, SPECTATOR, perspective_state, view_response
+from pvp_bots import BOT_DIFFICULTY, BOT_NAMES, bot_player, is_bot, play_bot_turn
+from pvp_matchmaking import calculate_rating_change as forfeit_rating_change
+from pvp_schema import (ACTIVE_BATTLE_FOR_USER, ACTIVE_TURN_CLOCKS, ARCHIVE_LOG_ENTRY,
+                        BATTLE_LOG_AFTER, DAILY_STATS_SINCE, MATCH_CANDIDATE,
+                        RECENT_HISTORY_FOR_USER, RECORD_DAILY_RESULT, create_pvp_schema)
+from pvp_leaderboard import Leaderboard, WindowedLeaderboard
+from pvp_post_battle import PostBattleWorker
+from pvp_turn_timer import TurnTimer
+from config import (DATABASE_PATH, PVP_BOT_WAIT_SECONDS, PVP_BOT_DECISION_SECONDS,
+                    PVP_TURN_SECONDS, PVP_MAX_MISSED_TURNS, PVP_OUTBOX_BATCH_SIZE,
+                    PVP_OUTBOX_POLL_SECONDS)
+from nft_ownership import (CREATURE_NFT_RESOURCE, TOOL_NFT_RESOURCE, SPELL_NFT_RESOURCE,
+                           owned_nfids)
 
 # Database helper functions (moved here to avoid circular import)
 def get_db_connection():
@@ -35,63 +54,8 @@ def init_pvp_tables():
     conn = get_db_connection()
     cur = conn.cursor()
     
-    # Create PvP tables if they don't exist
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS pvp_battles (
-            battle_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player1_id INTEGER NOT NULL,
-            player2_id INTEGER NOT NULL,
-            battle_state TEXT NOT NULL,
-            status TEXT DEFAULT 'active',
-            turn_count INTEGER DEFAULT 1,
-            winner_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP
-        )
-    """)
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS pvp_stats (
-            user_id INTEGER PRIMARY KEY,
-            rating INTEGER DEFAULT 1000,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            draws INTEGER DEFAULT 0,
-            win_streak INTEGER DEFAULT 0,
-            best_win_streak INTEGER DEFAULT 0,
-            total_damage_dealt INTEGER DEFAULT 0,
-            total_damage_taken INTEGER DEFAULT 0,
-            last_battle_at TIMESTAMP
-        )
-    """)
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS pvp_battle_history (
-            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            battle_id INTEGER NOT NULL,
-            player1_id INTEGER NOT NULL,
-            player2_id INTEGER NOT NULL,
-            winner_id INTEGER,
-            player1_rating_change INTEGER DEFAULT 0,
-            player2_rating_change INTEGER DEFAULT 0,
-            total_turns INTEGER DEFAULT 0,
-            battle_duration INTEGER DEFAULT 0,
-            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (battle_id) REFERENCES pvp_battles(battle_id)
-        )
-    """)
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS pvp_queue (
-            queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL UNIQUE,
-            rating INTEGER DEFAULT 1000,
-            selected_creatures TEXT NOT NULL,
-            selected_tools TEXT,
-            selected_spells TEXT,
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    # Create PvP tables and indexes if they don't exist
+    create_pvp_schema(cur)
     
     conn.commit()
     conn.close()
@@ -103,6 +67,57 @@ except Exception as e:
     print(f"Error initializing PvP tables: {e}")
     traceback.print_exc()
 
+LEADERBOARD_MAX_PER_PAGE = 100
+PVP_MAX_ACTIONS_PER_REQUEST = 20
+BATTLE_LOG_MAX_PAGE = 200
+
+# All-time ratings in rank order (pvp_leaderboard.py), kept in step with
+# every pvp_stats rating write below
+LEADERBOARD = Leaderboard()
+
+def load_leaderboard():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT user_id, rating FROM pvp_stats")
+    LEADERBOARD.load((row['user_id'], row['rating']) for row in cur.fetchall())
+    cur.close()
+    conn.close()
+
+try:
+    load_leaderboard()
+except Exception as e:
+    print(f"Error loading PvP leaderboard: {e}")
+    traceback.print_exc()
+
+def _load_daily_window(first_day):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(DAILY_STATS_SINCE, (first_day,))
+    rows = [tuple(row) for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return rows
+
+# Rating gained over the last 7 / 30 days, from the pvp_daily_stats rollups;
+# built on first use and rebuilt when the day changes.  settle_battle holds
+# WINDOW_LOCK across its commit and record(), so no rebuild counts a result twice
+WINDOW_LOCK = threading.RLock()
+WINDOW_LEADERBOARDS = {
+    'week': WindowedLeaderboard(7, _load_daily_window, WINDOW_LOCK),
+    'month': WindowedLeaderboard(30, _load_daily_window, WINDOW_LOCK),
+}
+
+def _refresh_window_leaderboards():
+    for window in WINDOW_LEADERBOARDS.values():
+        window.refresh()
+
+# Damage totals, favorite creatures and replays, off the request path
+# (pvp_post_battle.py); settle_battle queues a job per battle
+POST_BATTLE_WORKER = PostBattleWorker(get_db_connection, PVP_OUTBOX_BATCH_SIZE,
+                                      PVP_OUTBOX_POLL_SECONDS,
+                                      after_batch=_refresh_window_leaderboards)
+POST_BATTLE_WORKER.start()
+
 # Helper functions
 def get_or_create_pvp_stats(user_id):
     """Get or create PvP stats for a user"""
@@ -121,6 +136,8 @@ def get_or_create_pvp_stats(user_id):
         
         cur.execute("SELECT * FROM pvp_stats WHERE user_id = ?", (user_id,))
         stats = cur.fetchone()
+        if stats:
+            LEADERBOARD.set_rating(user_id, stats['rating'])
     
     cur.close()
     conn.close()
@@ -135,45 +152,436 @@ def calculate_rating_change(winner_rating, loser_rating):
     loser_change = -int(K * expected_win)
     return winner_change, loser_change
 
-def create_initial_battle_state(player1_data, player2_data):
-    """Create initial battle state from player data"""
-    # Initialize battle state structure
-    battle_state = {
-        "turn": 1,
-        "activePlayer": player1_data['user_id'],
-        "player1": {
-            "id": player1_data['user_id'],
-            "name": player1_data.get('name', f"Player {player1_data['user_id']}"),
-            "hand": [],
-            "field": [],
-            "deck": player1_data['selected_creatures'].copy(),
-            "energy": 10,
-            "tools": player1_data.get('selected_tools', []),
-            "spells": player1_data.get('selected_spells', [])
-        },
-        "player2": {
-            "id": player2_data['user_id'],
-            "name": player2_data.get('name', f"Player {player2_data['user_id']}"),
-            "hand": [],
-            "field": [],
-            "deck": player2_data['selected_creatures'].copy(),
-            "energy": 10,
-            "tools": player2_data.get('selected_tools', []),
-            "spells": player2_data.get('selected_spells', [])
-        },
-        "battleLog": []
+def archive_battle_log(cur, battle_id, entries):
+    """Append log entries to pvp_battle_log; the live state keeps only the last few"""
+    cur.executemany(ARCHIVE_LOG_ENTRY, [(battle_id, as_event(entry).id, json.dumps(entry))
+                                        for entry in entries])
+
+# ──────────────────────────────────────────────────────────────
+# Battle state writes
+#
+# Every write of a battle's state bumps state_version, and only applies
+# while the row still has the version that was read: of two requests that
+# read the same state only one is saved, and the other gets the fresh
+# state back (409) instead of overwriting it.  Reads take no lock.  Within
+# this process, writers of one battle also queue on battle_lock(), taken
+# before SQLite's write lock, so they wait for each other instead of
+# conflicting.  Once a write is committed, the writer drops the battle's
+# cached views (pvp_battle_views.py) with invalidate_views().
+# ──────────────────────────────────────────────────────────────
+class BattleStateConflict(Exception):
+    """The battle was changed by someone else since its state was read"""
+
+_battle_locks = weakref.WeakValueDictionary()    # battle_id -> Lock, while anyone holds it
+_battle_locks_guard = threading.Lock()
+
+def battle_lock(battle_id):
+    """The in-process lock serializing the writers of one battle"""
+    with _battle_locks_guard:
+        lock = _battle_locks.get(battle_id)
+        if lock is None:
+            lock = _battle_locks[battle_id] = threading.Lock()
+        return lock
+
+def save_battle_state(cur, battle_dict, updated_state, turn_started_at, log_entries,
+                      reset_missed_column=None):
+    """
+    Store the state of a battle that goes on, and archive its new log
+    entries, if the battle is still at the version in `battle_dict`.
+    Returns False, writing nothing, if it has moved on.
+    """
+    reset_missed = f", {reset_missed_column} = 0" if reset_missed_column else ""
+    cur.execute(f"""
+        UPDATE pvp_battles
+        SET battle_state = ?,
+            turn_count = ?,
+            turn_started_at = ?,
+            state_version = state_version + 1{reset_missed}
+        WHERE battle_id = ? AND state_version = ?
+    """, (compress_battle_state(updated_state), updated_state['turn'], turn_started_at,
+          battle_dict['battle_id'], battle_dict['state_version']))
+    if cur.rowcount == 0:
+        return False
+    archive_battle_log(cur, battle_dict['battle_id'], log_entries)
+    return True
+
+def invalidate_views(battle_dict):
+    """
+    After committing a write of the battle read as `battle_dict`: drop its
+    cached views.  Not before the commit, or a rollback would leave the
+    cache at a version the database never reached.
+    """
+    BATTLE_VIEWS.invalidate(battle_dict['battle_id'], battle_dict['state_version'] + 1)
+
+def settle_battle(conn, battle_dict, final_state, winner_id, is_forfeit=False, log_entries=()):
+    """
+    Settle a finished battle in one transaction on `conn`: claim the battle
+    row, archive the last log entries, create missing pvp_stats rows, apply
+    both Elo changes in a single UPDATE, write the history entry, today's
+    rollups and the post-battle job (pvp_post_battle.py), then commit.  Bot
+    matches are unrated and leave pvp_stats untouched; forfeits use the
+    reduced forfeit K-factor.
+    
+    Starts a BEGIN IMMEDIATE transaction unless the caller already holds
+    one.  Idempotent on battle_id: if the battle is already settled (a
+    retried request, or the turn timer got there first) nothing is written
+    and the recorded result is returned.  Raises BattleStateConflict,
+    after rolling back, if the battle is still active but no longer at the
+    state_version in `battle_dict`.
+    Returns (winner_id, winner_change, loser_change).
+    """
+    battle_id = battle_dict['battle_id']
+    player1_id, player2_id = battle_dict['player1_id'], battle_dict['player2_id']
+    loser_id = player1_id if winner_id == player2_id else player2_id
+    is_rated = not battle_dict.get('is_bot_match')
+    
+    cur = conn.cursor()
+    if not conn.in_transaction:
+        cur.execute("BEGIN IMMEDIATE")
+    try:
+        # Claim the battle; only one settlement can move it out of 'active'
+        cur.execute("""
+            UPDATE pvp_battles
+            SET status = 'completed',
+                winner_id = ?,
+                turn_count = ?,
+                completed_at = CURRENT_TIMESTAMP,
+                battle_state = ?,
+                state_version = state_version + 1
+            WHERE battle_id = ? AND status = 'active' AND state_version = ?
+        """, (winner_id, final_state['turn'], compress_battle_state(final_state), battle_id,
+              battle_dict['state_version']))
+        
+        if cur.rowcount == 0:
+            cur.execute("SELECT status FROM pvp_battles WHERE battle_id = ?", (battle_id,))
+            if cur.fetchone()['status'] == 'active':
+                raise BattleStateConflict(battle_id)
+            conn.commit()
+            cur.execute("SELECT * FROM pvp_battle_history WHERE battle_id = ?", (battle_id,))
+            history = cur.fetchone()
+            if not history:
+                return winner_id, 0, 0
+            changes = {player1_id: history['player1_rating_change'],
+                       player2_id: history['player2_rating_change']}
+            recorded_winner = history['winner_id']
+            recorded_loser = player1_id if recorded_winner == player2_id else player2_id
+            return recorded_winner, changes.get(recorded_winner, 0), changes[recorded_loser]
+        
+        archive_battle_log(cur, battle_id, log_entries)
+        
+        winner_change, loser_change = 0, 0
+        if is_rated and winner_id is not None:
+            cur.execute("INSERT OR IGNORE INTO pvp_stats (user_id) VALUES (?), (?)",
+                        (winner_id, loser_id))
+            cur.execute("SELECT user_id, rating FROM pvp_stats WHERE user_id IN (?, ?)",
+                        (winner_id, loser_id))
+            ratings = {row['user_id']: row['rating'] for row in cur.fetchall()}
+            
+            if is_forfeit:
+                winner_change = forfeit_rating_change(ratings[winner_id], ratings[loser_id], True,
+                                                      is_forfeit=True)
+                loser_change = -winner_change
+            else:
+                winner_change, loser_change = calculate_rating_change(ratings[winner_id],
+                                                                      ratings[loser_id])
+            
+            # Both players in one statement
+            cur.execute("""
+                UPDATE pvp_stats
+                SET rating = rating + CASE WHEN user_id = ? THEN ? ELSE ? END,
+                    wins = wins + (user_id = ?),
+                    losses = losses + (user_id != ?),
+                    best_win_streak = CASE WHEN user_id = ?
+                                      THEN MAX(best_win_streak, win_streak + 1)
+                                      ELSE best_win_streak END,
+                    win_streak = CASE WHEN user_id = ? THEN win_streak + 1 ELSE 0 END,
+                    last_battle_at = CURRENT_TIMESTAMP
+                WHERE user_id IN (?, ?)
+            """, (winner_id, winner_change, loser_change, winner_id, winner_id,
+                  winner_id, winner_id, winner_id, loser_id))
+            new_ratings = {winner_id: ratings[winner_id] + winner_change,
+                           loser_id: ratings[loser_id] + loser_change}
+        elif is_rated:
+            # Draw: both sides ran out of creatures together; no rating change
+            cur.execute("INSERT OR IGNORE INTO pvp_stats (user_id) VALUES (?), (?)",
+                        (player1_id, player2_id))
+            cur.execute("""
+                UPDATE pvp_stats
+                SET draws = draws + 1,
+                    last_battle_at = CURRENT_TIMESTAMP
+                WHERE user_id IN (?, ?)
+            """, (player1_id, player2_id))
+            cur.execute("SELECT user_id, rating FROM pvp_stats WHERE user_id IN (?, ?)",
+                        (player1_id, player2_id))
+            new_ratings = {row['user_id']: row['rating'] for row in cur.fetchall()}
+        else:
+            new_ratings = {}
+        
+        changes = {winner_id: winner_change, loser_id: loser_change}
+        battle_duration = int((datetime.now() - datetime.fromisoformat(battle_dict['created_at'])).total_seconds())
+        cur.execute("""
+            INSERT INTO pvp_battle_history
+            (battle_id, player1_id, player2_id, winner_id, 
+             player1_rating_change, player2_rating_change,
+             total_turns, battle_duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            battle_id, 
+            player1_id, 
+            player2_id,
+            winner_id,
+            changes.get(player1_id, 0),
+            changes.get(player2_id, 0),
+            final_state['turn'],
+            battle_duration
+        ))
+        
+        results = []
+        if is_rated:
+            # Today's rollup rows, for the week and month leaderboards
+            for player_id in (player1_id, player2_id):
+                won = winner_id is not None and player_id == winner_id
+                lost = winner_id is not None and player_id != winner_id
+                results.append((player_id, changes.get(player_id, 0), won, lost))
+            cur.executemany(RECORD_DAILY_RESULT, results)
+        
+        cur.execute("INSERT INTO pvp_outbox (battle_id) VALUES (?)", (battle_id,))
+        # A window rebuilt between the commit and record() would count the
+        # result twice (WindowedLeaderboard)
+        with WINDOW_LOCK:
+            conn.commit()
+            for result in results:
+                for window in WINDOW_LEADERBOARDS.values():
+                    window.record(*result)
+    except Exception:
+        conn.rollback()
+        raise
+    
+    invalidate_views(battle_dict)
+    TURN_TIMER.cancel(battle_id)
+    POST_BATTLE_WORKER.notify()
+    for player_id, rating in new_ratings.items():
+        LEADERBOARD.set_rating(player_id, rating)
+    
+    return winner_id, winner_change, loser_change
+
+# ──────────────────────────────────────────────────────────────
+# Bot opponents
+#
+# A player left in the queue for PVP_BOT_WAIT_SECONDS is matched with a
+# bot (pvp_bots.py).  Bot turns run on a small background executor so a
+# request never waits on the AI; the client sees them by polling the
+# battle.  One job per battle at a time.
+# ──────────────────────────────────────────────────────────────
+BOT_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pvp-bot")
+_bot_turns = {}                      # battle_id -> Future
+_bot_turns_lock = threading.Lock()
+
+def start_bot_match(cur, queue_entry):
+    """
+    Take a waiting player out of the queue and create a bot battle for them.
+    Returns the battle id, or None if the player was matched meanwhile.
+    """
+    user_id = queue_entry['user_id']
+    cur.execute("DELETE FROM pvp_queue WHERE user_id = ?", (user_id,))
+    if cur.rowcount == 0:
+        return None
+    
+    cur.execute("SELECT first_name FROM users WHERE user_id = ?", (user_id,))
+    user = cur.fetchone()
+    player_data = {
+        'user_id': user_id,
+        'name': user['first_name'] if user else f"Player {user_id}",
+        'selected_creatures': json.loads(queue_entry['selected_creatures']),
+        'selected_tools': json.loads(queue_entry['selected_tools'] or '[]'),
+        'selected_spells': json.loads(queue_entry['selected_spells'] or '[]')
     }
+    bot_data = bot_player(queue_entry['rating'], player_data['selected_creatures'],
+                          len(player_data['selected_tools']), len(player_data['selected_spells']),
+                          random.Random())
+    
+    initial_state = create_initial_battle_state(player_data, bot_data)
+    turn_started_at = time.time()
+    cur.execute("""
+        INSERT INTO pvp_battles (player1_id, player2_id, battle_state, is_bot_match, turn_started_at)
+        VALUES (?, ?, ?, 1, ?)
+    """, (user_id, bot_data['user_id'], compress_battle_state(initial_state), turn_started_at))
+    battle_id = cur.lastrowid
+    TURN_TIMER.schedule(battle_id, turn_started_at + PVP_TURN_SECONDS, turn_started_at)
+    return battle_id
+
+def _bot_turn_job(battle_id):
+    """
+    Background job: play the bot's turn in a bot battle and store the
+    result.  If the battle moved on meanwhile (the turn timed out) the turn
+    is dropped; the next poll schedules a new one if the bot is still to move.
+    """
+    try:
+        with battle_lock(battle_id):
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT * FROM pvp_battles
+                WHERE battle_id = ? AND status = 'active' AND is_bot_match = 1
+            """, (battle_id,))
+            battle = cur.fetchone()
+            if not battle:
+                conn.close()
+                return
+            
+            battle_dict = dict(battle)
+            battle_handler = PvPBattleState(decompress_battle_state(battle_dict['battle_state']))
+            if play_bot_turn(battle_handler, random.Random(), PVP_BOT_DECISION_SECONDS) is None:
+                conn.close()
+                return
+            
+            updated_state = battle_handler.get_state()
+            is_ended, winner_id = battle_handler.check_battle_end()
+            if is_ended:
+                settle_battle(conn, battle_dict, updated_state, winner_id,
+                              log_entries=battle_handler.new_log_entries)
+            else:
+                turn_started_at = time.time()
+                saved = save_battle_state(cur, battle_dict, updated_state, turn_started_at,
+                                          battle_handler.new_log_entries)
+                conn.commit()
+                if saved:
+                    invalidate_views(battle_dict)
+                    TURN_TIMER.schedule(battle_id, turn_started_at + PVP_TURN_SECONDS, turn_started_at)
+            cur.close()
+            conn.close()
+    except BattleStateConflict:
+        print(f"Battle {battle_id} changed during the bot's turn, dropping it")
+    except Exception as e:
+        print(f"Error playing bot turn in battle {battle_id}: {e}")
+        traceback.print_exc()
+    finally:
+        with _bot_turns_lock:
+            _bot_turns.pop(battle_id, None)
+
+def schedule_bot_turn(battle_id):
+    """Queue the bot's turn for a battle unless one is already running"""
+    with _bot_turns_lock:
+        if battle_id not in _bot_turns:
+            _bot_turns[battle_id] = BOT_EXECUTOR.submit(_bot_turn_job, battle_id)
+
+# ──────────────────────────────────────────────────────────────
+# Turn clock
+#
+# turn_started_at is set whenever the active player changes, and TURN_TIMER
+# (pvp_turn_timer.py) fires PVP_TURN_SECONDS later.  If the turn is still
+# the same one, the server ends it for the player; PVP_MAX_MISSED_TURNS
+# timeouts in a row forfeit the battle.  Expiry re-checks turn_started_at
+# under a write lock, so a player ending the turn at the deadline, or a
+# second process with its own timer, cannot double-apply it.
+# ──────────────────────────────────────────────────────────────
+def _expire_turn(battle_id, turn_started_at):
+    with battle_lock(battle_id):
+        _expire_turn_locked(battle_id, turn_started_at)
+
+def _expire_turn_locked(battle_id, turn_started_at):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("""
+            SELECT * FROM pvp_battles
+            WHERE battle_id = ? AND status = 'active' AND turn_started_at = ?
+        """, (battle_id, turn_started_at))
+        battle = cur.fetchone()
+        if not battle:
+            conn.rollback()
+            return
+        
+        battle_dict = dict(battle)
+        battle_handler = PvPBattleState(decompress_battle_state(battle_dict['battle_state']))
+        player_id = battle_handler.active_player_id
+        is_player1 = player_id == battle_dict['player1_id']
+        missed_column = 'player1_missed_turns' if is_player1 else 'player2_missed_turns'
+        missed = (battle_dict[missed_column] or 0) + 1
+        cur.execute(f"UPDATE pvp_battles SET {missed_column} = ? WHERE battle_id = ?",
+                    (missed, battle_id))
+        
+        if missed >= PVP_MAX_MISSED_TURNS:
+            winner_id = battle_dict['player2_id'] if is_player1 else battle_dict['player1_id']
+            print(f"Battle {battle_id}: player {player_id} missed {missed} turns, forfeiting")
+            settle_battle(conn, battle_dict, battle_handler.get_state(), winner_id, is_forfeit=True,
+                          log_entries=battle_handler.new_log_entries)
+            return
+        
+        battle_handler.process_action(player_id, {"type": "endTurn"})
+        updated_state = battle_handler.get_state()
+        next_started_at = time.time()
+        saved = save_battle_state(cur, battle_dict, updated_state, next_started_at,
+                                  battle_handler.new_log_entries)
+        conn.commit()
+        if saved:
+            invalidate_views(battle_dict)
+        
+        TURN_TIMER.schedule(battle_id, next_started_at + PVP_TURN_SECONDS, next_started_at)
+        if battle_dict.get('is_bot_match') and is_bot(updated_state['activePlayer']):
+            schedule_bot_turn(battle_id)
+    finally:
+        cur.close()
+        conn.close()
+
+TURN_TIMER = TurnTimer(_expire_turn)
+
+def resume_turn_clocks():
+    """Schedule the running turn of every active battle (on startup)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
     
-    # Draw initial hands (3 cards each)
-    for _ in range(3):
-        if battle_state["player1"]["deck"]:
-            battle_state["player1"]["hand"].append(battle_state["player1"]["deck"].pop(0))
-        if battle_state["player2"]["deck"]:
-            battle_state["player2"]["hand"].append(battle_state["player2"]["deck"].pop(0))
+    # Battles from before the turn clock start theirs now
+    cur.execute("""
+        UPDATE pvp_battles SET turn_started_at = ?
+        WHERE status = 'active' AND turn_started_at IS NULL
+    """, (time.time(),))
+    conn.commit()
     
-    return battle_state
+    cur.execute(ACTIVE_TURN_CLOCKS)
+    for row in cur.fetchall():
+        TURN_TIMER.schedule(row['battle_id'], row['turn_started_at'] + PVP_TURN_SECONDS,
+                            row['turn_started_at'])
+    cur.close()
+    conn.close()
+    TURN_TIMER.start()
+
+try:
+    resume_turn_clocks()
+except Exception as e:
+    print(f"Error resuming PvP turn clocks: {e}")
+    traceback.print_exc()
 
 # Routes
+def find_unowned_selections(user_id, selections):
+    """
+    Check a deck against the local NFT ownership index.
+    `selections` maps resource address -> list of selected NFT dicts.
+    Returns the IDs the user does not own; an empty list when everything is
+    owned or the user's account cannot be checked.
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT radix_account_address FROM users WHERE user_id = ?",
+                       (user_id,)).fetchone()
+    conn.close()
+    if not row or not row['radix_account_address']:
+        return []
+
+    unowned = []
+    for resource_address, items in selections.items():
+        if not items:
+            continue
+        owned = owned_nfids(row['radix_account_address'], resource_address)
+        if owned is None:
+            return []           # account never indexed: nothing to check against
+        owned = set(owned)
+        for item in items:
+            nfid = item.get('id') if isinstance(item, dict) else item
+            if nfid not in owned:
+                unowned.append(nfid)
+    return unowned
+
 @pvp_bp.route('/queue', methods=['POST'])
 def join_queue():
     """Join PvP matchmaking queue"""
@@ -192,6 +600,16 @@ def join_queue():
         if not selected_creatures:
             return jsonify({"error": "No creatures selected"}), 400
         
+        # Every selected NFT must be in the player's wallet
+        unowned = find_unowned_selections(user_id, {
+            CREATURE_NFT_RESOURCE: selected_creatures,
+            TOOL_NFT_RESOURCE: selected_tools,
+            SPELL_NFT_RESOURCE: selected_spells
+        })
+        if unowned:
+            return jsonify({"error": "Selected NFTs are not owned by your account",
+                            "unowned": unowned}), 400
+        
         # Get user stats
         stats = get_or_create_pvp_stats(user_id)
         rating = stats['rating']
@@ -203,13 +621,7 @@ def join_queue():
         cur.execute("DELETE FROM pvp_queue WHERE user_id = ?", (user_id,))
         
         # Check if there's a suitable opponent in queue
-        cur.execute("""
-            SELECT * FROM pvp_queue 
-            WHERE user_id != ? 
-            AND ABS(rating - ?) <= 200
-            ORDER BY joined_at ASC
-            LIMIT 1
-        """, (user_id, rating))
+        cur.execute(MATCH_CANDIDATE, (rating - 200, rating + 200, user_id))
         
         opponent = cur.fetchone()
         
@@ -241,14 +653,16 @@ def join_queue():
             # Create battle state
             initial_state = create_initial_battle_state(player_data, opponent_data)
             compressed_state = compress_battle_state(initial_state)
+            turn_started_at = time.time()
             
             # Insert battle record
             cur.execute("""
-                INSERT INTO pvp_battles (player1_id, player2_id, battle_state)
-                VALUES (?, ?, ?)
-            """, (user_id, opponent_data['user_id'], compressed_state))
+                INSERT INTO pvp_battles (player1_id, player2_id, battle_state, turn_started_at)
+                VALUES (?, ?, ?, ?)
+            """, (user_id, opponent_data['user_id'], compressed_state, turn_started_at))
             
             battle_id = cur.lastrowid
+            TURN_TIMER.schedule(battle_id, turn_started_at + PVP_TURN_SECONDS, turn_started_at)
             
             # Remove opponent from queue
             cur.execute("DELETE FROM pvp_queue WHERE user_id = ?", (opponent_data['user_id'],))
@@ -310,13 +724,7 @@ def queue_status():
         
         if not queue_entry:
             # Not in queue, check if in active battle
-            cur.execute("""
-                SELECT battle_id FROM pvp_battles 
-                WHERE (player1_id = ? OR player2_id = ?)
-                AND status = 'active'
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (user_id, user_id))
+            cur.execute(ACTIVE_BATTLE_FOR_USER, (user_id, user_id))
             
             battle = cur.fetchone()
             
@@ -339,6 +747,24 @@ def queue_status():
         # Still in queue
         wait_time = int((datetime.now() - datetime.fromisoformat(queue_entry['joined_at'])).total_seconds())
         
+        # Nobody came: play a bot instead
+        if wait_time >= PVP_BOT_WAIT_SECONDS:
+            battle_id = start_bot_match(cur, queue_entry)
+            conn.commit()
+            cur.close()
+            conn.close()
+            if battle_id:
+                return jsonify({
+                    "inQueue": False,
+                    "matched": True,
+                    "battleId": battle_id,
+                    "opponentIsBot": True
+                })
+            return jsonify({
+                "inQueue": False,
+                "matched": False
+            })
+        
         cur.close()
         conn.close()
         
@@ -379,228 +805,399 @@ def cancel_queue():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def turn_deadline(battle_dict):
+    """When the running turn times out (epoch seconds), None unless active"""
+    if battle_dict['status'] == 'active' and battle_dict['turn_started_at']:
+        return battle_dict['turn_started_at'] + PVP_TURN_SECONDS
+    return None
+
+def player_name(cur, player_state):
+    """Display name of a battle's player: a bot's is in the state"""
+    player_id = player_state['id']
+    if is_bot(player_id):
+        return player_state.get('name', "Bot")
+    cur.execute("SELECT first_name FROM users WHERE user_id = ?", (player_id,))
+    user = cur.fetchone()
+    return user['first_name'] if user else f"Player {player_id}"
+
+def battle_view(cur, battle_dict, user_id):
+    """
+    A battle as one of its players sees it (GET /battle/<id> and
+    conflicts): the opponent's hidden cards redacted, and legalActions
+    (PvPBattleState.legal_actions) only on the player's turn.  The same
+    for every request at a state version, so GET can serve it encoded
+    from BATTLE_VIEWS: it carries the turn deadline (epoch seconds)
+    rather than the time remaining.
+    """
+    battle_state = decompress_battle_state(battle_dict['battle_state'])
+    
+    # Determine if player is player1 or player2
+    is_player1 = battle_dict['player1_id'] == user_id
+    
+    # Legal actions are derived, not stored: worked out for the player on turn
+    legal_actions = None
+    if battle_dict['status'] == 'active' and battle_state['activePlayer'] == user_id:
+        legal_actions = PvPBattleState(battle_state).legal_actions(user_id)
+    
+    # Get opponent info
+    opponent_id = battle_dict['player2_id'] if is_player1 else battle_dict['player1_id']
+    opponent_name = player_name(cur, battle_state['player2' if is_player1 else 'player1'])
+    
+    return {
+        "status": battle_dict['status'],
+        "battleState": perspective_state(battle_state, 'player1' if is_player1 else 'player2',
+                                         legal_actions),
+        "stateVersion": battle_dict['state_version'],
+        "isPlayer1": is_player1,
+        "yourTurn": battle_state['activePlayer'] == user_id,
+        "turnNumber": battle_state['turn'],
+        "opponentInfo": {
+            "id": opponent_id,
+            "name": opponent_name,
+            "isBot": bool(battle_dict.get('is_bot_match'))
+        },
+        "turnDeadline": turn_deadline(battle_dict)
+    }
+
+def spectator_view(cur, battle_dict):
+    """
+    A battle as anyone may watch it: both players' hidden cards redacted.
+    Encoded once per state version and shared by every spectator.
+    """
+    battle_state = decompress_battle_state(battle_dict['battle_state'])
+    
+    return {
+        "status": battle_dict['status'],
+        "winnerId": battle_dict['winner_id'],
+        "battleState": perspective_state(battle_state),
+        "stateVersion": battle_dict['state_version'],
+        "turnNumber": battle_state['turn'],
+        "players": {
+            side: {"id": battle_state[side]['id'], "name": player_name(cur, battle_state[side])}
+            for side in ('player1', 'player2')
+        },
+        "isBotMatch": bool(battle_dict.get('is_bot_match')),
+        "turnDeadline": turn_deadline(battle_dict)
+    }
+
+def battle_conflict(cur, battle_id, user_id):
+    """409 body and status for actions on an outdated state, with the current one"""
+    cur.execute("SELECT * FROM pvp_battles WHERE battle_id = ?", (battle_id,))
+    view = battle_view(cur, dict(cur.fetchone()), user_id)
+    view.update(error="Battle state has changed", conflict=True)
+    return view, 409
+
 @pvp_bp.route('/battle/<int:battle_id>', methods=['GET'])
 def get_battle_state(battle_id):
-    """Get current battle state"""
+    """
+    Get current battle state (see battle_view).  Served from BATTLE_VIEWS:
+    polls read the database once per state version, and a poll whose
+    If-None-Match has the current ETag gets a 304.
+    """
     try:
         if 'telegram_id' not in session:
             return jsonify({"error": "Not logged in"}), 401
         
         user_id = int(session['telegram_id'])
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Get battle
-        cur.execute("""
-            SELECT * FROM pvp_battles
-            WHERE battle_id = ?
-            AND (player1_id = ? OR player2_id = ?)
-        """, (battle_id, user_id, user_id))
-        
-        battle = cur.fetchone()
+        def build():
+            conn = get_db_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    SELECT * FROM pvp_battles
+                    WHERE battle_id = ?
+                    AND (player1_id = ? OR player2_id = ?)
+                """, (battle_id, user_id, user_id))
+                battle = cur.fetchone()
+                if not battle:
+                    return None
+                battle_dict = dict(battle)
+                view = battle_view(cur, battle_dict, user_id)
+                bot_to_move = (battle_dict['status'] == 'active' and bool(battle_dict.get('is_bot_match'))
+                               and is_bot(view['battleState']['activePlayer']))
+                return battle_dict['state_version'], view, {"botToMove": bot_to_move}
+            finally:
+                cur.close()
+                conn.close()
         
-        if not battle:
-            cur.close()
-            conn.close()
+        # Players' views are cached per user id, so only the two players have one
+        view = BATTLE_VIEWS.view(battle_id, user_id, build)
+        if view is None:
             return jsonify({"error": "Battle not found"}), 404
         
-        battle_dict = dict(battle)
-        
-        # Decompress battle state
-        battle_state = decompress_battle_state(battle_dict['battle_state'])
-        
-        # Determine if player is player1 or player2
-        is_player1 = battle_dict['player1_id'] == user_id
+        # A bot turn that was never played (e.g. after a restart) is picked up here
+        if view.meta['botToMove']:
+            schedule_bot_turn(battle_id)
         
-        # Get opponent info
-        opponent_id = battle_dict['player2_id'] if is_player1 else battle_dict['player1_id']
-        cur.execute("SELECT first_name FROM users WHERE user_id = ?", (opponent_id,))
-        opponent = cur.fetchone()
-        opponent_name = opponent['first_name'] if opponent else f"Player {opponent_id}"
+        return view_response(view)
         
-        # Calculate turn time remaining (60 seconds per turn)
-        if battle_dict['status'] == 'active':
-            # Simple timer - in production you'd track actual turn start time
-            time_remaining = 60000  # 60 seconds in milliseconds
-        else:
-            time_remaining = 0
+    except Exception as e:
+        print(f"Error in get_battle_state: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@pvp_bp.route('/battle/<int:battle_id>/spectate', methods=['GET'])
+def spectate_battle(battle_id):
+    """
+    Watch a battle: the spectator view (see spectator_view), polled like
+    GET /battle/<id>, with the same ETags.  Served from BATTLE_VIEWS, so
+    the database is read once per state version, not once per spectator.
+    """
+    try:
+        if 'telegram_id' not in session:
+            return jsonify({"error": "Not logged in"}), 401
         
-        cur.close()
-        conn.close()
+        def build():
+            conn = get_db_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT * FROM pvp_battles WHERE battle_id = ?", (battle_id,))
+                battle = cur.fetchone()
+                if not battle:
+                    return None
+                battle_dict = dict(battle)
+                return battle_dict['state_version'], spectator_view(cur, battle_dict), None
+            finally:
+                cur.close()
+                conn.close()
         
-        return jsonify({
-            "status": battle_dict['status'],
-            "battleState": battle_state,
-            "isPlayer1": is_player1,
-            "yourTurn": battle_state['activePlayer'] == user_id,
-            "turnNumber": battle_state['turn'],
-            "opponentInfo": {
-                "id": opponent_id,
-                "name": opponent_name
-            },
-            "timeRemaining": time_remaining
-        })
+        view = BATTLE_VIEWS.view(battle_id, SPECTATOR, build)
+        if view is None:
+            return jsonify({"error": "Battle not found"}), 404
+        return view_response(view)
         
     except Exception as e:
-        print(f"Error in get_battle_state: {e}")
+        print(f"Error in spectate_battle: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@pvp_bp.route('/battle/<int:battle_id>/action', methods=['POST'])
-def submit_action(battle_id):
-    """Submit battle action"""
+@pvp_bp.route('/battle/<int:battle_id>/log', methods=['GET'])
+def get_battle_log(battle_id):
+    """
+    Page through a battle's full log, oldest first: entries with id above
+    `after` (default 0), at most `limit`.  The battle state only carries
+    the latest entries.  Entries are event arrays (pvp_battle_events.py);
+    format=text renders them as {id, turn, message} instead.
+    """
     try:
         if 'telegram_id' not in session:
             return jsonify({"error": "Not logged in"}), 401
         
         user_id = int(session['telegram_id'])
-        data = request.json or {}
-        action = data.get('action', {})
+        try:
+            after = max(0, int(request.args.get('after', 0)))
+            limit = min(max(1, int(request.args.get('limit', 50))), BATTLE_LOG_MAX_PAGE)
+        except ValueError:
+            return jsonify({"error": "Invalid after or limit"}), 400
         
         conn = get_db_connection()
         cur = conn.cursor()
         
-        # Get battle
         cur.execute("""
-            SELECT * FROM pvp_battles
+            SELECT battle_id, battle_state FROM pvp_battles
             WHERE battle_id = ?
             AND (player1_id = ? OR player2_id = ?)
-            AND status = 'active'
         """, (battle_id, user_id, user_id))
-        
         battle = cur.fetchone()
         
         if not battle:
             cur.close()
             conn.close()
-            return jsonify({"error": "Battle not found or not active"}), 404
-        
-        battle_dict = dict(battle)
-        
-        # Decompress battle state
-        battle_state = decompress_battle_state(battle_dict['battle_state'])
-        
-        # Create battle state handler
-        battle_handler = PvPBattleState(battle_state)
-        
-        # Process action
-        result = battle_handler.process_action(user_id, action)
+            return jsonify({"error": "Battle not found"}), 404
         
-        if not result['success']:
-            cur.close()
-            conn.close()
-            return jsonify({"error": result['error']}), 400
+        state = decompress_battle_state(battle['battle_state'])
+        cur.execute(BATTLE_LOG_AFTER, (battle_id, after, limit + 1))
+        entries = [json.loads(row['entry']) for row in cur.fetchall()]
+        if not entries and after == 0:
+            # Not saved since the log moved to pvp_battle_log
+            entries = (state.get('battleLog') or [])[:limit + 1]
         
-        # Get updated state
-        updated_state = battle_handler.get_state()
+        cur.close()
+        conn.close()
         
-        # Check if battle ended
-        is_ended, winner_id = battle_handler.check_battle_end()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        next_after = as_event(entries[-1]).id if entries else after
+        if request.args.get('format') == 'text':
+            entries = list(format_log(entries, battle_names(state)))
+        return jsonify({
+            "entries": entries,
+            "hasMore": has_more,
+            "nextAfter": next_after
+        })
         
-        if is_ended:
-            # Battle ended
-            loser_id = battle_dict['player1_id'] if winner_id == battle_dict['player2_id'] else battle_dict['player2_id']
+    except Exception as e:
+        print(f"Error in get_battle_log: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def apply_battle_actions(battle_id, user_id, actions, expected_version=None):
+    """
+    Apply a player's actions, in order, to one loaded battle state and
+    store it once.  Stops at the first action that fails or ends the
+    battle; what was applied before a failure is kept.  Refuses with 409
+    if `expected_version` is given and the battle is no longer at it, or
+    if the battle moved on while the actions were applied.
+    Returns (response body, HTTP status).
+    """
+    with battle_lock(battle_id):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            # Get battle
+            cur.execute("""
+                SELECT * FROM pvp_battles
+                WHERE battle_id = ?
+                AND (player1_id = ? OR player2_id = ?)
+                AND status = 'active'
+            """, (battle_id, user_id, user_id))
             
-            # Get current ratings
-            winner_stats = get_or_create_pvp_stats(winner_id)
-            loser_stats = get_or_create_pvp_stats(loser_id)
+            battle = cur.fetchone()
             
-            # Calculate rating changes
-            winner_change, loser_change = calculate_rating_change(
-                winner_stats['rating'], 
-                loser_stats['rating']
-            )
+            if not battle:
+                return {"error": "Battle not found or not active"}, 404
             
-            # Update battle record
-            cur.execute("""
-                UPDATE pvp_battles
-                SET status = 'completed',
-                    winner_id = ?,
-                    turn_count = ?,
-                    completed_at = CURRENT_TIMESTAMP,
-                    battle_state = ?
-                WHERE battle_id = ?
-            """, (winner_id, updated_state['turn'], compress_battle_state(updated_state), battle_id))
+            battle_dict = dict(battle)
             
-            # Update stats
-            cur.execute("""
-                UPDATE pvp_stats
-                SET rating = rating + ?,
-                    wins = wins + 1,
-                    win_streak = win_streak + 1,
-                    best_win_streak = MAX(best_win_streak, win_streak + 1),
-                    last_battle_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (winner_change, winner_id))
+            if expected_version is not None and expected_version != battle_dict['state_version']:
+                return battle_conflict(cur, battle_id, user_id)
             
-            cur.execute("""
-                UPDATE pvp_stats
-                SET rating = rating + ?,
-                    losses = losses + 1,
-                    win_streak = 0,
-                    last_battle_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (loser_change, loser_id))
+            # Decompress battle state
+            battle_state = decompress_battle_state(battle_dict['battle_state'])
             
-            # Add to battle history
-            battle_duration = int((datetime.now() - datetime.fromisoformat(battle_dict['created_at'])).total_seconds())
+            # Create battle state handler
+            previous_player = battle_state['activePlayer']
+            side = 'player1' if battle_dict['player1_id'] == user_id else 'player2'
+            battle_handler = PvPBattleState(battle_state)
             
-            cur.execute("""
-                INSERT INTO pvp_battle_history
-                (battle_id, player1_id, player2_id, winner_id, 
-                 player1_rating_change, player2_rating_change,
-                 total_turns, battle_duration)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                battle_id, 
-                battle_dict['player1_id'], 
-                battle_dict['player2_id'],
-                winner_id,
-                winner_change if winner_id == battle_dict['player1_id'] else loser_change,
-                loser_change if winner_id == battle_dict['player1_id'] else winner_change,
-                updated_state['turn'],
-                battle_duration
-            ))
+            # Process actions
+            results = []
+            is_ended, winner_id = False, None
+            for action in actions:
+                result = battle_handler.process_action(user_id, action)
+                results.append(result)
+                if not result['success']:
+                    break
+                is_ended, winner_id = battle_handler.check_battle_end()
+                if is_ended:
+                    break
             
-            conn.commit()
-            cur.close()
-            conn.close()
+            if not results[0]['success']:
+                return {"error": results[0]['error'], "results": results}, 400
             
-            return jsonify({
-                "status": "completed",
-                "isWinner": winner_id == user_id,
-                "ratingChange": winner_change if winner_id == user_id else loser_change,
-                "updatedState": updated_state,
-                "yourTurn": False
-            })
-        
-        else:
-            # Battle continues
-            compressed_state = compress_battle_state(updated_state)
+            # Get updated state
+            updated_state = battle_handler.get_state()
+            legal_actions = battle_handler.legal_actions(user_id)
             
-            cur.execute("""
-                UPDATE pvp_battles
-                SET battle_state = ?,
-                    turn_count = ?
-                WHERE battle_id = ?
-            """, (compressed_state, updated_state['turn'], battle_id))
+            if is_ended:
+                # Battle ended
+                try:
+                    winner_id, winner_change, loser_change = settle_battle(
+                        conn, battle_dict, updated_state, winner_id,
+                        log_entries=battle_handler.new_log_entries)
+                except BattleStateConflict:
+                    return battle_conflict(cur, battle_id, user_id)
+                
+                return {
+                    "status": "completed",
+                    "isWinner": winner_id == user_id,
+                    "ratingChange": winner_change if winner_id == user_id else loser_change,
+                    "updatedState": perspective_state(updated_state, side, legal_actions),
+                    "isPlayer1": side == 'player1',
+                    "results": results,
+                    "yourTurn": False
+                }, 200
+            
+            # Acting clears the player's missed turns; a new turn restarts the clock
+            turn_started_at = battle_dict['turn_started_at']
+            if updated_state['activePlayer'] != previous_player:
+                turn_started_at = time.time()
+            missed_column = f'{side}_missed_turns'
+            
+            if not save_battle_state(cur, battle_dict, updated_state, turn_started_at,
+                                     battle_handler.new_log_entries, reset_missed_column=missed_column):
+                conn.rollback()
+                return battle_conflict(cur, battle_id, user_id)
             
             conn.commit()
+            invalidate_views(battle_dict)
+        finally:
             cur.close()
             conn.close()
-            
-            return jsonify({
-                "status": "ok",
-                "updatedState": updated_state,
-                "yourTurn": updated_state['activePlayer'] == user_id
-            })
+    
+    if turn_started_at != battle_dict['turn_started_at']:
+        TURN_TIMER.schedule(battle_id, turn_started_at + PVP_TURN_SECONDS, turn_started_at)
+    
+    if battle_dict.get('is_bot_match') and is_bot(updated_state['activePlayer']):
+        schedule_bot_turn(battle_id)
+    
+    return {
+        "status": "ok",
+        "updatedState": perspective_state(updated_state, side, legal_actions),
+        "stateVersion": battle_dict['state_version'] + 1,
+        "isPlayer1": side == 'player1',
+        "results": results,
+        "yourTurn": updated_state['activePlayer'] == user_id,
+        "turnDeadline": turn_started_at + PVP_TURN_SECONDS
+    }, 200
+
+@pvp_bp.route('/battle/<int:battle_id>/action', methods=['POST'])
+@idempotent
+def submit_action(battle_id):
+    """
+    Submit battle action.  The client may send the stateVersion it acted on;
+    if the battle has moved on since (a double click, or the turn timed
+    out) the action is refused with 409 and the current state.
+    """
+    try:
+        if 'telegram_id' not in session:
+            return jsonify({"error": "Not logged in"}), 401
+        
+        user_id = int(session['telegram_id'])
+        data = request.json or {}
+        
+        body, status = apply_battle_actions(battle_id, user_id, [data.get('action', {})],
+                                            data.get('stateVersion'))
+        return jsonify(body), status
         
     except Exception as e:
         print(f"Error in submit_action: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@pvp_bp.route('/battle/<int:battle_id>/actions', methods=['POST'])
+@idempotent
+def submit_actions(battle_id):
+    """
+    Submit several actions at once, e.g. a whole turn ending in endTurn:
+    {"actions": [...], "stateVersion": n}.  They are applied in order and
+    stored once; `results` has one entry per action tried, and the first
+    failure ends the list (the actions before it stay applied).
+    """
+    try:
+        if 'telegram_id' not in session:
+            return jsonify({"error": "Not logged in"}), 401
+        
+        user_id = int(session['telegram_id'])
+        data = request.json or {}
+        actions = data.get('actions')
+        
+        if not isinstance(actions, list) or not actions:
+            return jsonify({"error": "actions must be a non-empty list"}), 400
+        if len(actions) > PVP_MAX_ACTIONS_PER_REQUEST:
+            return jsonify({"error": f"At most {PVP_MAX_ACTIONS_PER_REQUEST} actions per request"}), 400
+        if not all(isinstance(action, dict) for action in actions):
+            return jsonify({"error": "Every action must be an object"}), 400
+        
+        body, status = apply_battle_actions(battle_id, user_id, actions, data.get('stateVersion'))
+        return jsonify(body), status
+        
+    except Exception as e:
+        print(f"Error in submit_actions: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @pvp_bp.route('/stats', methods=['GET'])
 def get_stats():
     """Get player's PvP statistics"""
@@ -617,32 +1214,21 @@ def get_stats():
         conn = get_db_connection()
         cur = conn.cursor()
         
-        cur.execute("""
-            SELECT h.*, u1.first_name as player1_name, u2.first_name as player2_name
-            FROM pvp_battle_history h
-            JOIN users u1 ON h.player1_id = u1.user_id
-            JOIN users u2 ON h.player2_id = u2.user_id
-            WHERE h.player1_id = ? OR h.player2_id = ?
-            ORDER BY h.completed_at DESC
-            LIMIT 10
-        """, (user_id, user_id))
+        cur.execute(RECENT_HISTORY_FOR_USER, (user_id, user_id))
         
         recent_battles = []
         for row in cur.fetchall():
             battle = dict(row)
+            del battle['battle_replay']     # served by the replay, not with the stats
             battle['isPlayer1'] = battle['player1_id'] == user_id
+            for side in ('player1', 'player2'):
+                if is_bot(battle[f'{side}_id']):
+                    battle[f'{side}_name'] = BOT_NAMES[BOT_DIFFICULTY[battle[f'{side}_id']]]
             battle['won'] = battle['winner_id'] == user_id
             recent_battles.append(battle)
         
         # Get player rank
-        cur.execute("""
-            SELECT COUNT(*) + 1 as rank
-            FROM pvp_stats
-            WHERE rating > (SELECT rating FROM pvp_stats WHERE user_id = ?)
-        """, (user_id,))
-        
-        rank_row = cur.fetchone()
-        rank = rank_row['rank'] if rank_row else 0
+        rank = LEADERBOARD.rank(user_id) or 0
         
         cur.close()
         conn.close()
@@ -660,49 +1246,61 @@ def get_stats():
 
 @pvp_bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get PvP leaderboard"""
+    """
+    Get PvP leaderboard: lifetime rating, or with filter=week|month the
+    rating gained in that window.  Pages are addressed by number or, for
+    keyset pagination, by the previous page's nextCursor ("score:user_id").
+    """
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('perPage', 20))
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max(1, int(request.args.get('perPage', 20))), LEADERBOARD_MAX_PER_PAGE)
         time_filter = request.args.get('filter', 'all')
+        cursor = request.args.get('after')
+        if cursor:
+            try:
+                cursor_score, cursor_user_id = (int(part) for part in cursor.split(':'))
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
         
         conn = get_db_connection()
         cur = conn.cursor()
         
-        # Base query
-        query = """
-            SELECT s.*, u.first_name,
-                   ROW_NUMBER() OVER (ORDER BY s.rating DESC) as rank
-            FROM pvp_stats s
-            JOIN users u ON s.user_id = u.user_id
-        """
-        
-        # Add time filter if needed
-        if time_filter == 'week':
-            query += " WHERE s.last_battle_at >= datetime('now', '-7 days')"
-        elif time_filter == 'month':
-            query += " WHERE s.last_battle_at >= datetime('now', '-30 days')"
-        
-        # Add pagination
-        query += f" ORDER BY s.rating DESC LIMIT {per_page} OFFSET {(page - 1) * per_page}"
+        window = WINDOW_LEADERBOARDS.get(time_filter)
+        if window:
+            # Ranked by rating gained in the window, not lifetime rating
+            window.refresh()
+            board = window.board
+        else:
+            board = LEADERBOARD
         
-        cur.execute(query)
+        if cursor:
+            ranked = board.after(cursor_score, cursor_user_id, per_page)
+        else:
+            ranked = board.page((page - 1) * per_page, per_page)
+        total = len(board)
         
         players = []
-        for row in cur.fetchall():
-            player = dict(row)
-            players.append(player)
-        
-        # Get total count
-        count_query = "SELECT COUNT(*) as total FROM pvp_stats"
-        if time_filter == 'week':
-            count_query += " WHERE last_battle_at >= datetime('now', '-7 days')"
-        elif time_filter == 'month':
-            count_query += " WHERE last_battle_at >= datetime('now', '-30 days')"
-        
-        cur.execute(count_query)
-        total = cur.fetchone()['total']
+        if ranked:
+            cur.execute(f"""
+                SELECT s.*, u.first_name
+                FROM pvp_stats s
+                LEFT JOIN users u ON s.user_id = u.user_id
+                WHERE s.user_id IN ({','.join('?' * len(ranked))})
+            """, [user_id for _, user_id, _ in ranked])
+            rows = {row['user_id']: dict(row) for row in cur.fetchall()}
+            for position, user_id, _ in ranked:
+                if user_id in rows:
+                    player = rows[user_id]
+                    player['rank'] = position
+                    if window:
+                        player['ratingChange'], player['wins'], player['losses'] = window.totals(user_id)
+                    players.append(player)
+        
         total_pages = (total + per_page - 1) // per_page
+        next_cursor = None
+        if len(ranked) == per_page:
+            _, last_user_id, last_score = ranked[-1]
+            next_cursor = f"{last_score}:{last_user_id}"
         
         cur.close()
         conn.close()
@@ -711,7 +1309,8 @@ def get_leaderboard():
             "players": players,
             "totalPages": total_pages,
             "currentPage": page,
-            "totalPlayers": total
+            "totalPlayers": total,
+            "nextCursor": next_cursor
         })
         
     except Exception as e:
@@ -0,0 +1,300 @@
+"""
+PvP tables, their indexes and the SQL of the hot PvP queries.
+
+init_pvp_tables (pvp_routes.py) applies create_pvp_schema at startup.  The
+hot queries live here next to the indexes they are written for, and
+check_pvp_query_plans.py verifies with EXPLAIN QUERY PLAN that every one of
+them is answered from an index.
+
+Battles and history belong to two players, and SQLite cannot use one index
+for "player1_id = ? OR player2_id = ?" while also reading rows in time
+order.  The per-player queries are therefore written as a UNION ALL of two
+indexed lookups, one per column, merged and limited at the end.
+"""
+
+PVP_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS pvp_battles (
+        battle_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player1_id INTEGER NOT NULL,
+        player2_id INTEGER NOT NULL,
+        battle_state BLOB NOT NULL,
+        status TEXT DEFAULT 'active',
+        turn_count INTEGER DEFAULT 1,
+        winner_id INTEGER,
+        is_bot_match INTEGER DEFAULT 0,
+        turn_started_at REAL,
+        player1_missed_turns INTEGER DEFAULT 0,
+        player2_missed_turns INTEGER DEFAULT 0,
+        state_version INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        completed_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pvp_stats (
+        user_id INTEGER PRIMARY KEY,
+        rating INTEGER DEFAULT 1000,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        draws INTEGER DEFAULT 0,
+        win_streak INTEGER DEFAULT 0,
+        best_win_streak INTEGER DEFAULT 0,
+        total_damage_dealt INTEGER DEFAULT 0,
+        total_damage_taken INTEGER DEFAULT 0,
+        last_battle_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pvp_battle_history (
+        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        battle_id INTEGER NOT NULL,
+        player1_id INTEGER NOT NULL,
+        player2_id INTEGER NOT NULL,
+        winner_id INTEGER,
+        player1_rating_change INTEGER DEFAULT 0,
+        player2_rating_change INTEGER DEFAULT 0,
+        total_turns INTEGER DEFAULT 0,
+        battle_duration INTEGER DEFAULT 0,
+        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (battle_id) REFERENCES pvp_battles(battle_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pvp_queue (
+        queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL UNIQUE,
+        rating INTEGER DEFAULT 1000,
+        selected_creatures TEXT NOT NULL,
+        selected_tools TEXT,
+        selected_spells TEXT,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Per-player results per UTC day, for the week and month leaderboards.
+    # One row per player per day played, so a window reads only the rows
+    # of the players active in it.
+    """
+    CREATE TABLE IF NOT EXISTS pvp_daily_stats (
+        day TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        rating_change INTEGER DEFAULT 0,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        battles INTEGER DEFAULT 0,
+        PRIMARY KEY (day, user_id)
+    )
+    """,
+    # Every battle log entry, appended as the battle is saved; the live
+    # state only carries the last few.  entry is the entry's JSON.
+    """
+    CREATE TABLE IF NOT EXISTS pvp_battle_log (
+        battle_id INTEGER NOT NULL,
+        entry_id INTEGER NOT NULL,
+        entry TEXT NOT NULL,
+        PRIMARY KEY (battle_id, entry_id)
+    ) WITHOUT ROWID
+    """,
+    # Post-battle jobs, written in the settling transaction and drained by
+    # pvp_post_battle's worker
+    """
+    CREATE TABLE IF NOT EXISTS pvp_outbox (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        battle_id INTEGER NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        available_at REAL DEFAULT 0,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Per player and creature NFT: rated battles it took part in and the
+    # damage it dealt, for favorite_creature_id
+    """
+    CREATE TABLE IF NOT EXISTS pvp_creature_usage (
+        user_id INTEGER NOT NULL,
+        creature_id TEXT NOT NULL,
+        battles INTEGER DEFAULT 0,
+        damage_dealt INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, creature_id)
+    )
+    """,
+)
+
+# Columns added to the tables since they were first created
+PVP_ADDED_COLUMNS = {
+    "pvp_battles": (
+        ("is_bot_match", "INTEGER DEFAULT 0"),
+        ("turn_started_at", "REAL"),
+        ("player1_missed_turns", "INTEGER DEFAULT 0"),
+        ("player2_missed_turns", "INTEGER DEFAULT 0"),
+        ("state_version", "INTEGER DEFAULT 0"),
+    ),
+    "pvp_stats": (
+        ("favorite_creature_id", "TEXT"),
+    ),
+    "pvp_battle_history": (
+        ("battle_replay", "BLOB"),
+    ),
+}
+
+# Active battles are a small slice of pvp_battles, so their indexes are
+# partial: they stay small however long the battle history grows.
+PVP_INDEXES = (
+    """CREATE INDEX IF NOT EXISTS idx_pvp_battles_player1_active
+       ON pvp_battles(player1_id, created_at) WHERE status = 'active'""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_battles_player2_active
+       ON pvp_battles(player2_id, created_at) WHERE status = 'active'""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_battles_turn_clock
+       ON pvp_battles(turn_started_at) WHERE status = 'active'""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_history_player1
+       ON pvp_battle_history(player1_id, completed_at)""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_history_player2
+       ON pvp_battle_history(player2_id, completed_at)""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_history_battle
+       ON pvp_battle_history(battle_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_stats_rating
+       ON pvp_stats(rating)""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_queue_rating
+       ON pvp_queue(rating, joined_at)""",
+    """CREATE INDEX IF NOT EXISTS idx_pvp_outbox_available
+       ON pvp_outbox(available_at)""",
+)
+
+
+# Fills pvp_daily_stats from the rated battles already in the history
+BACKFILL_DAILY_STATS = """
+    INSERT INTO pvp_daily_stats (day, user_id, rating_change, wins, losses, battles)
+    SELECT day, user_id, SUM(rating_change), SUM(won), SUM(lost), COUNT(*)
+    FROM (
+        SELECT date(h.completed_at) as day, h.player1_id as user_id,
+               h.player1_rating_change as rating_change,
+               h.winner_id = h.player1_id as won, h.winner_id = h.player2_id as lost
+        FROM pvp_battle_history h
+        JOIN pvp_battles b ON b.battle_id = h.battle_id
+        WHERE b.is_bot_match = 0
+        UNION ALL
+        SELECT date(h.completed_at), h.player2_id, h.player2_rating_change,
+               h.winner_id = h.player2_id, h.winner_id = h.player1_id
+        FROM pvp_battle_history h
+        JOIN pvp_battles b ON b.battle_id = h.battle_id
+        WHERE b.is_bot_match = 0
+    )
+    GROUP BY day, user_id
+"""
+
+
+def create_pvp_schema(cur):
+    """Create the PvP tables and indexes, adding columns older tables lack"""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pvp_daily_stats'")
+    backfill_daily_stats = cur.fetchone() is None
+
+    for statement in PVP_TABLES:
+        cur.execute(statement)
+
+    for table, columns in PVP_ADDED_COLUMNS.items():
+        cur.execute(f"PRAGMA table_info({table})")
+        existing = [row[1] for row in cur.fetchall()]
+        for column, definition in columns:
+            if column not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    for statement in PVP_INDEXES:
+        cur.execute(statement)
+
+    if backfill_daily_stats:
+        cur.execute(BACKFILL_DAILY_STATS)
+
+
+# ──────────────────────────────────────────────────────────────
+# Hot queries
+# ──────────────────────────────────────────────────────────────
+
+# The player's newest active battle.  Params: (user_id, user_id)
+ACTIVE_BATTLE_FOR_USER = """
+    SELECT battle_id FROM (
+        SELECT battle_id, created_at FROM pvp_battles
+        WHERE player1_id = ? AND status = 'active'
+        UNION ALL
+        SELECT battle_id, created_at FROM pvp_battles
+        WHERE player2_id = ? AND status = 'active'
+    )
+    ORDER BY created_at DESC, battle_id DESC
+    LIMIT 1
+"""
+
+# The player's last 10 finished battles with both names.  Each side reads
+# at most 10 rows from its index.  LEFT JOIN keeps bot matches, whose bot
+# has no users row.  Params: (user_id, user_id)
+RECENT_HISTORY_FOR_USER = """
+    SELECT h.*, u1.first_name as player1_name, u2.first_name as player2_name
+    FROM (
+        SELECT * FROM (
+            SELECT * FROM pvp_battle_history WHERE player1_id = ?
+            ORDER BY completed_at DESC, history_id DESC LIMIT 10
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT * FROM pvp_battle_history WHERE player2_id = ?
+            ORDER BY completed_at DESC, history_id DESC LIMIT 10
+        )
+    ) h
+    LEFT JOIN users u1 ON h.player1_id = u1.user_id
+    LEFT JOIN users u2 ON h.player2_id = u2.user_id
+    ORDER BY h.completed_at DESC, h.history_id DESC
+    LIMIT 10
+"""
+
+# Add one rated result to the player's row for today (UTC).
+# Params: (user_id, rating_change, won, lost)
+RECORD_DAILY_RESULT = """
+    INSERT INTO pvp_daily_stats (day, user_id, rating_change, wins, losses, battles)
+    VALUES (date('now'), ?, ?, ?, ?, 1)
+    ON CONFLICT(day, user_id) DO UPDATE SET
+        rating_change = rating_change + excluded.rating_change,
+        wins = wins + excluded.wins,
+        losses = losses + excluded.losses,
+        battles = battles + 1
+"""
+
+# Every player's totals over the days from first_day on.  Reads a range of
+# the primary key, i.e. only the window's rows.  Params: (first_day,)
+DAILY_STATS_SINCE = """
+    SELECT user_id, SUM(rating_change) as rating_change,
+           SUM(wins) as wins, SUM(losses) as losses
+    FROM pvp_daily_stats
+    WHERE day >= ?
+    GROUP BY user_id
+"""
+
+# Longest-waiting queued opponent within `window` rating points.  A range
+# on rating instead of ABS(rating - ?) so the index applies.
+# Params: (rating - window, rating + window, user_id)
+MATCH_CANDIDATE = """
+    SELECT * FROM pvp_queue
+    WHERE rating BETWEEN ? AND ?
+    AND user_id != ?
+    ORDER BY joined_at ASC
+    LIMIT 1
+"""
+
+# Archive one log entry; replays of the same entry are ignored.
+# Params: (battle_id, entry_id, entry JSON)
+ARCHIVE_LOG_ENTRY = """
+    INSERT OR IGNORE INTO pvp_battle_log (battle_id, entry_id, entry)
+    VALUES (?, ?, ?)
+"""
+
+# A page of a battle's log.  Params: (battle_id, after entry_id, limit)
+BATTLE_LOG_AFTER = """
+    SELECT entry FROM pvp_battle_log
+    WHERE battle_id = ? AND entry_id > ?
+    ORDER BY entry_id
+    LIMIT ?
+"""
+
+# Every active battle's turn clock, oldest first (startup).  No params.
+ACTIVE_TURN_CLOCKS = """
+    SELECT battle_id, turn_started_at FROM pvp_battles
+    WHERE status = 'active'
+    ORDER BY turn_started_at
+"""
@@ -0,0 +1,213 @@
+"""
+Headless PvP battle simulator and Monte Carlo balance runner.
+
+Plays whole battles through PvPBattleState with no HTTP, session or
+database: each side is driven by a policy from pvp_ai.py, every game is
+seeded, and games are spread over a process pool.  The summary reports win
+rates by species, form and rarity, how often the deck with the higher
+calculate_deck_power won, and engine throughput.
+
+    python pvp_simulator.py                                  # 2000 games, heuristic vs heuristic
+    python pvp_simulator.py --games 1000000 --workers 16
+    python pvp_simulator.py --p1 greedy --p2 random --seed 7
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional
+
+from pvp_ai import POLICIES
+from pvp_battle_state import PvPBattleState, create_initial_battle_state
+from pvp_combat_rules import STAT_NAMES, ITEM_EFFECTS, ITEM_TYPES
+from pvp_matchmaking import calculate_deck_power
+from species_data import SPECIES_REGISTRY
+
+PLAYER_IDS = (1, 2)
+MAX_TURNS = 60              # battles still running after this are scored as draws
+MAX_ACTIONS_PER_TURN = 20
+END_TURN = {"type": "endTurn"}
+
+_SPECIES = tuple(SPECIES_REGISTRY.values())
+
+
+# ──────────────────────────────────────────────────────────────
+# Random decks
+# ──────────────────────────────────────────────────────────────
+def random_creature(rng) -> Dict:
+    """A creature NFT as the client sends it in selected_creatures"""
+    species = rng.choice(_SPECIES)
+    form = rng.randint(0, 3)
+    return {
+        "id": f"sim-{rng.getrandbits(48):012x}",
+        "species_id": species.id,
+        "species_name": species.name,
+        "form": form,
+        "rarity": species.rarity,
+        "stats": {stat: rng.randint(1, 10) + form * 3 for stat in STAT_NAMES},
+        "combination_level": rng.choice((0, 0, 0, 1, 2)),
+    }
+
+
+def random_item(rng, kind: str) -> Dict:
+    effect = rng.choice(ITEM_EFFECTS)
+    return {
+        "id": f"sim-{rng.getrandbits(48):012x}",
+        "name": f"Babylon {effect}",
+        f"{kind}_type": rng.choice(ITEM_TYPES),
+        f"{kind}_effect": effect,
+    }
+
+
+def random_player(rng, user_id: int) -> Dict:
+    """Player data as find_match hands it to create_initial_battle_state"""
+    return {
+        "user_id": user_id,
+        "name": f"Player {user_id}",
+        "selected_creatures": [random_creature(rng) for _ in range(rng.randint(3, 5))],
+        "selected_tools": [random_item(rng, "tool") for _ in range(rng.randint(0, 3))],
+        "selected_spells": [random_item(rng, "spell") for _ in range(rng.randint(0, 3))],
+    }
+
+
+# ──────────────────────────────────────────────────────────────
+# Games
+# ──────────────────────────────────────────────────────────────
+class GameResult(NamedTuple):
+    winner: Optional[int]       # 1, 2 or None for a draw / turn limit
+    turns: int
+    actions: int
+    rejected: int               # actions the engine refused
+
+
+def play_game(player1: Dict, player2: Dict, policy1, policy2, rng,
+              max_turns: int = MAX_TURNS) -> GameResult:
+    """Play one battle to the end; rng drives both the policies and the dice"""
+    battle = PvPBattleState(create_initial_battle_state(player1, player2), rng=rng)
+    policies = {player1["user_id"]: policy1, player2["user_id"]: policy2}
+    actions = rejected = 0
+
+    while battle.turn <= max_turns:
+        player_id = battle.active_player_id
+        taken = 0
+        for action in policies[player_id].turn(battle, player_id, rng):
+            result = battle.process_action(player_id, action)
+            actions += 1
+            taken += 1
+            if not result["success"]:
+                rejected += 1
+            ended, winner = battle.check_battle_end()
+            if ended:
+                return GameResult(winner, battle.turn, actions, rejected)
+            if taken >= MAX_ACTIONS_PER_TURN:
+                break
+        battle.process_action(player_id, END_TURN)
+        actions += 1
+        ended, winner = battle.check_battle_end()
+        if ended:
+            return GameResult(winner, battle.turn, actions, rejected)
+    return GameResult(None, battle.turn, actions, rejected)
+
+
+def _power_band(ratio: float) -> str:
+    """Deck power ratio (stronger / weaker) bucket for the calibration table"""
+    for limit in (1.1, 1.25, 1.5, 2.0):
+        if ratio < limit:
+            return f"<{limit:.2f}"
+    return ">=2.00"
+
+
+def simulate(seeds: range, policy1: str, policy2: str) -> Counter:
+    """
+    Play one game per seed and tally the results.  Counter keys are
+    (group, value, outcome) for the win-rate tables plus a few totals.
+    """
+    tally = Counter()
+    policies = (POLICIES[policy1](), POLICIES[policy2]())
+    for seed in seeds:
+        rng = random.Random(seed)
+        players = [random_player(rng, user_id) for user_id in PLAYER_IDS]
+        result = play_game(players[0], players[1], policies[0], policies[1], rng)
+
+        tally["games"] += 1
+        tally["turns"] += result.turns
+        tally["actions"] += result.actions
+        tally["rejected"] += result.rejected
+        if result.winner is None:
+            tally["draws"] += 1
+
+        powers = [calculate_deck_power(p["selected_creatures"]) for p in players]
+        for side, player in enumerate(players):
+            if result.winner is None:
+                outcome = "draw"
+            else:
+                outcome = "win" if result.winner == player["user_id"] else "loss"
+            tally[("seat", side + 1, outcome)] += 1
+            for creature in player["selected_creatures"]:
+                tally[("species", creature["species_name"], outcome)] += 1
+                tally[("form", creature["form"], outcome)] += 1
+                tally[("rarity", creature["rarity"], outcome)] += 1
+
+        if result.winner is not None and powers[0] != powers[1]:
+            stronger = 0 if powers[0] > powers[1] else 1
+            band = _power_band(max(powers) / max(min(powers), 1))
+            won = result.winner == players[stronger]["user_id"]
+            tally[("deck power", band, "win" if won else "loss")] += 1
+    return tally
+
+
+def run(games: int, seed: int, policy1: str, policy2: str, workers: int,
+        chunk: int = 500) -> Counter:
+    """simulate() over `games` seeds, split into chunks across a process pool"""
+    chunks = [range(start, min(start + chunk, seed + games))
+              for start in range(seed, seed + games, chunk)]
+    tally = Counter()
+    if workers <= 1:
+        for seeds in chunks:
+            tally.update(simulate(seeds, policy1, policy2))
+        return tally
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(simulate, chunks, [policy1] * len(chunks), [policy2] * len(chunks)):
+            tally.update(part)
+    return tally
+
+
+def report(tally: Counter, elapsed: float, policy1: str, policy2: str):
+    games = tally["games"]
+    print(f"{games} games, {policy1} (seat 1) vs {policy2} (seat 2), {elapsed:.1f}s")
+    print(f"  {games / elapsed:,.0f} games/s, {tally['actions'] / elapsed:,.0f} actions/s, "
+          f"{tally['turns'] / games:.1f} turns and {tally['actions'] / games:.1f} actions per game, "
+          f"{tally['rejected'] / max(tally['actions'], 1):.1%} actions rejected, "
+          f"{tally['draws'] / games:.1%} draws")
+
+    groups = {}
+    for key, count in tally.items():
+        if isinstance(key, tuple):
+            groups.setdefault(key[0], Counter())[(key[1], key[2])] += count
+    for group in ("seat", "deck power", "rarity", "form", "species"):
+        if group not in groups:
+            continue
+        counts = groups[group]
+        title = "stronger deck won" if group == "deck power" else "win rate"
+        print(f"\n  {group:<14} {'n':>9} {title:>18}")
+        for value in sorted({value for value, _ in counts}, key=str):
+            wins, losses, draws = (counts[(value, o)] for o in ("win", "loss", "draw"))
+            total = wins + losses + draws
+            print(f"  {str(value):<14} {total:9d} {wins / total:18.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--p1", choices=sorted(POLICIES), default="heuristic")
+    parser.add_argument("--p2", choices=sorted(POLICIES), default="heuristic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tally = run(args.games, args.seed, args.p1, args.p2, args.workers)
+    report(tally, time.perf_counter() - started, args.p1, args.p2)
@@ -0,0 +1,81 @@
+"""
+Turn deadlines for active PvP battles.
+
+Deadlines are kept in a heap, so scheduling and each expiry are
+O(log n) in the number of queued deadlines.  They nearly arrive in
+order, since every turn lasts the same PVP_TURN_SECONDS, but not quite:
+battles acting at the same moment schedule after their commits, in
+either order, and resumed clocks come in any order.  A battle's deadline
+is superseded rather than removed: the battle remembers the token of its
+live deadline and older entries are dropped when they reach the top.
+
+The token is the battle's turn_started_at.  The expiry callback is given it
+back and must check it against the database, because a player may end the
+turn in the same instant the deadline fires.
+"""
+import heapq
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Hashable, List, Tuple
+
+
+class TurnTimer:
+    def __init__(self, on_expire: Callable[[int, Hashable], None], name: str = "pvp-turn-timer"):
+        self._on_expire = on_expire
+        self._name = name
+        self._queue: List[Tuple] = []       # heap of (deadline, battle_id, token)
+        self._live: Dict[int, Hashable] = {}  # battle_id -> token of its current deadline
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, battle_id: int, deadline: float, token: Hashable):
+        """Set the battle's turn deadline (epoch seconds), replacing any earlier one"""
+        with self._cond:
+            self._live[battle_id] = token
+            entry = (deadline, battle_id, token)
+            heapq.heappush(self._queue, entry)
+            if self._queue[0] is entry:
+                self._cond.notify()
+
+    def cancel(self, battle_id: int):
+        """Forget the battle's deadline (battle over)"""
+        with self._cond:
+            self._live.pop(battle_id, None)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._live)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _next_expired(self):
+        """Block until a live deadline has passed; returns (battle_id, token)"""
+        with self._cond:
+            while True:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                deadline, battle_id, token = self._queue[0]
+                if self._live.get(battle_id) != token:
+                    heapq.heappop(self._queue)  # superseded or cancelled
+                    continue
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                del self._live[battle_id]
+                return battle_id, token
+
+    def _run(self):
+        while True:
+            battle_id, token = self._next_expired()
+            try:
+                self._on_expire(battle_id, token)
+            except Exception as e:
+                print(f"Error expiring turn in battle {battle_id}: {e}")
+                traceback.print_exc()
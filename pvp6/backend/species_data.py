@@ -0,0 +1,318 @@
+"""
+Species data for Evolving Creatures and the precomputed registry built from it.
+
+SPECIES_DATA is the editable source table.  SPECIES_REGISTRY is derived from it
+once at import: immutable per-species records with id and lowercase-name
+indexes, per-form image URLs and Decimal price tables.  Creature processing,
+the upgrade/evolution cost calculators and PvP deck power all read from it.
+"""
+from decimal import Decimal
+from types import MappingProxyType
+from typing import NamedTuple, Optional, Tuple
+
+# Species data for Evolving Creatures
+SPECIES_DATA = {
+    # Common Creatures (50% chance)
+    1: {
+        "name": "Bullx",
+        "specialty_stats": ["strength", "stamina"],
+        "rarity": "Common",
+        "preferred_token": "RBX",
+        "evolution_prices": [50, 100, 200],
+        "stat_price": 100,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/bullx"
+    },
+    2: {
+        "name": "Cudoge",
+        "specialty_stats": ["strength", "stamina"],
+        "rarity": "Common",
+        "preferred_token": "DGC",
+        "evolution_prices": [100000, 200000, 300000],
+        "stat_price": 200000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/cudoge"
+    },
+    3: {
+        "name": "Cvxling",
+        "specialty_stats": ["speed", "energy"],
+        "rarity": "Common",
+        "preferred_token": "CVX",
+        "evolution_prices": [20, 50, 100],
+        "stat_price": 50,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/cvxling"
+    },
+    4: {
+        "name": "Dan",
+        "specialty_stats": ["stamina", "magic"],
+        "rarity": "Common",
+        "preferred_token": "DAN",
+        "evolution_prices": [500000, 1000000, 2000000],
+        "stat_price": 1000000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/dan"
+    },
+    5: {
+        "name": "Delayer",
+        "specialty_stats": ["magic"],
+        "rarity": "Common",
+        "preferred_token": "DELAY",
+        "evolution_prices": [20000, 40000, 100000],
+        "stat_price": 40000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/delayer"
+    },
+    6: {
+        "name": "Delivera",
+        "specialty_stats": ["stamina", "strength"],
+        "rarity": "Common",
+        "preferred_token": "DELIVER",
+        "evolution_prices": [1000, 2000, 4000],
+        "stat_price": 2000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/delivera"
+    },
+    7: {
+        "name": "Flooper",
+        "specialty_stats": ["magic", "energy"],
+        "rarity": "Common",
+        "preferred_token": "FLOOP",
+        "evolution_prices": [0.001, 0.002, 0.003],
+        "stat_price": 0.002,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/flooper"
+    },
+    8: {
+        "name": "Hitter",
+        "specialty_stats": ["strength", "magic"],
+        "rarity": "Common",
+        "preferred_token": "HIT",
+        "evolution_prices": [20000000, 40000000, 100000000],
+        "stat_price": 40000000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/hitter"
+    },
+    9: {
+        "name": "Moxer",
+        "specialty_stats": ["speed", "magic"],
+        "rarity": "Common",
+        "preferred_token": "MOX",
+        "evolution_prices": [200, 400, 1000],
+        "stat_price": 400,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/moxer"
+    },
+    10: {
+        "name": "Ocipod",
+        "specialty_stats": ["energy"],
+        "rarity": "Common",
+        "preferred_token": "CVX",
+        "evolution_prices": [20, 50, 100],
+        "stat_price": 50,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/ocipod"
+    },
+    # Rare Creatures (30% chance)
+    11: {
+        "name": "Wowori",
+        "specialty_stats": ["magic", "energy"],
+        "rarity": "Rare",
+        "preferred_token": "WOWO",
+        "evolution_prices": [4000, 10000, 20000],
+        "stat_price": 10000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/wowori"
+    },
+    12: {
+        "name": "Earlybyte",
+        "specialty_stats": ["speed", "energy"],
+        "rarity": "Rare",
+        "preferred_token": "EARLY",
+        "evolution_prices": [1000, 2000, 4000],
+        "stat_price": 2000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/earlybyte"
+    },
+    13: {
+        "name": "Edge",
+        "specialty_stats": ["strength", "energy"],
+        "rarity": "Rare",
+        "preferred_token": "EDGE",
+        "evolution_prices": [20000000, 40000000, 100000000],
+        "stat_price": 40000000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/edge"
+    },
+    14: {
+        "name": "Fomotron",
+        "specialty_stats": ["energy", "strength"],
+        "rarity": "Rare",
+        "preferred_token": "FOMO",
+        "evolution_prices": [200, 500, 1000],
+        "stat_price": 500,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/fomotron"
+    },
+    15: {
+        "name": "Hodlphant",
+        "specialty_stats": ["strength"],
+        "rarity": "Rare",
+        "preferred_token": "CVX",
+        "evolution_prices": [20, 50, 100],
+        "stat_price": 50,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/hodlphant"
+    },
+    16: {
+        "name": "Minermole",
+        "specialty_stats": ["strength", "stamina"],
+        "rarity": "Rare",
+        "preferred_token": "CVX",
+        "evolution_prices": [20, 50, 100],
+        "stat_price": 50,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/minermole"
+    },
+    17: {
+        "name": "Ocitrup",
+        "specialty_stats": ["speed", "strength"],
+        "rarity": "Rare",
+        "preferred_token": "OCI",
+        "evolution_prices": [100, 200, 400],
+        "stat_price": 200,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/ocitrup"
+    },
+    # Epic Creatures (15% chance)
+    18: {
+        "name": "Etherion",
+        "specialty_stats": ["magic", "energy"],
+        "rarity": "Epic",
+        "preferred_token": "XRD",
+        "evolution_prices": [100, 200, 400],
+        "stat_price": 200,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/etherion"
+    },
+    19: {
+        "name": "Hugbloom",
+        "specialty_stats": ["stamina"],
+        "rarity": "Epic",
+        "preferred_token": "HUG",
+        "evolution_prices": [100000, 300000, 500000],
+        "stat_price": 300000,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/hugbloom"
+    },
+    20: {
+        "name": "Ilispect",
+        "specialty_stats": ["stamina", "magic"],
+        "rarity": "Epic",
+        "preferred_token": "ILIS",
+        "evolution_prices": [200, 400, 1000],
+        "stat_price": 400,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/ilispect"
+    },
+    21: {
+        "name": "Reddix",
+        "specialty_stats": ["strength", "stamina"],
+        "rarity": "Epic",
+        "preferred_token": "REDDICKS",
+        "evolution_prices": [300, 500, 1000],
+        "stat_price": 500,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/reddix"
+    },
+    22: {
+        "name": "Satoshium",
+        "specialty_stats": ["strength", "stamina"],
+        "rarity": "Epic",
+        "preferred_token": "XRD",
+        "evolution_prices": [100, 200, 400],
+        "stat_price": 200,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/satoshium"
+    },
+    # Legendary Creatures (5% chance)
+    23: {
+        "name": "Cassie",
+        "specialty_stats": ["magic", "energy"],
+        "rarity": "Legendary",
+        "preferred_token": "CASSIE",
+        "evolution_prices": [0.004, 0.01, 0.02],
+        "stat_price": 0.01,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/cassie"
+    },
+    24: {
+        "name": "Corvax",
+        "specialty_stats": ["magic", "energy"],
+        "rarity": "Legendary",
+        "preferred_token": "CVX",
+        "evolution_prices": [20, 50, 100],
+        "stat_price": 50,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/corvax"
+    },
+    25: {
+        "name": "Xerdian",
+        "specialty_stats": ["stamina", "energy"],
+        "rarity": "Legendary",
+        "preferred_token": "XRD",
+        "evolution_prices": [100, 200, 400],
+        "stat_price": 200,
+        "base_url": "https://cvxlab.net/assets/evolving_creatures/xerdian"
+    }
+}
+
+
+FORM_SUFFIX = {0: "_egg", 1: "_form1", 2: "_form2", 3: "_form3"}  # final
+
+RARITY_SCORES = MappingProxyType({"Common": 1, "Rare": 2, "Epic": 3, "Legendary": 4})
+
+
+class Species(NamedTuple):
+    """Immutable, precomputed view of one SPECIES_DATA entry"""
+    id: int
+    name: str
+    rarity: str
+    preferred_token: str
+    specialty_stats: Tuple[str, ...]
+    base_url: str
+    form_image_urls: Tuple[str, str, str, str]   # egg, form1, form2, form3
+    evolution_prices: Tuple[Decimal, ...]
+    stat_price: Decimal
+
+    def image_url(self, form) -> str:
+        """Image for a form; anything that is not 0/1/2 maps to the final form"""
+        if form == 0:
+            return self.form_image_urls[0]
+        if form == 1:
+            return self.form_image_urls[1]
+        if form == 2:
+            return self.form_image_urls[2]
+        return self.form_image_urls[3]
+
+    def evolution_price(self, form: int) -> Decimal:
+        """Evolution price for `form`, clamped to the last listed price"""
+        prices = self.evolution_prices
+        return prices[form] if form < len(prices) else prices[-1]
+
+
+def _build_species(species_id: int, data: dict) -> Species:
+    base_url = data["base_url"]
+    return Species(
+        id=species_id,
+        name=data["name"],
+        rarity=data["rarity"],
+        preferred_token=data.get("preferred_token", "XRD"),
+        specialty_stats=tuple(data.get("specialty_stats", ())),
+        base_url=base_url,
+        form_image_urls=tuple(f"{base_url}{FORM_SUFFIX[f]}.png" for f in range(4)),
+        evolution_prices=tuple(Decimal(str(p)) for p in data.get("evolution_prices", [50, 100, 200])),
+        stat_price=Decimal(str(data.get("stat_price", 50))),
+    )
+
+
+SPECIES_REGISTRY = MappingProxyType(
+    {sid: _build_species(sid, data) for sid, data in SPECIES_DATA.items()}
+)
+SPECIES_BY_NAME = MappingProxyType(
+    {species.name.lower(): species for species in SPECIES_REGISTRY.values()}
+)
+DEFAULT_SPECIES = SPECIES_REGISTRY[1]   # Bullx
+
+
+def find_species(species_id=None, species_name: Optional[str] = None) -> Optional[Species]:
+    """
+    Look a species up by id (int or numeric string), then by name.
+    Returns None when neither matches.
+    """
+    if species_id is not None:
+        try:
+            species = SPECIES_REGISTRY.get(int(species_id))
+        except (TypeError, ValueError):
+            species = None
+        if species is not None:
+            return species
+    if species_name:
+        return SPECIES_BY_NAME.get(str(species_name).lower())
+    return None
@@ -2,6 +2,7 @@
 import { useContext, useEffect, useState } from 'react';
 import { GameContext } from '../context/GameContext';
 import { useRadixConnect } from '../context/RadixConnectContext';
+import { idempotencyHeaders } from '../utils/idempotency';
 
 const FomoHitMinter = ({ machineId, onClose }) => {
   // Game context
@@ -115,6 +116,7 @@ const FomoHitMinter = ({ machineId, onClose }) => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...idempotencyHeaders(),
         },
         body: JSON.stringify({
           machineId: machine.id,
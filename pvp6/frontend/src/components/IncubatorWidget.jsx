@@ -2,6 +2,7 @@
 import { useContext, useEffect, useState } from 'react';
 import { GameContext } from '../context/GameContext';
 import { useRadixConnect } from '../context/RadixConnectContext';
+import { idempotencyHeaders } from '../utils/idempotency';
 
 const IncubatorWidget = ({ machineId, onClose }) => {
   // From your GameContext
@@ -82,6 +83,7 @@ const IncubatorWidget = ({ machineId, onClose }) => {
             method: 'POST',
             headers: {
               'Content-Type': 'application/json',
+              ...idempotencyHeaders(),
             },
             body: JSON.stringify(requestData),
             credentials: 'same-origin'
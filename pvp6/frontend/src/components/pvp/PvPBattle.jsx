@@ -1,10 +1,12 @@
-import React, { useState, useEffect, useCallback, useReducer } from 'react';
+import React, { useState, useEffect, useCallback, useReducer, useRef } from 'react';
 import Battlefield from '../battle/Battlefield';
 import PlayerHand from '../battle/PlayerHand';
 import ActionPanel from '../battle/ActionPanel';
 import BattleLog from '../battle/BattleLog';
 import BattleHeader from '../battle/BattleHeader';
 import { calculateDerivedStats } from '../../utils/battleCalculations';
+import { formatBattleLog } from '../../utils/battleEvents';
+import { idempotencyHeaders } from '../../utils/idempotency';
 import { processAttack, applyTool, applySpell, defendCreature } from '../../utils/battleCore';
 import './PvPBattle.css';
 
@@ -94,6 +96,9 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
     opponentEnergy: 10,
     opponentName: 'Opponent',
     
+    // Legal actions (see processBattleStateForPlayer)
+    legalActions: {},
+    
     // Battle log
     battleLog: [],
     
@@ -106,6 +111,8 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
   const [pollingInterval, setPollingInterval] = useState(null);
   const [selectedCreature, setSelectedCreature] = useState(null);
   const [targetCreature, setTargetCreature] = useState(null);
+  // Action responses don't repeat the opponent info of the last poll
+  const opponentInfoRef = useRef({ name: 'Opponent' });
   
   // Fetch battle state
   const fetchBattleState = useCallback(async () => {
@@ -132,7 +139,9 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
   
   // Process battle state for player perspective
   const processBattleStateForPlayer = (serverData, localCreatures) => {
-    const { battleState, isPlayer1, yourTurn, turnNumber, opponentInfo, timeRemaining } = serverData;
+    const { battleState, isPlayer1, yourTurn, turnNumber, turnDeadline, stateVersion } = serverData;
+    const opponentInfo = serverData.opponentInfo || opponentInfoRef.current;
+    opponentInfoRef.current = opponentInfo;
     
     // Get player and opponent states based on perspective
     const playerState = isPlayer1 ? battleState.player1 : battleState.player2;
@@ -143,7 +152,8 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
       return creatures.map(creature => {
         // Find the full creature data from local storage
         const fullCreature = localCreatures.find(c => c.id === creature.id) || creature;
-        const battleStats = calculateDerivedStats(fullCreature);
+        // The server's battle stats include active effects; only derive locally as a fallback
+        const battleStats = creature.battleStats || calculateDerivedStats(fullCreature);
         
         return {
           ...fullCreature,
@@ -156,7 +166,9 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
     return {
       isYourTurn: yourTurn,
       turn: turnNumber,
-      timeRemaining: timeRemaining,
+      // The server sends the deadline, the same in every response for a state
+      timeRemaining: turnDeadline ? Math.max(0, Math.round(turnDeadline * 1000 - Date.now())) : 0,
+      stateVersion: stateVersion,
       
       // Player state
       playerHand: processCreatures(playerState.hand),
@@ -165,13 +177,16 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
       playerDeck: playerState.deck,
       
       // Opponent state (limited info)
-      opponentHand: opponentState.hand.map(() => ({ hidden: true })), // Just show count
+      opponentHand: Array.from({ length: opponentState.handCount }, () => ({ hidden: true })), // Just the count is sent
       opponentField: processCreatures(opponentState.field),
       opponentEnergy: opponentState.energy,
       opponentName: opponentInfo.name,
       
+      // What the server accepts from the active player right now
+      legalActions: yourTurn ? battleState.legalActions || {} : {},
+      
       // Battle log
-      battleLog: battleState.battleLog || []
+      battleLog: formatBattleLog(battleState.battleLog, battleState.names)
     };
   };
   
@@ -184,8 +199,9 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
     try {
       const response = await fetch(`/api/pvp/battle/${battleId}/action`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ action })
+        headers: { 'Content-Type': 'application/json', ...idempotencyHeaders() },
+        // The server refuses the action (409) if the battle moved on since this state
+        body: JSON.stringify({ action, stateVersion: state.stateVersion })
       });
       
       const data = await response.json();
@@ -194,7 +210,9 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
         // Update local state immediately
         if (data.updatedState) {
           const processedState = processBattleStateForPlayer(
-            { battleState: data.updatedState, yourTurn: data.yourTurn },
+            { battleState: data.updatedState, isPlayer1: data.isPlayer1, yourTurn: data.yourTurn,
+              turnNumber: data.updatedState.turn, turnDeadline: data.turnDeadline,
+              stateVersion: data.stateVersion },
             selectedCreatures
           );
           dispatch({ type: ACTIONS.SET_BATTLE_STATE, battleState: processedState });
@@ -204,6 +222,10 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
         if (data.status === 'completed') {
           handleBattleComplete(data);
         }
+      } else if (response.status === 409 && data.conflict) {
+        // Acted on an outdated state: show the current one instead
+        const processedState = processBattleStateForPlayer(data, selectedCreatures);
+        dispatch({ type: ACTIONS.SET_BATTLE_STATE, battleState: processedState });
       } else {
         console.error('Action failed:', data.error);
         dispatch({ type: ACTIONS.ADD_LOG, message: `Action failed: ${data.error}` });
@@ -287,38 +309,40 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
     }
   }, [state.timeRemaining, state.isYourTurn, submitAction]);
   
-  // Get available actions
+  // Get available actions, from the legal actions the server sent with the state
   const getAvailableActions = useCallback((selectedCreature, targetCreature) => {
     if (!selectedCreature || !state.isYourTurn) return [];
     
+    const legal = state.legalActions;
     const actions = [];
     
-    if (state.playerHand.some(c => c.id === selectedCreature.id)) {
+    if (legal.deploy?.includes(selectedCreature.id)) {
       actions.push('deploy');
     }
     
-    if (state.playerField.some(c => c.id === selectedCreature.id)) {
-      if (targetCreature && state.opponentField.some(c => c.id === targetCreature.id) && state.playerEnergy >= 2) {
-        actions.push('attack');
-      }
-      
-      if (selectedTools.length > 0) {
-        actions.push('useTool');
-      }
-      
-      if (selectedSpells.length > 0 && state.playerEnergy >= 4) {
-        actions.push('useSpell');
-      }
-      
-      if (state.playerEnergy >= 1) {
-        actions.push('defend');
-      }
+    if (legal.attack?.attackerIds.includes(selectedCreature.id) &&
+        targetCreature && legal.attack.targetIds.includes(targetCreature.id)) {
+      actions.push('attack');
     }
     
-    actions.push('endTurn');
+    if (legal.useTool?.targetIds.includes(selectedCreature.id)) {
+      actions.push('useTool');
+    }
+    
+    if (legal.useSpell?.casterIds.includes(selectedCreature.id)) {
+      actions.push('useSpell');
+    }
+    
+    if (legal.defend?.includes(selectedCreature.id)) {
+      actions.push('defend');
+    }
+    
+    if (legal.endTurn) {
+      actions.push('endTurn');
+    }
     
     return actions;
-  }, [state, selectedTools, selectedSpells]);
+  }, [state.isYourTurn, state.legalActions]);
   
   if (state.loading) {
     return (
@@ -401,8 +425,8 @@ const PvPBattle = ({ battleId, selectedCreatures, selectedTools, selectedSpells,
         availableActions={getAvailableActions(selectedCreature, targetCreature)}
         onAction={handlePlayerAction}
         disabled={!state.isYourTurn || state.actionInProgress}
-        availableTools={selectedTools}
-        availableSpells={selectedSpells}
+        availableTools={selectedTools.filter(t => state.legalActions.useTool?.toolIds.includes(t.id))}
+        availableSpells={selectedSpells.filter(s => state.legalActions.useSpell?.spellIds.includes(s.id))}
       />
       
       <BattleLog log={state.battleLog} />
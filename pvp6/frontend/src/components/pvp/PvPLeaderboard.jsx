@@ -8,6 +8,7 @@ const PvPLeaderboard = () => {
   const [loading, setLoading] = useState(true);
   const [myRank, setMyRank] = useState(null);
   const [timeFilter, setTimeFilter] = useState('all'); // all, week, month
+  const [pageCursors, setPageCursors] = useState({}); // "filter:page" -> nextCursor of the page before it
   
   useEffect(() => {
     fetchLeaderboard();
@@ -16,12 +17,17 @@ const PvPLeaderboard = () => {
   const fetchLeaderboard = async () => {
     try {
       setLoading(true);
-      const response = await fetch(`/api/pvp/leaderboard?page=${currentPage}&perPage=20&filter=${timeFilter}`);
+      const cursor = pageCursors[`${timeFilter}:${currentPage}`];
+      const after = cursor ? `&after=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`/api/pvp/leaderboard?page=${currentPage}&perPage=20&filter=${timeFilter}${after}`);
       const data = await response.json();
       
       if (response.ok) {
         setPlayers(data.players || []);
         setTotalPages(data.totalPages || 1);
+        if (data.nextCursor) {
+          setPageCursors(cursors => ({ ...cursors, [`${timeFilter}:${currentPage + 1}`]: data.nextCursor }));
+        }
         
         // Check if current user is in the list
         const myUserId = parseInt(sessionStorage.getItem('userId'));
@@ -106,7 +112,7 @@ const PvPLeaderboard = () => {
         <div className="pvp-leaderboard-row header">
           <div className="pvp-rank-column">Rank</div>
           <div className="pvp-player-column">Player</div>
-          <div className="pvp-rating-column">Rating</div>
+          <div className="pvp-rating-column">{timeFilter === 'all' ? 'Rating' : 'Gained'}</div>
           <div className="pvp-stats-column">W/L</div>
           <div className="pvp-winrate-column">Win %</div>
         </div>
@@ -132,7 +138,11 @@ const PvPLeaderboard = () => {
                 </span>
               </div>
               <div className="pvp-rating-column">
-                <span className="pvp-rating-value">{player.rating}</span>
+                <span className="pvp-rating-value">
+                  {timeFilter === 'all'
+                    ? player.rating
+                    : `${player.ratingChange > 0 ? '+' : ''}${player.ratingChange}`}
+                </span>
               </div>
               <div className="pvp-stats-column">
                 <span className="pvp-wins">{player.wins}</span>
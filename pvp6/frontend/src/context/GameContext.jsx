@@ -1,6 +1,7 @@
 // src/context/GameContext.jsx
 import React, { createContext, useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
+import { idempotencyHeaders } from '../utils/idempotency';
 
 // Import the GatewayApiClient + constants
 import { GatewayApiClient, RadixNetwork } from '@radixdlt/babylon-gateway-api-sdk';
@@ -78,6 +79,53 @@ const gridSize = 64;
 const INTERACTION_RANGE = gridSize * 1.5;
 
 // Create the context
+// Stream /api/getUserCreatures/stream (NDJSON) and report the creatures
+// received so far, sorted by the server-provided sortKey (highest first).
+const compareSortKeys = (a, b) => (b.sortKey[0] - a.sortKey[0]) || (b.sortKey[1] - a.sortKey[1]);
+
+const streamUserCreatures = async (accountAddress, onProgress) => {
+  const response = await fetch('/api/getUserCreatures/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ accountAddress }),
+    credentials: 'same-origin'
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const received = [];
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = done ? '' : lines.pop();
+
+    let changed = false;
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const msg = JSON.parse(line);
+      if (msg.type === 'creature') {
+        received.push(msg);
+        changed = true;
+      } else if (msg.type === 'error') {
+        throw new Error(msg.error);
+      }
+    }
+    // One state update per network chunk, not per creature
+    if (changed) {
+      received.sort(compareSortKeys);
+      onProgress(received.map(entry => entry.creature));
+    }
+    if (done) break;
+  }
+  return received.map(entry => entry.creature);
+};
+
 export const GameContext = createContext();
 
 // Correctly initialize the Gateway client for Mainnet with gatewayApiUrl
@@ -320,17 +368,25 @@ export const GameProvider = ({ children }) => {
       const accountAddress = accounts[0].address;
       console.log('Loading creatures for account:', accountAddress);
       
-      // Load creatures using the working endpoint (getUserCreatures instead of getCreatureNfts)
+      // Stream creatures so the first ones show up before every page is decoded;
+      // fall back to the one-shot endpoint if streaming fails
       try {
-        const creaturesResp = await axios.post('/api/getUserCreatures', { accountAddress });
-        if (creaturesResp.data && creaturesResp.data.creatures) {
-          console.log('Successfully loaded creatures:', creaturesResp.data.creatures.length);
-          setCreatureNfts(creaturesResp.data.creatures);
-        } else {
-          console.log('No creatures returned from API');
+        const creatures = await streamUserCreatures(accountAddress, setCreatureNfts);
+        console.log('Successfully streamed creatures:', creatures.length);
+        setCreatureNfts(creatures);
+      } catch (streamError) {
+        console.warn('Creature stream failed, falling back to getUserCreatures:', streamError);
+        try {
+          const creaturesResp = await axios.post('/api/getUserCreatures', { accountAddress });
+          if (creaturesResp.data && creaturesResp.data.creatures) {
+            console.log('Successfully loaded creatures:', creaturesResp.data.creatures.length);
+            setCreatureNfts(creaturesResp.data.creatures);
+          } else {
+            console.log('No creatures returned from API');
+          }
+        } catch (creatureError) {
+          console.error('Error loading creatures:', creatureError);
         }
-      } catch (creatureError) {
-        console.error('Error loading creatures:', creatureError);
       }
       
       // Load tools and spells from the working endpoint
@@ -459,7 +515,7 @@ export const GameProvider = ({ children }) => {
         x, 
         y,
         room: currentRoom  // Include current room
-      });
+      }, { headers: idempotencyHeaders() });
       
       setTcorvax(parseFloat(resp.data.newResources.tcorvax));
       setCatNips(parseFloat(resp.data.newResources.catNips));
@@ -938,6 +994,7 @@ export const GameProvider = ({ children }) => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...idempotencyHeaders(),
         },
         body: JSON.stringify(requestData),
         credentials: 'same-origin'
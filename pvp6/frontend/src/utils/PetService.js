@@ -1,5 +1,6 @@
 // src/utils/PetService.js
 import axios from 'axios';
+import { idempotencyHeaders } from './idempotency';
 
 /**
  * Service class for handling pet-related API calls
@@ -69,7 +70,8 @@ class PetService {
    */
   static async buyEnergy(accountAddress) {
     try {
-      const response = await axios.post('/api/buyEnergy', { accountAddress });
+      const response = await axios.post('/api/buyEnergy', { accountAddress },
+        { headers: idempotencyHeaders() });
       return response.data;
     } catch (error) {
       console.error('Error getting energy purchase manifest:', error);
@@ -84,7 +86,8 @@ class PetService {
    */
   static async confirmEnergyPurchase(intentHash) {
     try {
-      const response = await axios.post('/api/confirmEnergyPurchase', { intentHash });
+      const response = await axios.post('/api/confirmEnergyPurchase', { intentHash },
+        { headers: idempotencyHeaders() });
       return response.data;
     } catch (error) {
       console.error('Error confirming energy purchase:', error);
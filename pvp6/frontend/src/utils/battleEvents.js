@@ -0,0 +1,69 @@
+// src/utils/battleEvents.js - Render PvP battle log events as text
+// The server logs events as arrays: [id, turn, code, player, actor, target, amount, flags]
+// (see backend/pvp_battle_events.py, which has the same formatter)
+
+export const EVENT_TURN = 0;
+export const EVENT_DEPLOY = 1;
+export const EVENT_ATTACK = 2;
+export const EVENT_DEFEND = 3;
+export const EVENT_TOOL = 4;
+export const EVENT_SPELL = 5;
+export const EVENT_DEFEATED = 6;
+
+const ATTACK_MAGICAL = 1;
+const ATTACK_CRITICAL = 2;
+const ATTACK_DODGED = 4;
+
+const EFFECTIVENESS = ['normal', 'very effective', 'effective', 'slightly effective',
+  'not very effective', 'resisted'];
+const DAMAGE_TYPES = ['normal', 'devastating', 'powerful', 'glancing', 'reduced', 'dodged'];
+const WOUNDS = [null, 'wounded', 'critically wounded'];
+
+const formatAttack = (flags, attacker, defender, damage) => {
+  const attackType = flags & ATTACK_MAGICAL ? 'magical' : 'physical';
+  if (flags & ATTACK_DODGED) {
+    return `${attacker}'s ${attackType} attack was dodged by ${defender}!`;
+  }
+
+  let message = `${attacker} used ${attackType} attack on ${defender}`;
+  if (flags & ATTACK_CRITICAL) message += ' (Critical Hit!)';
+  const effectiveness = EFFECTIVENESS[(flags >> 4) & 0xF];
+  if (effectiveness !== 'normal') message += ` - ${effectiveness}!`;
+  const damageType = DAMAGE_TYPES[(flags >> 8) & 0xF];
+  if (damageType !== 'normal') message += ` [${damageType}]`;
+  message += ` dealing ${damage} damage.`;
+  const wounds = WOUNDS[(flags >> 12) & 0x3];
+  if (wounds) message += ` ${defender} is ${wounds}!`;
+  return message;
+};
+
+export const formatBattleEvent = (event, names = {}) => {
+  const [, , code, player, actor, target, amount, flags] = event;
+  const name = (id) => names[id] || String(id);
+
+  switch (code) {
+    case EVENT_TURN:
+      return `Turn ${amount} - Player ${player}'s turn`;
+    case EVENT_DEPLOY:
+      return `Player deployed ${name(actor)} (-${amount} energy)`;
+    case EVENT_ATTACK:
+      return formatAttack(flags, name(actor), name(target), amount);
+    case EVENT_DEFEND:
+      return `${name(actor)} took a defensive stance`;
+    case EVENT_TOOL:
+      return `Used ${name(actor)} on ${name(target)}`;
+    case EVENT_SPELL:
+      return `${name(actor)} cast ${name(target)}`;
+    case EVENT_DEFEATED:
+      return `${name(actor)} was defeated!`;
+    default:
+      return '';
+  }
+};
+
+// Log entries as { id, turn, message } for BattleLog; entries logged before
+// events already carry their message
+export const formatBattleLog = (log = [], names = {}) =>
+  log.map(entry => (Array.isArray(entry)
+    ? { id: entry[0], turn: entry[1], message: formatBattleEvent(entry, names) }
+    : entry));
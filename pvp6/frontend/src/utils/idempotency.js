@@ -0,0 +1,13 @@
+// src/utils/idempotency.js - Idempotency keys for POSTs that change game state
+// The key is made once per user action and sent with the request, so the
+// server answers a network-level retry from its record instead of running
+// it again (see backend/idempotency.py)
+
+const newKey = () => {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+};
+
+export const idempotencyHeaders = () => ({ 'Idempotency-Key': newKey() });